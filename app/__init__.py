@@ -1,12 +1,10 @@
-from app.email_service import send_email  # Optional
 from flask import Flask
-from dotenv import load_dotenv
 import os
 
-# Load environment variables from .env file
-load_dotenv()
+def create_app(config=None):
+    # Loads the .env file into the environment before any setting is read
+    from .config import Config
 
-def create_app():
     app = Flask(__name__)
     app.secret_key = os.getenv('SESSION_SECRET_KEY', 'default_secret_key')
 
@@ -16,9 +14,55 @@ def create_app():
         SESSION_COOKIE_SECURE=False,
         SESSION_COOKIE_HTTPONLY=True
     )
+    # Mail settings from the environment; explicit config wins
+    app.config.from_object(Config)
+    if config:
+        app.config.update(config)
+
+    # Reject request bodies over the input limit before Werkzeug receives and spools them
+    from .routes import INPUT_SIZE_LIMIT, MAX_CONTENT_LENGTH, MULTIPART_OVERHEAD
+    app.config.setdefault('INPUT_SIZE_LIMIT', INPUT_SIZE_LIMIT)
+    if app.config.get('MAX_CONTENT_LENGTH') is None:  # Flask defaults it to None, no limit
+        app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH or app.config['INPUT_SIZE_LIMIT'] + MULTIPART_OVERHEAD
+
+    # Server-side store for submissions; the session only keeps a token
+    from .job_store import JOB_STORE_PATH, create_job_store
+    app.config.setdefault('JOB_STORE_PATH', JOB_STORE_PATH)
+    job_store = create_job_store(app.config['JOB_STORE_PATH'])
+    job_store.start_sweeper()
+    app.extensions['job_store'] = job_store
+
+    # Process pool for asynchronous generation, started on first use
+    from .jobs import GENERATION_MODE, GENERATION_WORKERS, JobManager
+    app.config.setdefault('GENERATION_MODE', GENERATION_MODE)
+    app.config.setdefault('GENERATION_WORKERS', GENERATION_WORKERS)
+    app.extensions['job_manager'] = JobManager(app.config['GENERATION_WORKERS'])
+
+    # Bounds the estimated cost of the decks rendered at once by the routes
+    from .admission import ADMISSION_CAPACITY, ADMISSION_QUEUE_SIZE, ADMISSION_QUEUE_TIMEOUT, AdmissionController
+    app.config.setdefault('ADMISSION_CAPACITY', ADMISSION_CAPACITY)
+    app.config.setdefault('ADMISSION_QUEUE_SIZE', ADMISSION_QUEUE_SIZE)
+    app.config.setdefault('ADMISSION_QUEUE_TIMEOUT', ADMISSION_QUEUE_TIMEOUT)
+    app.extensions['admission'] = AdmissionController(
+        app.config['ADMISSION_CAPACITY'], app.config['ADMISSION_QUEUE_SIZE'], app.config['ADMISSION_QUEUE_TIMEOUT'])
+
+    # Background delivery of emails over a pooled SMTP connection, started on first use
+    # or to deliver the emails left queued by a stopped process
+    from .mail_queue import MailQueue
+    mail_queue = MailQueue(app, job_store)
+    mail_queue.recover()
+    app.extensions['mail_queue'] = mail_queue
+
+    # Per-request stage timings (Server-Timing header) and /metrics histograms
+    from . import instrumentation
+    instrumentation.init_app(app)
 
     # Import and register blueprints/routes here
     from .routes import index
     app.register_blueprint(index)
 
+    # Optionally load fonts, styles and templates before the first deck
+    from . import prewarm
+    prewarm.init_app(app)
+
     return app
\ No newline at end of file
@@ -0,0 +1,164 @@
+import collections
+import contextlib
+import logging
+import math
+import os
+import threading
+import time
+from app.instrumentation import count
+from app.tokenizer import TOKEN_PATTERN
+
+logger = logging.getLogger(__name__)
+
+# Generation cost allowed in flight per process, in word equivalents (0 disables admission control)
+ADMISSION_CAPACITY = int(os.getenv('ADMISSION_CAPACITY', 20000))
+# Requests allowed to wait for capacity; more are rejected straight away
+ADMISSION_QUEUE_SIZE = int(os.getenv('ADMISSION_QUEUE_SIZE', 16))
+# Seconds a request may wait for capacity before it is rejected
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv('ADMISSION_QUEUE_TIMEOUT', 5))
+
+# Cost model: a slide costs as much as this many words (slide creation, header, footer, save)
+SLIDE_COST = 40
+# Tokens (words and punctuation marks) per slide with the default styles and template
+TOKENS_PER_SLIDE = 24
+# Bounds of the Retry-After value sent with a 503, in seconds
+MIN_RETRY_AFTER = 1
+MAX_RETRY_AFTER = 60
+
+class Overloaded(Exception):
+    """Raised when a request cannot be admitted; retry_after is a hint in seconds."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def predict_slides(content):
+    """Predict the slide count of a dictation from its token count, without measuring or laying it out."""
+    tokens = sum(1 for _ in TOKEN_PATTERN.finditer(content))
+    return max(1, math.ceil(tokens / TOKENS_PER_SLIDE))
+
+def estimate_cost(content):
+    """
+    Estimate the cost of generating a deck, in word equivalents.
+
+    Args:
+        content (str): The dictation content.
+
+    Returns:
+        int: The word count plus SLIDE_COST per predicted slide.
+    """
+    return len(content.split()) + SLIDE_COST * predict_slides(content)
+
+class AdmissionController:
+    """
+    Bounds the estimated cost of the generations running in one process.
+
+    A request is admitted at once if its cost fits in the remaining capacity.
+    Otherwise it waits in a FIFO queue until it fits or its deadline passes.
+    A request costlier than the whole capacity is admitted when nothing else
+    runs. When the queue is full or the deadline passes, Overloaded is raised
+    with a Retry-After hint. The hint comes from the throughput measured on
+    completed generations.
+    """
+
+    def __init__(self, capacity=ADMISSION_CAPACITY, queue_size=ADMISSION_QUEUE_SIZE, timeout=ADMISSION_QUEUE_TIMEOUT):
+        self.capacity = capacity
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self._condition = threading.Condition()
+        self._waiting = collections.deque()  # [cost] tickets of the queued requests, oldest first
+        self._in_flight = 0
+        self._running = 0
+        self._throughput = None  # Cost units per second, averaged over completed generations
+
+    def _fits(self, cost):
+        return self._running == 0 or self._in_flight + cost <= self.capacity
+
+    def retry_after(self):
+        """Return the seconds after which the current backlog should have drained."""
+        with self._condition:
+            backlog = self._in_flight + sum(ticket[0] for ticket in self._waiting)
+            throughput = self._throughput
+        if not throughput:
+            return MIN_RETRY_AFTER
+        return min(MAX_RETRY_AFTER, max(MIN_RETRY_AFTER, math.ceil(backlog / throughput)))
+
+    def _reject(self, reason, counter):
+        count(counter)
+        retry_after = self.retry_after()
+        logger.warning(f"Generation rejected ({reason}), retry after {retry_after}s")
+        return Overloaded(f"Server busy: {reason}.", retry_after)
+
+    def acquire(self, cost):
+        """
+        Wait until cost fits in the capacity and reserve it.
+
+        Raises:
+            Overloaded: If the queue is full or the deadline passes first.
+        """
+        if self.capacity <= 0:
+            return
+        with self._condition:
+            if not self._waiting and self._fits(cost):
+                self._reserve(cost)
+                count('admission_admitted')
+                return
+            if len(self._waiting) >= self.queue_size:
+                error = 'queue full'
+            else:
+                ticket = [cost]  # Unique per request, even for equal costs
+                self._waiting.append(ticket)
+                count('admission_queued')
+                deadline = time.monotonic() + self.timeout
+                try:
+                    while self._waiting[0] is not ticket or not self._fits(cost):
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._condition.wait(remaining)
+                    else:
+                        self._reserve(cost)
+                        count('admission_admitted')
+                        return
+                finally:
+                    self._waiting.remove(ticket)
+                    # The next request in line may fit now
+                    self._condition.notify_all()
+                error = 'queue timeout'
+        raise self._reject(error, 'admission_rejected' if error == 'queue full' else 'admission_timeouts')
+
+    def _reserve(self, cost):
+        self._in_flight += cost
+        self._running += 1
+
+    def release(self, cost, seconds=None):
+        """Return cost to the capacity, recording the throughput if the duration is known."""
+        if self.capacity <= 0:
+            return
+        with self._condition:
+            self._in_flight -= cost
+            self._running -= 1
+            if seconds:
+                rate = cost / seconds
+                self._throughput = rate if self._throughput is None else 0.8 * self._throughput + 0.2 * rate
+            self._condition.notify_all()
+
+    @contextlib.contextmanager
+    def admit(self, cost):
+        """Hold cost while the block runs; see acquire()."""
+        self.acquire(cost)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(cost, time.perf_counter() - start)
+
+    def info(self):
+        """Return the capacity in use and the number of running and waiting requests."""
+        with self._condition:
+            return {
+                'in_flight_cost': self._in_flight,
+                'running': self._running,
+                'waiting': len(self._waiting),
+                'capacity': self.capacity,
+            }
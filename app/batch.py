@@ -0,0 +1,272 @@
+"""
+Generate many dictation decks at once.
+
+Usage:
+    python -m app.batch INPUT -o OUTPUT.zip [-w WORKERS]
+
+INPUT is a directory of .txt files, a .zip of .txt files or a .jsonl file
+with one {"title": ..., "content": ...} object per line.
+"""
+import argparse
+import contextlib
+import functools
+import io
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from app.admission import Overloaded, estimate_cost
+from app.ingest import InputTooLarge, check_text
+from app.utils import split_title_content
+
+logger = logging.getLogger(__name__)
+
+BATCH_WORKERS = int(os.getenv('BATCH_WORKERS', os.cpu_count() or 1))
+# Maximum number of texts in one uploaded batch (0 disables the check)
+BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', 100))
+REPORT_NAME = 'report.json'
+
+class BatchTooLarge(ValueError):
+    """Raised when a batch holds more texts than allowed."""
+
+class BatchItem:
+    """One text of a batch, or the error that prevented reading it."""
+
+    __slots__ = ('name', 'title', 'content', 'error')
+
+    def __init__(self, name, title=None, content=None, error=None):
+        self.name = name
+        self.title = title
+        self.content = content
+        self.error = error
+
+def _text_item(name, data):
+    try:
+        title, content = split_title_content(data.decode('utf-8'))
+    except UnicodeDecodeError as e:
+        return BatchItem(name, error=f"Error reading file: {e}")
+    return BatchItem(name, title, content)
+
+def iter_directory(path):
+    """Yield the .txt files of a directory as batch items, sorted by name."""
+    for filename in sorted(os.listdir(path)):
+        if filename.lower().endswith('.txt'):
+            with open(os.path.join(path, filename), 'rb') as f:
+                yield _text_item(os.path.splitext(filename)[0], f.read())
+
+def iter_zip(file, max_bytes=None):
+    """
+    Yield the .txt members of a zip file (path or file object) as batch items.
+
+    Members whose uncompressed size is over max_bytes are not read; they are
+    yielded as failed items.
+    """
+    with zipfile.ZipFile(file) as archive:
+        for info in archive.infolist():
+            if not info.is_dir() and info.filename.lower().endswith('.txt'):
+                name = os.path.splitext(os.path.basename(info.filename))[0]
+                if max_bytes is not None and info.file_size > max_bytes:
+                    yield BatchItem(name, error=f"Input exceeds {max_bytes} bytes.")
+                    continue
+                # Reads stop at the declared size, so it bounds the memory used
+                yield _text_item(name, archive.read(info))
+
+def iter_jsonl(lines):
+    """Yield batch items from JSON lines of {"title", "content"} objects."""
+    for number, line in enumerate(lines, start=1):
+        if isinstance(line, bytes):
+            line = line.decode('utf-8', errors='replace')
+        if not line.strip():
+            continue
+        name = f"item-{number}"
+        try:
+            record = json.loads(line)
+            yield BatchItem(safe_name(record.get('name'), name), str(record['title']), str(record.get('content', '')))
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            yield BatchItem(name, error=f"Invalid JSON line: {e}")
+
+def limit_items(items, max_bytes, max_words=0, max_items=BATCH_MAX_ITEMS):
+    """
+    Apply the input limits of single submissions to every item of a batch.
+
+    Items over the byte or word limit are yielded as failed items.
+
+    Raises:
+        BatchTooLarge: When the batch holds more than max_items texts.
+    """
+    for number, item in enumerate(items, start=1):
+        if max_items and number > max_items:
+            raise BatchTooLarge(f"Batch exceeds {max_items} texts.")
+        if item.error is None:
+            try:
+                check_text(f"{item.title}\n{item.content}", max_bytes, max_words)
+            except InputTooLarge as e:
+                item = BatchItem(item.name, error=str(e))
+        yield item
+
+def iter_source(path):
+    """Yield batch items from a directory, .zip or .jsonl path."""
+    if os.path.isdir(path):
+        return iter_directory(path)
+    if path.lower().endswith('.zip'):
+        return iter_zip(path)
+    if path.lower().endswith('.jsonl'):
+        return _iter_jsonl_path(path)
+    raise ValueError(f"Unsupported batch input: {path}")
+
+def _iter_jsonl_path(path):
+    with open(path, 'rb') as f:
+        yield from iter_jsonl(f)
+
+def generate_item(title, content):
+    """
+    Generate one deck. Runs in a worker process.
+
+    Returns:
+        tuple: (pptx bytes, slide count, seconds spent)
+    """
+    from app.ppt_generator import create_ppt_dictation_from_text
+
+    start = time.perf_counter()
+    ppt = create_ppt_dictation_from_text(title, content)
+    ppt_io = io.BytesIO()
+    ppt.save(ppt_io)
+    return ppt_io.getvalue(), len(ppt.slides), time.perf_counter() - start
+
+def safe_name(name, default='dictation'):
+    """Return name as a plain file name, without directories, or default if nothing is left."""
+    if name is None:
+        return default
+    name = os.path.basename(str(name).replace('\\', '/')).strip()
+    return default if name in ('', '.', '..') else name
+
+def _unique_name(name, used):
+    name = candidate = safe_name(name)
+    suffix = 1
+    while candidate in used:
+        suffix += 1
+        candidate = f"{name}-{suffix}"
+    used.add(candidate)
+    return candidate
+
+def _release(admission, cost, submitted, future):
+    admission.release(cost, time.perf_counter() - submitted)
+
+def run_batch(items, output, workers=BATCH_WORKERS, submit=None, admission=None):
+    """
+    Generate a deck per item in a process pool and write them into a zip.
+
+    At most workers items are in the pool at a time. With an admission
+    controller, each item is admitted at its own cost before it is submitted
+    and released as soon as it finishes, so other requests get their turn
+    between the items of a batch. Once an item cannot be admitted, it and the
+    items after it are reported as failed.
+
+    Decks are added to the zip as they complete. A failing item is recorded in
+    the report and does not stop the others. The report is also written to
+    the zip as report.json.
+
+    Args:
+        items (iterable): BatchItem objects.
+        output (str or file): Path or file object of the zip to write.
+        workers (int): Number of items generated at once.
+        submit (callable): Runs a function with its arguments in a worker
+            process and returns its future; by default a pool of that many
+            processes is created for the batch.
+        admission (AdmissionController): Optional controller admitting each item.
+
+    Returns:
+        dict: The report, with per-item status, timing and errors.
+    """
+    start = time.perf_counter()
+    entries = []
+    used_names = set()
+    running = {}
+    busy = None
+
+    def collect(futures):
+        for future in futures:
+            name, submitted = running.pop(future)
+            try:
+                data, slides, seconds = future.result()
+            except Exception as e:
+                logger.error(f"Batch item {name} failed: {e}")
+                entries.append({'name': name, 'status': 'failed', 'error': str(e),
+                                'elapsed': round(time.perf_counter() - submitted, 3)})
+                continue
+            # .pptx files are already compressed
+            archive.writestr(f"{name}.pptx", data)
+            entries.append({'name': name, 'status': 'ok', 'slides': slides, 'bytes': len(data),
+                            'seconds': round(seconds, 3), 'elapsed': round(time.perf_counter() - submitted, 3)})
+
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_STORED) as archive, contextlib.ExitStack() as stack:
+        if submit is None:
+            context = multiprocessing.get_context('spawn')
+            submit = stack.enter_context(ProcessPoolExecutor(max_workers=workers, mp_context=context)).submit
+
+        for item in items:
+            name = _unique_name(item.name, used_names)
+            if item.error or busy:
+                entries.append({'name': name, 'status': 'failed', 'error': item.error or busy})
+                continue
+            while len(running) >= workers:
+                collect(wait(running, return_when=FIRST_COMPLETED).done)
+
+            cost = estimate_cost(item.content)
+            if admission is not None:
+                try:
+                    admission.acquire(cost)
+                except Overloaded as e:
+                    busy = str(e)
+                    entries.append({'name': name, 'status': 'failed', 'error': busy})
+                    continue
+            submitted = time.perf_counter()
+            try:
+                future = submit(generate_item, item.title, item.content)
+            except Exception:
+                if admission is not None:
+                    admission.release(cost)
+                raise
+            if admission is not None:
+                # Released by the pool as soon as the deck is done, even while this thread waits for capacity
+                future.add_done_callback(functools.partial(_release, admission, cost, submitted))
+            running[future] = (name, submitted)
+
+        while running:
+            collect(wait(running, return_when=FIRST_COMPLETED).done)
+
+        entries.sort(key=lambda entry: entry['name'])
+        report = {
+            'items': entries,
+            'succeeded': sum(1 for entry in entries if entry['status'] == 'ok'),
+            'failed': sum(1 for entry in entries if entry['status'] != 'ok'),
+            'workers': workers,
+            'seconds': round(time.perf_counter() - start, 3),
+        }
+        archive.writestr(REPORT_NAME, json.dumps(report, indent=2))
+
+    logger.info(f"Batch finished: {report['succeeded']} succeeded, {report['failed']} failed in {report['seconds']}s.")
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate dictation PowerPoints for many texts at once.")
+    parser.add_argument('input', help="Directory of .txt files, .zip of .txt files or .jsonl file")
+    parser.add_argument('-o', '--output', default='dictations.zip', help="Zip file to write (default: dictations.zip)")
+    parser.add_argument('-w', '--workers', type=int, default=BATCH_WORKERS, help="Number of worker processes")
+    args = parser.parse_args(argv)
+
+    report = run_batch(iter_source(args.input), args.output, args.workers)
+    for entry in report['items']:
+        if entry['status'] == 'ok':
+            print(f"{entry['name']}: {entry['slides']} slides, {entry['bytes']} bytes, {entry['seconds']}s")
+        else:
+            print(f"{entry['name']}: FAILED - {entry['error']}")
+    print(f"{report['succeeded']} succeeded, {report['failed']} failed in {report['seconds']}s -> {args.output}")
+    return 1 if report['failed'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
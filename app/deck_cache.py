@@ -0,0 +1,183 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the generated deck changes for the same input and styles
+TEMPLATE_VERSION = os.getenv('TEMPLATE_VERSION', '2')
+
+# In-memory tier bounds
+DECK_CACHE_MEMORY_BYTES = int(os.getenv('DECK_CACHE_MEMORY_BYTES', 64 * 1024 * 1024))  # Default 64 MB
+# Optional on-disk tier, disabled unless a directory is configured
+DECK_CACHE_DIR = os.getenv('DECK_CACHE_DIR')
+DECK_CACHE_DISK_BYTES = int(os.getenv('DECK_CACHE_DISK_BYTES', 512 * 1024 * 1024))  # Default 512 MB
+
+def styles_digest():
+    """Return the key of the current compiled styles."""
+    from app.styles import get_styles
+    return get_styles().key
+
+def deck_key(title, content, styles_id=None, template_id=None):
+    """
+    Build the cache key of a deck.
+
+    Args:
+        title (str): The presentation title.
+        content (str): The dictation content.
+        styles_id (str): Identifies the styles used; defaults to the key of the current styles.
+        template_id (str): Identifies the base template; defaults to the configured one and the TEXT_STYLES mode.
+
+    Returns:
+        str: A hex digest of (title, content, styles, base template, template version).
+    """
+    digest = hashlib.sha256()
+    if template_id is None:
+        from app.template_cache import template_digest
+        from app.xml_renderer import TEXT_STYLES
+        # Shared text styles change the XML of the deck, though not its look
+        template_id = f"{template_digest()}:{TEXT_STYLES}"
+    for part in (TEMPLATE_VERSION, styles_id or styles_digest(), template_id, title, content):
+        encoded = part.encode('utf-8')
+        digest.update(len(encoded).to_bytes(8, 'big'))
+        digest.update(encoded)
+    return digest.hexdigest()
+
+class DeckCache:
+    """
+    Two-tier cache of generated .pptx bytes keyed by deck_key().
+
+    The memory tier is an LRU bounded by total size. The disk tier, when a
+    directory is given, evicts the least recently used files once it grows
+    past its size limit.
+    """
+
+    def __init__(self, memory_bytes=DECK_CACHE_MEMORY_BYTES, directory=DECK_CACHE_DIR, disk_bytes=DECK_CACHE_DISK_BYTES):
+        self.memory_bytes = memory_bytes
+        self.directory = directory
+        self.disk_bytes = disk_bytes
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def get(self, key):
+        """Return the cached bytes for key, or None."""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return data
+
+        data = self._read_disk(key)
+        if data is not None:
+            self._store_memory(key, data)
+            with self._lock:
+                self.disk_hits += 1
+            return data
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, data):
+        """Store the deck bytes in both tiers."""
+        self._store_memory(key, data)
+        self._write_disk(key, data)
+
+    def get_or_create(self, key, factory):
+        """Return the cached deck for key, calling factory() to build and store it on a miss."""
+        data = self.get(key)
+        if data is None:
+            data = factory()
+            self.put(key, data)
+        return data
+
+    def info(self):
+        """Return cache counters and the size of the memory tier."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'entries': len(self._memory),
+                'memory_bytes': self._memory_size,
+            }
+
+    def clear(self):
+        """Empty the memory tier and reset the counters."""
+        with self._lock:
+            self._memory.clear()
+            self._memory_size = 0
+            self.hits = self.disk_hits = self.misses = 0
+
+    def _store_memory(self, key, data):
+        if len(data) > self.memory_bytes:
+            return
+        with self._lock:
+            previous = self._memory.pop(key, None)
+            if previous is not None:
+                self._memory_size -= len(previous)
+            self._memory[key] = data
+            self._memory_size += len(data)
+            while self._memory_size > self.memory_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_size -= len(evicted)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.pptx")
+
+    def _read_disk(self, key):
+        if not self.directory:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)  # Mark as recently used
+            return data
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning(f"Failed to read cached deck {path}: {e}")
+            return None
+
+    def _write_disk(self, key, data):
+        if not self.directory or len(data) > self.disk_bytes:
+            return
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+            self._evict_disk()
+        except OSError as e:
+            logger.warning(f"Failed to write cached deck: {e}")
+
+    def _evict_disk(self):
+        entries = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.pptx'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        entries.sort()
+        while total > self.disk_bytes and entries:
+            _, size, path = entries.pop(0)
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+# Shared cache used by the routes
+deck_cache = DeckCache()
@@ -1,10 +1,28 @@
-from flask_mail import Mail, Message
 from flask import current_app
 
-def send_email(recipient, subject, body, attachment=None):
-    mail = Mail(current_app)
+PPTX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.presentationml.presentation'
+
+def build_message(recipient, subject, body, attachment=None):
+    """Build the email, with the .pptx bytes attached if given. Needs an app context."""
+    from flask_mail import Message
+
     msg = Message(subject, recipients=[recipient])
     msg.body = body
     if attachment:
-        # Assuming attachment is a BytesIO object
-        msg.attach('presentation.pptx', 'application/vnd.openxmlformats-officedocument.presentationml.presentation', attachment.read())
+        msg.attach('presentation.pptx', PPTX_MIMETYPE, attachment)
+    return msg
+
+def send_email(recipient, subject, body, token=None):
+    """
+    Queue an email for background delivery.
+
+    Args:
+        recipient (str): The recipient's address.
+        subject (str): The subject line.
+        body (str): The plain text body.
+        token (str): Optional submission token whose stored .pptx is attached.
+
+    Returns:
+        str: The id under which the delivery status can be queried.
+    """
+    return current_app.extensions['mail_queue'].enqueue(recipient, subject, body, token)
@@ -0,0 +1,103 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of measured (token, font, size) entries kept in memory
+FONT_METRICS_CACHE_SIZE = int(os.getenv('FONT_METRICS_CACHE_SIZE', 50000))
+
+class FontMetricsCache:
+    """
+    Process-wide cache of loaded fonts and measured text sizes.
+
+    Fonts are kept for the lifetime of the process, keyed by (path, size).
+    Measurements are kept in a bounded LRU keyed by (text, path, size).
+    """
+
+    def __init__(self, maxsize=FONT_METRICS_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._fonts = {}
+        self._sizes = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.font_loads = 0
+
+    def get_font(self, font_path, font_size):
+        """Return a loaded FreeTypeFont for (font_path, font_size), loading it once."""
+        key = (font_path, font_size)
+        font = self._fonts.get(key)
+        if font is None:
+            from PIL import ImageFont
+
+            font = ImageFont.truetype(font_path, font_size)
+            with self._lock:
+                self._fonts[key] = font
+                self.font_loads += 1
+            logger.debug(f"Loaded font {font_path} at size {font_size}")
+        return font
+
+    def measure(self, text, font_path, font_size):
+        """
+        Return the padded (width, height) of text in the given font.
+
+        Args:
+            text (str): The text to measure.
+            font_path (str): Path to the TrueType font file.
+            font_size (int): Font size in points.
+
+        Returns:
+            tuple: (width, height) including the 10 unit padding.
+        """
+        key = (text, font_path, font_size)
+        with self._lock:
+            size = self._sizes.get(key)
+            if size is not None:
+                self._sizes.move_to_end(key)
+                self.hits += 1
+                return size
+            self.misses += 1
+
+        bbox = self.get_font(font_path, font_size).getbbox(text)
+        # Add some padding
+        size = (bbox[2] - bbox[0] + 10, bbox[3] - bbox[1] + 10)
+
+        with self._lock:
+            self._sizes[key] = size
+            if len(self._sizes) > self.maxsize:
+                self._sizes.popitem(last=False)
+        return size
+
+    def info(self):
+        """Return a dict with the current hit/miss counters and cache sizes."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'font_loads': self.font_loads,
+                'fonts': len(self._fonts),
+                'entries': len(self._sizes),
+                'maxsize': self.maxsize,
+            }
+
+    def clear(self):
+        """Drop all cached fonts and measurements and reset the counters."""
+        with self._lock:
+            self._fonts.clear()
+            self._sizes.clear()
+            self.hits = 0
+            self.misses = 0
+            self.font_loads = 0
+
+# Shared cache used by the generator
+font_metrics = FontMetricsCache()
+
+def cache_info():
+    """Return hit/miss counters of the shared font metrics cache."""
+    return font_metrics.info()
+
+def clear_cache():
+    """Clear the shared font metrics cache."""
+    font_metrics.clear()
@@ -0,0 +1,230 @@
+import copy
+import io
+import logging
+import os
+import struct
+import threading
+import zipfile
+import zlib
+from collections import OrderedDict
+from app.instrumentation import count, span
+from app.streaming import DeckTooLarge
+
+logger = logging.getLogger(__name__)
+
+# Rendered decks whose layout and slides are kept for regenerating edited
+# versions of them; 0 disables incremental regeneration
+INCREMENTAL_SNAPSHOTS = int(os.getenv('INCREMENTAL_SNAPSHOTS', 16))
+
+# Zip record layouts, as written by zipfile
+LOCAL_HEADER_SIZE = 30  # Fixed part of a local file header, before the name and extra field
+CENTRAL_HEADER = struct.Struct('<4s4B4HL2L5H2L')
+END_RECORD = struct.Struct('<4s4H2LH')
+
+class DeckSnapshot:
+    """The layout plan, slide member names and saved bytes of a rendered deck."""
+
+    __slots__ = ('plan', 'members', 'data')
+
+    def __init__(self, plan, members, data):
+        self.plan = plan
+        self.members = members
+        self.data = data
+
+class SnapshotStore:
+    """LRU of DeckSnapshot objects keyed by deck_key()."""
+
+    def __init__(self, size=INCREMENTAL_SNAPSHOTS):
+        self.size = size
+        self._lock = threading.Lock()
+        self._snapshots = OrderedDict()
+
+    def get(self, key):
+        """Return the snapshot stored under key, or None."""
+        with self._lock:
+            snapshot = self._snapshots.get(key)
+            if snapshot is not None:
+                self._snapshots.move_to_end(key)
+            return snapshot
+
+    def put(self, key, snapshot):
+        if self.size <= 0:
+            return
+        with self._lock:
+            self._snapshots[key] = snapshot
+            self._snapshots.move_to_end(key)
+            while len(self._snapshots) > self.size:
+                self._snapshots.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._snapshots.clear()
+
+    def __len__(self):
+        return len(self._snapshots)
+
+# Shared store used by the routes
+snapshots = SnapshotStore()
+
+def render_snapshot(title, content, limit=None):
+    """
+    Render a deck from scratch and keep what regenerate() needs.
+
+    Args:
+        title (str): The presentation title.
+        content (str): The dictation content.
+        limit (int): Maximum size of the saved deck in bytes, or None.
+
+    Long decks are rendered by the slide pool when PARALLEL_WORKERS is set
+    (see render_parallel()), with the same output.
+
+    Returns:
+        DeckSnapshot: The layout, slide member names and .pptx bytes.
+
+    Raises:
+        DeckTooLarge: As soon as the saved deck goes over the limit.
+    """
+    from app.parallel import render_parallel, use_parallel
+    from app.ppt_generator import render_dictation
+    from app.streaming import save_presentation
+
+    if use_parallel(content):
+        rendered = render_parallel(title, content)
+        if rendered is not None:
+            if limit is not None and len(rendered[2]) > limit:
+                raise DeckTooLarge(f"Deck exceeds {limit} bytes.")
+            return DeckSnapshot(*rendered)
+
+    ppt, plan, slides = render_dictation(title, content)
+    members = [slide.part.partname.membername for slide in slides]
+    file, _ = save_presentation(ppt, limit)
+    with file:
+        return DeckSnapshot(plan, members, file.read())
+
+def regenerate(previous, title, content, limit=None):
+    """
+    Render an edited version of a snapshotted deck, reusing its unchanged slides.
+
+    The layout is updated from the first changed line (see update_layout()),
+    then only the slides whose boxes differ are rendered, and they replace
+    their members in a copy of the previous .pptx. Other members are copied
+    without being decompressed. Every part of the result is byte for byte the
+    one a full regeneration would write. A different title or slide count
+    changes every slide, so those fall back to a full render.
+
+    Args:
+        previous (DeckSnapshot): The deck before the edit, rendered with the current styles and template.
+        title (str): The presentation title.
+        content (str): The edited dictation content.
+        limit (int): Maximum size of the saved deck in bytes, or None.
+
+    Returns:
+        DeckSnapshot: The regenerated deck.
+
+    Raises:
+        DeckTooLarge: If the deck goes over the limit.
+    """
+    from app.layout import update_layout
+    from app.ppt_generator import render_slide_parts
+    from app.styles import get_styles
+
+    old = previous.plan
+    if old.title != title:
+        count('incremental_fallbacks')
+        return render_snapshot(title, content, limit)
+
+    styles = get_styles()
+    plan = update_layout(old, content, styles)
+    if plan.slide_count != old.slide_count:
+        count('incremental_fallbacks')
+        return render_snapshot(title, content, limit)
+
+    changed = [index for index, (old_range, new_range) in enumerate(zip(old.slide_ranges(), plan.slide_ranges()))
+               if not plan.same_entries(*new_range, old, *old_range)]
+    data = previous.data
+    if changed:
+        with span('shapes'):
+            parts = render_slide_parts(plan, changed, styles)
+        with span('save'):
+            data = replace_members(data, {previous.members[index]: part for index, part in parts.items()})
+    count('slides_rendered', len(changed))
+    count('slides_reused', plan.slide_count - len(changed))
+    logger.debug(f"Regenerated {len(changed)} of {plan.slide_count} slides")
+
+    if limit is not None and len(data) > limit:
+        raise DeckTooLarge(f"Deck exceeds {limit} bytes.")
+    return DeckSnapshot(plan, previous.members, data)
+
+def replace_members(data, replacements):
+    """
+    Return a copy of a zip archive with some members' contents replaced.
+
+    Members keep their order, names and timestamps. Replaced members are
+    deflated like zipfile does; the others are copied as stored, so the cost
+    does not grow with the size of the unchanged members.
+
+    Args:
+        data (bytes): The archive, without ZIP64 records.
+        replacements (dict): New contents (bytes) per member name.
+
+    Returns:
+        bytes: The new archive.
+    """
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        infos = archive.infolist()
+
+    members = []
+    for info in infos:
+        blob = replacements.get(info.filename)
+        if blob is None:
+            members.append((info, raw_record(data, info)))
+        else:
+            members.append(member_record(info, *deflate(blob)))
+    return write_archive(members)
+
+def deflate(blob):
+    """Return (compressed bytes, CRC-32, size) of blob, deflated like zipfile does."""
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    return compressor.compress(blob) + compressor.flush(), zlib.crc32(blob), len(blob)
+
+def member_record(info, compressed, crc, size, filename=None):
+    """Return an updated copy of info and the local record of a deflated member, optionally renamed."""
+    info = copy.copy(info)
+    if filename is not None:
+        info.filename = filename
+    info.compress_type = zipfile.ZIP_DEFLATED
+    info.flag_bits &= ~0x08  # Sizes are in the header, no data descriptor follows
+    info.CRC = crc
+    info.file_size = size
+    info.compress_size = len(compressed)
+    return info, info.FileHeader() + compressed
+
+def raw_record(data, info):
+    """Return the local record of a member of the archive data, as stored."""
+    start = info.header_offset
+    name_length, extra_length = struct.unpack_from('<2H', data, start + 26)
+    return data[start:start + LOCAL_HEADER_SIZE + name_length + extra_length + info.compress_size]
+
+def central_record(info, offset):
+    year, month, day, hour, minute, second = info.date_time
+    name = info.filename.encode('utf-8')
+    return CENTRAL_HEADER.pack(
+        b'PK\x01\x02', info.create_version, info.create_system, info.extract_version, info.reserved,
+        info.flag_bits, info.compress_type, hour << 11 | minute << 5 | second // 2,
+        (year - 1980) << 9 | month << 5 | day, info.CRC, info.compress_size, info.file_size,
+        len(name), len(info.extra), len(info.comment), 0, info.internal_attr, info.external_attr, offset,
+    ) + name + info.extra + info.comment
+
+def write_archive(members):
+    """Return a zip archive of (info, local record) pairs, written in order, with its central directory."""
+    output = []
+    central = []
+    offset = 0
+    for info, record in members:
+        central.append(central_record(info, offset))
+        output.append(record)
+        offset += len(record)
+    directory = b''.join(central)
+    output.append(directory)
+    output.append(END_RECORD.pack(b'PK\x05\x06', 0, 0, len(central), len(central), len(directory), offset, 0))
+    return b''.join(output)
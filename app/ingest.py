@@ -0,0 +1,114 @@
+import codecs
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Size of the chunks read from uploaded files
+INGEST_CHUNK_SIZE = int(os.getenv('INGEST_CHUNK_SIZE', 64 * 1024))
+# Maximum number of words accepted in one submission (0 disables the check)
+MAX_INPUT_WORDS = int(os.getenv('MAX_INPUT_WORDS', 0))
+
+class InputTooLarge(ValueError):
+    """Raised as soon as an input goes over the configured byte or word limit."""
+
+def _check_words(words, max_words):
+    if max_words and words > max_words:
+        raise InputTooLarge(f"Input exceeds {max_words} words.")
+
+def iter_upload_text(stream, max_bytes, chunk_size=INGEST_CHUNK_SIZE):
+    """
+    Read an uploaded file in chunks and yield its text as it is decoded.
+
+    The bytes are decoded incrementally as UTF-8, and the size limit is
+    checked while reading, so an oversized upload is rejected on its first
+    chunk over the limit rather than after being buffered.
+
+    Args:
+        stream: Binary file object of the upload.
+        max_bytes (int): Maximum number of bytes read.
+        chunk_size (int): Number of bytes read at a time.
+
+    Raises:
+        InputTooLarge: When the size limit is exceeded.
+        UnicodeDecodeError: When the upload is not valid UTF-8.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    total = 0
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        total += len(chunk)
+        if total > max_bytes:
+            raise InputTooLarge(f"Input exceeds {max_bytes} bytes.")
+        yield decoder.decode(chunk)
+    yield decoder.decode(b'', final=True)
+
+def iter_upload_lines(stream, max_bytes, max_words=MAX_INPUT_WORDS, chunk_size=INGEST_CHUNK_SIZE):
+    """
+    Read an uploaded file in chunks and yield its stripped lines.
+
+    The limits are checked while reading (see iter_upload_text()), so an
+    oversized upload is rejected as soon as it goes over one.
+
+    Args:
+        stream: Binary file object of the upload.
+        max_bytes (int): Maximum number of bytes read.
+        max_words (int): Maximum number of words, 0 for no limit.
+        chunk_size (int): Number of bytes read at a time.
+
+    Raises:
+        InputTooLarge: When a limit is exceeded.
+        UnicodeDecodeError: When the upload is not valid UTF-8.
+    """
+    pending = ''
+    words = 0
+    for text in iter_upload_text(stream, max_bytes, chunk_size):
+        lines = (pending + text).splitlines(keepends=True)
+        pending = ''
+        # Keep the last line back unless it is complete; a trailing '\r' may be part of '\r\n'
+        if lines and (lines[-1] == lines[-1].rstrip('\r\n') or lines[-1].endswith('\r')):
+            pending = lines.pop()
+        for line in lines:
+            line = line.strip()
+            words += len(line.split())
+            _check_words(words, max_words)
+            yield line
+
+    for line in pending.splitlines():
+        line = line.strip()
+        words += len(line.split())
+        _check_words(words, max_words)
+        yield line
+
+def iter_text_lines(text, max_bytes, max_words=MAX_INPUT_WORDS):
+    """Yield the stripped lines of text already in memory, applying the same limits."""
+    if len(text) > max_bytes or len(text.encode('utf-8')) > max_bytes:
+        raise InputTooLarge(f"Input exceeds {max_bytes} bytes.")
+    words = 0
+    for line in text.splitlines():
+        line = line.strip()
+        words += len(line.split())
+        _check_words(words, max_words)
+        yield line
+
+def check_text(text, max_bytes, max_words=MAX_INPUT_WORDS):
+    """Raise InputTooLarge if text already in memory goes over the byte or word limit."""
+    if len(text) > max_bytes or len(text.encode('utf-8')) > max_bytes:
+        raise InputTooLarge(f"Input exceeds {max_bytes} bytes.")
+    _check_words(len(text.split()), max_words)
+
+def read_submission(lines):
+    """
+    Build the (title, content) of a submission from its stripped lines.
+
+    Args:
+        lines (iterable): Lines as produced by iter_upload_lines or iter_text_lines.
+
+    Returns:
+        tuple: (title, content) where the first line is the title.
+    """
+    lines = iter(lines)
+    title = next(lines, "")
+    return title, "\n".join(lines)
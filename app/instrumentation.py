@@ -0,0 +1,166 @@
+import contextlib
+import contextvars
+import threading
+import time
+
+# Upper bounds (in seconds) of the histogram buckets
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense."""
+
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+class Registry:
+    """Process-wide stage histograms and counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages = {}
+        self.requests = {}
+        self.counters = {}
+
+    def observe_stage(self, name, seconds):
+        with self._lock:
+            histogram = self.stages.get(name)
+            if histogram is None:
+                histogram = self.stages[name] = Histogram()
+            histogram.observe(seconds)
+
+    def observe_request(self, endpoint, seconds):
+        with self._lock:
+            histogram = self.requests.get(endpoint)
+            if histogram is None:
+                histogram = self.requests[endpoint] = Histogram()
+            histogram.observe(seconds)
+
+    def increment(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def clear(self):
+        with self._lock:
+            self.stages.clear()
+            self.requests.clear()
+            self.counters.clear()
+
+registry = Registry()
+
+class RequestMetrics:
+    """Stage durations and counters collected during one request."""
+
+    __slots__ = ('durations', 'counters')
+
+    def __init__(self):
+        self.durations = {}
+        self.counters = {}
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+@contextlib.contextmanager
+def span(name):
+    """Time a pipeline stage, recording it for the current request and the histograms."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        registry.observe_stage(name, elapsed)
+        current = _current.get()
+        if current is not None:
+            current.durations[name] = current.durations.get(name, 0.0) + elapsed
+
+def count(name, value=1):
+    """Add value to a counter, for the current request and the process totals."""
+    registry.increment(name, value)
+    current = _current.get()
+    if current is not None:
+        current.counters[name] = current.counters.get(name, 0) + value
+
+def server_timing(metrics):
+    """Format collected durations (and counters as descriptions) as a Server-Timing header."""
+    entries = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in metrics.durations.items()]
+    entries.extend(f'{name};desc="{value}"' for name, value in metrics.counters.items())
+    return ", ".join(entries)
+
+def _format_histogram(lines, metric, label, key, histogram):
+    cumulative = 0
+    for bound, bucket in zip(BUCKETS, histogram.counts):
+        cumulative += bucket
+        lines.append(f'{metric}_bucket{{{label}="{key}",le="{bound}"}} {cumulative}')
+    lines.append(f'{metric}_bucket{{{label}="{key}",le="+Inf"}} {histogram.count}')
+    lines.append(f'{metric}_sum{{{label}="{key}"}} {histogram.sum:.6f}')
+    lines.append(f'{metric}_count{{{label}="{key}"}} {histogram.count}')
+
+def render_metrics(gauges=None):
+    """
+    Render the registry in the Prometheus text exposition format.
+
+    Args:
+        gauges (dict): Extra name -> value pairs exported as gauges.
+
+    Returns:
+        str: The metrics page.
+    """
+    lines = []
+    with registry._lock:
+        lines.append('# HELP dictation_stage_seconds Time spent in each generation stage.')
+        lines.append('# TYPE dictation_stage_seconds histogram')
+        for name, histogram in sorted(registry.stages.items()):
+            _format_histogram(lines, 'dictation_stage_seconds', 'stage', name, histogram)
+
+        lines.append('# HELP dictation_request_seconds Time spent handling requests per endpoint.')
+        lines.append('# TYPE dictation_request_seconds histogram')
+        for name, histogram in sorted(registry.requests.items()):
+            _format_histogram(lines, 'dictation_request_seconds', 'endpoint', name, histogram)
+
+        for name, value in sorted(registry.counters.items()):
+            lines.append(f'# TYPE dictation_{name}_total counter')
+            lines.append(f'dictation_{name}_total {value}')
+
+    for name, value in sorted((gauges or {}).items()):
+        lines.append(f'# TYPE dictation_{name} gauge')
+        lines.append(f'dictation_{name} {value}')
+    return "\n".join(lines) + "\n"
+
+def init_app(app, endpoints=('index.index_route', 'index.download_file', 'index.preview_route')):
+    """Collect metrics for every request and add Server-Timing headers to the given endpoints."""
+    from flask import g, request
+
+    @app.before_request
+    def start_request_metrics():
+        g.request_metrics = RequestMetrics()
+        g.request_metrics_token = _current.set(g.request_metrics)
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def add_server_timing(response):
+        metrics = g.pop('request_metrics', None)
+        if metrics is None:
+            return response
+        elapsed = time.perf_counter() - g.pop('request_start')
+        registry.observe_request(request.endpoint or 'unknown', elapsed)
+        if request.endpoint in endpoints:
+            metrics.durations['total'] = elapsed
+            response.headers['Server-Timing'] = server_timing(metrics)
+        return response
+
+    @app.teardown_request
+    def end_request_metrics(error=None):
+        # Runs even when the view raised and after_request was skipped
+        token = g.pop('request_metrics_token', None)
+        if token is not None:
+            _current.reset(token)
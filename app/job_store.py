@@ -0,0 +1,279 @@
+import abc
+import contextlib
+import logging
+import os
+import secrets
+import sqlite3
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Where submissions and generated files are kept, and for how long
+JOB_STORE_PATH = os.getenv('JOB_STORE_PATH', os.path.join(tempfile.gettempdir(), 'dictation-jobs.sqlite3'))
+JOB_STORE_TTL = int(os.getenv('JOB_STORE_TTL', 24 * 60 * 60))  # Default 1 day
+JOB_STORE_SWEEP_INTERVAL = int(os.getenv('JOB_STORE_SWEEP_INTERVAL', 10 * 60))  # Default 10 minutes
+
+class JobStore(abc.ABC):
+    """
+    Interface of the server-side store for submissions and generated artefacts.
+
+    A submission holds the title and content entered by the user and is
+    identified by an opaque token, which is all the session cookie carries.
+    Artefacts are named blobs (such as the generated .pptx) attached to a token.
+    A generation job for a submission shares its token and records a status
+    and slide progress. Outgoing emails record their delivery status and
+    attempts under their own id, and the token of the submission whose deck
+    they attach. Everything expires after the store's TTL.
+
+    Backends implement the abstract methods; one that misses any fails when
+    it is created.
+    """
+
+    def __init__(self, ttl=JOB_STORE_TTL):
+        self.ttl = ttl
+        self._sweeper = None
+        self._stop = threading.Event()
+
+    def create_submission(self, title, content):
+        """Store a submission and return its token."""
+        token = secrets.token_urlsafe(24)
+        self.put_submission(token, title, content)
+        return token
+
+    @abc.abstractmethod
+    def put_submission(self, token, title, content):
+        """Create or replace the submission stored under token."""
+
+    @abc.abstractmethod
+    def get_submission(self, token):
+        """Return (title, content) for token, or None if unknown or expired."""
+
+    @abc.abstractmethod
+    def put_artefact(self, token, name, data):
+        """Create or replace the artefact name of token."""
+
+    @abc.abstractmethod
+    def get_artefact(self, token, name):
+        """Return the artefact bytes, or None if unknown or expired."""
+
+    @abc.abstractmethod
+    def put_job(self, token, status, slides_done=0, slides_total=0, error=None):
+        """Create or replace the generation job of a submission."""
+
+    @abc.abstractmethod
+    def update_job(self, token, status=None, slides_done=None, slides_total=None, error=None):
+        """Update the given fields of a job, leaving the others unchanged."""
+
+    @abc.abstractmethod
+    def get_job(self, token):
+        """Return the job as a dict, or None if unknown or expired."""
+
+    @abc.abstractmethod
+    def put_mail(self, mail_id, recipient, status, attempts=0, error=None, subject=None, body=None, token=None, owner=None):
+        """Create or replace an outgoing email: its delivery status, message, attached submission and owning process."""
+
+    @abc.abstractmethod
+    def update_mail(self, mail_id, status=None, attempts=None, error=None):
+        """Update the given fields of an email's delivery status."""
+
+    @abc.abstractmethod
+    def get_mail(self, mail_id):
+        """Return the delivery status of an email as a dict, or None if unknown or expired."""
+
+    @abc.abstractmethod
+    def pending_mail(self):
+        """Return the emails still queued, being sent or retrying, as dicts with their message, token and owner."""
+
+    @abc.abstractmethod
+    def claim_mail(self, mail_id, owner, previous_owner):
+        """Make owner the owner of an email if previous_owner still is; return True if it did."""
+
+    @abc.abstractmethod
+    def delete(self, token):
+        """Delete a submission with its job and artefacts."""
+
+    @abc.abstractmethod
+    def sweep(self):
+        """Delete expired entries and return how many submissions were removed."""
+
+    def start_sweeper(self, interval=JOB_STORE_SWEEP_INTERVAL):
+        """Run sweep() every interval seconds in a daemon thread."""
+        if self._sweeper is not None:
+            return
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    removed = self.sweep()
+                    if removed:
+                        logger.info(f"Job store sweeper removed {removed} expired submissions.")
+                except Exception as e:
+                    logger.error(f"Job store sweep failed: {e}")
+
+        self._sweeper = threading.Thread(target=run, name='job-store-sweeper', daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self):
+        self._stop.set()
+
+class SQLiteJobStore(JobStore):
+    """Job store backed by a local SQLite file, shareable between processes."""
+
+    def __init__(self, path=JOB_STORE_PATH, ttl=JOB_STORE_TTL):
+        super().__init__(ttl)
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS submissions ('
+                'token TEXT PRIMARY KEY, title TEXT NOT NULL, content TEXT NOT NULL, expires REAL NOT NULL)'
+            )
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS artefacts ('
+                'token TEXT NOT NULL, name TEXT NOT NULL, data BLOB NOT NULL, expires REAL NOT NULL, '
+                'PRIMARY KEY (token, name))'
+            )
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS jobs ('
+                'token TEXT PRIMARY KEY, status TEXT NOT NULL, slides_done INTEGER NOT NULL, '
+                'slides_total INTEGER NOT NULL, error TEXT, expires REAL NOT NULL)'
+            )
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS mail ('
+                'id TEXT PRIMARY KEY, recipient TEXT NOT NULL, status TEXT NOT NULL, '
+                'attempts INTEGER NOT NULL, error TEXT, expires REAL NOT NULL, '
+                'subject TEXT, body TEXT, token TEXT, owner TEXT)'
+            )
+
+    @contextlib.contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:  # Commit on success, roll back on error
+                yield conn
+        finally:
+            conn.close()
+
+    def put_submission(self, token, title, content):
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO submissions (token, title, content, expires) VALUES (?, ?, ?, ?)',
+                (token, title, content, time.time() + self.ttl),
+            )
+
+    def get_submission(self, token):
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT title, content FROM submissions WHERE token = ? AND expires > ?',
+                (token, time.time()),
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def put_artefact(self, token, name, data):
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO artefacts (token, name, data, expires) VALUES (?, ?, ?, ?)',
+                (token, name, sqlite3.Binary(data), time.time() + self.ttl),
+            )
+
+    def get_artefact(self, token, name):
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT data FROM artefacts WHERE token = ? AND name = ? AND expires > ?',
+                (token, name, time.time()),
+            ).fetchone()
+        return bytes(row[0]) if row else None
+
+    def put_job(self, token, status, slides_done=0, slides_total=0, error=None):
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO jobs (token, status, slides_done, slides_total, error, expires) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (token, status, slides_done, slides_total, error, time.time() + self.ttl),
+            )
+
+    def update_job(self, token, status=None, slides_done=None, slides_total=None, error=None):
+        fields = {'status': status, 'slides_done': slides_done, 'slides_total': slides_total, 'error': error}
+        fields = {name: value for name, value in fields.items() if value is not None}
+        if not fields:
+            return
+        assignments = ', '.join(f"{name} = ?" for name in fields)
+        with self._connect() as conn:
+            conn.execute(f'UPDATE jobs SET {assignments} WHERE token = ?', (*fields.values(), token))
+
+    def get_job(self, token):
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT status, slides_done, slides_total, error FROM jobs WHERE token = ? AND expires > ?',
+                (token, time.time()),
+            ).fetchone()
+        if not row:
+            return None
+        return {'id': token, 'status': row[0], 'slides_done': row[1], 'slides_total': row[2], 'error': row[3]}
+
+    def put_mail(self, mail_id, recipient, status, attempts=0, error=None, subject=None, body=None, token=None, owner=None):
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO mail (id, recipient, status, attempts, error, expires, subject, body, token, owner) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (mail_id, recipient, status, attempts, error, time.time() + self.ttl, subject, body, token, owner),
+            )
+
+    def update_mail(self, mail_id, status=None, attempts=None, error=None):
+        fields = {'status': status, 'attempts': attempts, 'error': error}
+        fields = {name: value for name, value in fields.items() if value is not None}
+        if not fields:
+            return
+        assignments = ', '.join(f"{name} = ?" for name in fields)
+        with self._connect() as conn:
+            conn.execute(f'UPDATE mail SET {assignments} WHERE id = ?', (*fields.values(), mail_id))
+
+    def get_mail(self, mail_id):
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT recipient, status, attempts, error FROM mail WHERE id = ? AND expires > ?',
+                (mail_id, time.time()),
+            ).fetchone()
+        if not row:
+            return None
+        return {'id': mail_id, 'recipient': row[0], 'status': row[1], 'attempts': row[2], 'error': row[3]}
+
+    def pending_mail(self):
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, recipient, subject, body, token, attempts, owner FROM mail "
+                "WHERE status IN ('queued', 'sending', 'retrying') AND expires > ?",
+                (time.time(),),
+            ).fetchall()
+        return [{'id': row[0], 'recipient': row[1], 'subject': row[2], 'body': row[3], 'token': row[4],
+                 'attempts': row[5], 'owner': row[6]}
+                for row in rows]
+
+    def claim_mail(self, mail_id, owner, previous_owner):
+        with self._connect() as conn:
+            return conn.execute(
+                'UPDATE mail SET owner = ? WHERE id = ? AND owner IS ?', (owner, mail_id, previous_owner)
+            ).rowcount == 1
+
+    def delete(self, token):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM jobs WHERE token = ?', (token,))
+            conn.execute('DELETE FROM artefacts WHERE token = ?', (token,))
+            conn.execute('DELETE FROM submissions WHERE token = ?', (token,))
+
+    def sweep(self):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute('DELETE FROM jobs WHERE expires <= ?', (now,))
+            conn.execute('DELETE FROM mail WHERE expires <= ?', (now,))
+            conn.execute('DELETE FROM artefacts WHERE expires <= ?', (now,))
+            return conn.execute('DELETE FROM submissions WHERE expires <= ?', (now,)).rowcount
+
+def create_job_store(path=JOB_STORE_PATH, ttl=JOB_STORE_TTL):
+    """Create the configured job store backend."""
+    return SQLiteJobStore(path, ttl)
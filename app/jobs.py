@@ -0,0 +1,103 @@
+import io
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# 'inline' renders in the request thread, 'async' hands generation to a process pool
+GENERATION_MODE = os.getenv('GENERATION_MODE', 'inline')
+GENERATION_WORKERS = int(os.getenv('GENERATION_WORKERS', os.cpu_count() or 1))
+GENERATION_START_METHOD = os.getenv('GENERATION_START_METHOD', 'spawn')
+
+# Minimum delay between two progress updates written by a worker
+PROGRESS_INTERVAL = 0.5
+
+# Job statuses
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+def run_generation_job(store_path, token):
+    """
+    Generate the deck of a stored submission and store it as the 'pptx' artefact.
+
+    Runs in a worker process. Status and slide progress are written to the job
+    store so any web process can report them.
+
+    Args:
+        store_path (str): Path of the SQLite job store.
+        token (str): Token of the submission and its job.
+    """
+    from app.job_store import SQLiteJobStore
+    from app.ppt_generator import create_ppt_dictation_from_text
+
+    job_store = SQLiteJobStore(store_path)
+    try:
+        submission = job_store.get_submission(token)
+        if submission is None:
+            raise LookupError("Submission expired before generation started.")
+        job_store.update_job(token, status=RUNNING)
+
+        last_update = [0.0]
+
+        def progress(slides_done, slides_total):
+            now = time.monotonic()
+            if slides_done in (0, slides_total) or now - last_update[0] >= PROGRESS_INTERVAL:
+                last_update[0] = now
+                job_store.update_job(token, slides_done=slides_done, slides_total=slides_total)
+
+        ppt = create_ppt_dictation_from_text(*submission, progress=progress)
+        ppt_io = io.BytesIO()
+        ppt.save(ppt_io)
+        job_store.put_artefact(token, 'pptx', ppt_io.getvalue())
+        job_store.update_job(token, status=DONE)
+    except Exception as e:
+        logger.error(f"Generation job {token} failed: {e}")
+        job_store.update_job(token, status=FAILED, error=str(e))
+
+class JobManager:
+    """Submits generation jobs, and the items of batches, to a lazily created process pool."""
+
+    def __init__(self, workers=GENERATION_WORKERS, start_method=GENERATION_START_METHOD):
+        self.workers = workers
+        self.start_method = start_method
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                context = multiprocessing.get_context(self.start_method)
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+                logger.info(f"Started generation pool with {self.workers} workers.")
+            return self._executor
+
+    def run(self, function, *args):
+        """Run function(*args) in the generation pool and return its future."""
+        return self._get_executor().submit(function, *args)
+
+    def submit(self, job_store, token):
+        """Queue generation of the submission stored under token and return the job id."""
+        job_store.put_job(token, QUEUED)
+        future = self._get_executor().submit(run_generation_job, job_store.path, token)
+
+        def on_done(future):
+            # Errors inside the job are recorded by the worker; this catches crashed workers
+            error = future.exception()
+            if error is not None:
+                logger.error(f"Generation job {token} crashed: {error}")
+                job_store.update_job(token, status=FAILED, error=str(error))
+
+        future.add_done_callback(on_done)
+        return token
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
@@ -0,0 +1,373 @@
+import logging
+from array import array
+from pptx.util import Cm, Inches
+from app.instrumentation import span
+from app.measure import get_measure_backend
+from app.tokenizer import TokenStream, tokenize
+
+logger = logging.getLogger(__name__)
+
+# Content type names, indexed by the codes stored in the plan (app.tokenizer's WORD, PUNCTUATION)
+CONTENT_TYPES = ('word', 'punctuation')
+
+# Spacing used when laying out text boxes
+ID_HEIGHT = Inches(0.3)  # Space reserved above each box for the word ID
+BOX_SPACING = Inches(0.2)  # Horizontal gap between text boxes
+LINE_SPACING = Inches(0.6)  # Vertical gap between lines
+WRAP_MARGIN = Inches(1.5)  # Room required on a line before wrapping
+
+# Header and footer boxes, spanning the slide width less a margin on each side
+HEADER_MARGIN = Cm(1)
+HEADER_TOP = Cm(0.5)
+FOOTER_BOTTOM = Cm(1.5)  # Distance from the top of the footer to the bottom of the slide
+LABEL_HEIGHT = Cm(1)
+
+class ContentArea:
+    """Position and size (in EMU) of the content placeholder used for layout."""
+
+    __slots__ = ('left', 'top', 'width', 'height')
+
+    def __init__(self, left, top, width, height):
+        self.left = int(left)
+        self.top = int(top)
+        self.width = int(width)
+        self.height = int(height)
+
+    @classmethod
+    def from_shape(cls, shape):
+        """Build a content area from a placeholder shape."""
+        return cls(shape.left, shape.top, shape.width, shape.height)
+
+    def __repr__(self):
+        return f"ContentArea(left={self.left}, top={self.top}, width={self.width}, height={self.height})"
+
+class LayoutPlan:
+    """
+    Compact, array-backed result of the layout stage.
+
+    Entry i describes one text box: the slide it goes on, its geometry in EMU,
+    the offsets of its token in the text, its content type code and the word
+    ID in effect. Token strings are only built when read (see token()), so
+    a plan costs a few dozen bytes per box on top of the text it refers to.
+
+    The plan also keeps the height of each source line's tallest token and
+    the layout state (first entry, slide index, top, word ID) at its start,
+    plus the state after the last line, so update_layout() can resume from
+    any line.
+    """
+
+    __slots__ = ('title', 'area', 'text', 'slide_count', 'max_height', 'slide_index', 'left', 'top',
+                 'width', 'height', 'token_start', 'token_end', 'content_type', 'word_id', 'line_height',
+                 'line_start', 'line_slide', 'line_top', 'line_word_id')
+
+    def __init__(self, title, area, text=''):
+        self.title = title
+        self.area = area
+        self.text = text
+        self.slide_count = 1
+        self.max_height = 0
+        self.slide_index = array('I')
+        self.left = array('q')
+        self.top = array('q')
+        self.width = array('q')
+        self.height = array('q')
+        self.token_start = array('L')
+        self.token_end = array('L')
+        self.content_type = array('B')
+        self.word_id = array('I')
+        self.line_height = array('q')
+        self.line_start = array('I')
+        self.line_slide = array('I')
+        self.line_top = array('q')
+        self.line_word_id = array('I')
+
+    def __len__(self):
+        return len(self.content_type)
+
+    def token(self, i):
+        """Return the text of entry i."""
+        return self.text[self.token_start[i]:self.token_end[i]]
+
+    def append(self, slide_index, left, top, width, height, start, end, content_type, word_id):
+        """Add one text box, whose token is text[start:end], to the plan."""
+        self.slide_index.append(slide_index)
+        self.left.append(left)
+        self.top.append(top)
+        self.width.append(width)
+        self.height.append(height)
+        self.token_start.append(start)
+        self.token_end.append(end)
+        self.content_type.append(content_type)
+        self.word_id.append(word_id)
+
+    def mark_line(self, slide_index, top, word_id):
+        """Record the layout state at the start of the next line (or after the last one)."""
+        self.line_start.append(len(self))
+        self.line_slide.append(slide_index)
+        self.line_top.append(top)
+        self.line_word_id.append(word_id)
+
+    def line_state(self, line):
+        """Return the (slide index, top, word ID) state at the start of a line."""
+        return self.line_slide[line], self.line_top[line], self.line_word_id[line]
+
+    def entries(self):
+        """Yield (slide index, left, top, width, height, token, content type, word id) tuples."""
+        for i in range(len(self)):
+            yield (self.slide_index[i], self.left[i], self.top[i], self.width[i], self.height[i],
+                   self.token(i), CONTENT_TYPES[self.content_type[i]], self.word_id[i])
+
+    def slide_ranges(self):
+        """Return a list of (start, end) entry ranges, one per slide."""
+        ranges = []
+        start = 0
+        count = len(self)
+        for index in range(self.slide_count):
+            end = start
+            while end < count and self.slide_index[end] == index:
+                end += 1
+            ranges.append((start, end))
+            start = end
+        return ranges
+
+    def same_entries(self, start, end, other, other_start, other_end):
+        """Return True if entries start..end hold the same boxes as other's other_start..other_end."""
+        if end - start != other_end - other_start:
+            return False
+        return (self.left[start:end] == other.left[other_start:other_end]
+                and self.top[start:end] == other.top[other_start:other_end]
+                and self.width[start:end] == other.width[other_start:other_end]
+                and self.height[start:end] == other.height[other_start:other_end]
+                and self.content_type[start:end] == other.content_type[other_start:other_end]
+                and self.word_id[start:end] == other.word_id[other_start:other_end]
+                and all(self.token(i) == other.token(j) for i, j in zip(range(start, end), range(other_start, other_end))))
+
+def header_box(slide_width, slide_height):
+    """Return the (left, top, width, height) of the header box of a slide."""
+    return HEADER_MARGIN, HEADER_TOP, slide_width - 2 * HEADER_MARGIN, LABEL_HEIGHT
+
+def footer_box(slide_width, slide_height):
+    """Return the (left, top, width, height) of the footer box of a slide."""
+    return HEADER_MARGIN, slide_height - FOOTER_BOTTOM, slide_width - 2 * HEADER_MARGIN, LABEL_HEIGHT
+
+def compute_layout(title, content, styles, area, backend=None):
+    """
+    Lay out the dictation content without touching python-pptx objects.
+
+    Args:
+        title (str): The presentation title, repeated on each slide.
+        content (str): The dictation text, one paragraph per line.
+        styles (CompiledStyles): The compiled styles.
+        area (ContentArea): The content placeholder geometry in EMU.
+        backend: Text measurement backend; defaults to MEASURE_BACKEND.
+
+    Returns:
+        LayoutPlan: Positions of every text box and the total slide count.
+    """
+    plan = LayoutPlan(title, area, content)
+    type_styles = [styles[name] for name in CONTENT_TYPES]
+
+    # Tokenize and measure every token once, one batch per content type
+    with span('measure'):
+        tokens = _measure_text(tokenize(content), type_styles, backend or get_measure_backend())
+        plan.line_height = tokens.line_heights
+        plan.max_height = max(plan.line_height, default=0)
+
+    with span('layout'):
+        state = _place_lines(plan, tokens, 0, len(plan.line_height), (0, area.top, 1), type_styles)
+        plan.mark_line(*state)
+        plan.slide_count = state[0] + 1
+
+    logger.debug(f"Layout computed: {len(plan)} boxes on {plan.slide_count} slides")
+    return plan
+
+def update_layout(previous, content, styles, backend=None):
+    """
+    Lay out edited content again, reusing a previous plan of the same title, styles and area.
+
+    Lines before the first changed line keep their boxes. Layout resumes from
+    the state saved at that line and, once past the changed lines, stops as
+    soon as an unchanged line starts in the same state as before (same slide,
+    top and word ID): the remaining boxes are copied from the previous plan.
+    Unchanged lines that still have to be placed reuse their measured widths.
+    The result is the same plan compute_layout() would return.
+
+    Args:
+        previous (LayoutPlan): The plan of the text before the edit.
+        content (str): The edited dictation text.
+        styles (CompiledStyles): The compiled styles the previous plan used.
+        backend: Text measurement backend; defaults to MEASURE_BACKEND.
+
+    Returns:
+        LayoutPlan: Positions of every text box and the total slide count.
+    """
+    new_lines = content.split('\n')
+    old_lines = previous.text.split('\n')
+    type_styles = [styles[name] for name in CONTENT_TYPES]
+
+    # Unchanged lines at the start and at the end
+    limit = min(len(old_lines), len(new_lines))
+    prefix = 0
+    while prefix < limit and old_lines[prefix] == new_lines[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and old_lines[-1 - suffix] == new_lines[-1 - suffix]:
+        suffix += 1
+    old_resume = len(old_lines) - suffix
+    new_resume = len(new_lines) - suffix
+
+    with span('measure'):
+        # Tokenize the changed lines in place, so token offsets are offsets into content
+        stream = TokenStream(content)
+        start = sum(len(line) + 1 for line in new_lines[:prefix])
+        for line in new_lines[prefix:new_resume]:
+            stream.add_line(start, start + len(line))
+            start += len(line) + 1
+        changed = _measure_text(stream, type_styles, backend or get_measure_backend())
+        max_height = max(max(previous.line_height[:prefix], default=0), max(changed.line_heights, default=0),
+                         max(previous.line_height[old_resume:], default=0))
+    if max_height != previous.max_height:
+        # Every box and line gap depends on the tallest token
+        return compute_layout(previous.title, content, styles, previous.area, backend)
+
+    plan = LayoutPlan(previous.title, previous.area, content)
+    plan.max_height = max_height
+    # The unchanged lines at the end are the end of both texts
+    shift = len(content) - len(previous.text)
+    with span('layout'):
+        _copy_lines(plan, previous, 0, prefix)
+        state = _place_lines(plan, changed, 0, new_resume - prefix, previous.line_state(prefix), type_styles)
+        plan.line_height.extend(changed.line_heights)
+
+        # The previous plan holds the token offsets and widths of the unchanged lines
+        unchanged = MeasuredTokens(previous.token_start, previous.token_end, previous.content_type, previous.width,
+                                   previous.line_start, previous.line_height)
+        for line in range(old_resume, len(old_lines)):
+            if state == previous.line_state(line):
+                _copy_lines(plan, previous, line, len(old_lines), shift)
+                state = previous.line_state(len(old_lines))
+                break
+            state = _place_lines(plan, unchanged, line, line + 1, state, type_styles, shift)
+            plan.line_height.append(previous.line_height[line])
+        plan.mark_line(*state)
+
+    plan.slide_count = plan.line_slide[-1] + 1
+    logger.debug(f"Layout updated from line {prefix}: {len(plan)} boxes on {plan.slide_count} slides")
+    return plan
+
+class MeasuredTokens:
+    """
+    Measured tokens of consecutive lines, in flat arrays indexed by token.
+
+    Token i spans text[starts[i]:ends[i]] of the text being laid out.
+    line_starts holds the first token index of every line plus the token
+    count, and line_heights the height of every line's tallest token.
+    """
+
+    __slots__ = ('starts', 'ends', 'codes', 'widths', 'line_starts', 'line_heights')
+
+    def __init__(self, starts, ends, codes, widths, line_starts, line_heights):
+        self.starts = starts
+        self.ends = ends
+        self.codes = codes
+        self.widths = widths
+        self.line_starts = line_starts
+        self.line_heights = line_heights
+
+def _measure_text(stream, type_styles, backend):
+    """Measure the tokens of a TokenStream from their offsets, in one batch per content type."""
+    starts = stream.starts
+    ends = stream.ends
+    codes = stream.codes
+    widths = array('q', bytes(8 * len(codes)))
+    heights = array('q', widths)
+    for code, style in enumerate(type_styles):
+        indexes = [index for index, value in enumerate(codes) if value == code]
+        batch_widths, batch_heights = backend.measure_spans(
+            stream.text, [starts[index] for index in indexes], [ends[index] for index in indexes],
+            style.font_path, style.font_size)
+        for index, width, height in zip(indexes, batch_widths, batch_heights):
+            widths[index] = width
+            heights[index] = height
+
+    first_token = stream.line_starts[0] if stream.line_starts else 0
+    line_starts = array('L', (start - first_token for start in stream.line_starts))
+    line_starts.append(len(codes))
+    line_heights = array('q', [max(heights[first:end], default=0) for first, end in zip(line_starts, line_starts[1:])])
+    return MeasuredTokens(starts, ends, codes, widths, line_starts, line_heights)
+
+def _copy_lines(plan, previous, first, last, shift=0):
+    """Append the boxes and line states of lines first..last of a previous plan, their tokens shift characters further."""
+    start = previous.line_start[first]
+    end = previous.line_start[last]
+    offset = len(plan) - start
+    plan.slide_index.extend(previous.slide_index[start:end])
+    plan.left.extend(previous.left[start:end])
+    plan.top.extend(previous.top[start:end])
+    plan.width.extend(previous.width[start:end])
+    plan.height.extend(previous.height[start:end])
+    if shift:
+        plan.token_start.extend(start_offset + shift for start_offset in previous.token_start[start:end])
+        plan.token_end.extend(end_offset + shift for end_offset in previous.token_end[start:end])
+    else:
+        plan.token_start.extend(previous.token_start[start:end])
+        plan.token_end.extend(previous.token_end[start:end])
+    plan.content_type.extend(previous.content_type[start:end])
+    plan.word_id.extend(previous.word_id[start:end])
+
+    plan.line_height.extend(previous.line_height[first:last])
+    plan.line_start.extend(index + offset for index in previous.line_start[first:last])
+    plan.line_slide.extend(previous.line_slide[first:last])
+    plan.line_top.extend(previous.line_top[first:last])
+    plan.line_word_id.extend(previous.line_word_id[first:last])
+
+def _place_lines(plan, measured, first, last, state, type_styles, shift=0):
+    """
+    Assign a slide and position to every token of lines first..last.
+
+    Args:
+        measured (MeasuredTokens): The tokens and widths of the lines.
+        state (tuple): (slide index, top, word ID) at the start of the first line.
+        shift (int): Added to the token offsets to make them offsets into plan.text.
+
+    Returns:
+        tuple: The state after the last line.
+    """
+    area = plan.area
+    max_height = plan.max_height
+    slide_index, top, word_id = state
+    right = area.left + area.width
+    bottom = area.top + area.height
+    starts = measured.starts
+    ends = measured.ends
+    codes = measured.codes
+    widths = measured.widths
+    line_starts = measured.line_starts
+
+    for line in range(first, last):
+        plan.mark_line(slide_index, top, word_id)
+        left = area.left
+        for index in range(line_starts[line], line_starts[line + 1]):
+            code = codes[index]
+            width = widths[index]
+            plan.append(slide_index, left, top + ID_HEIGHT, width, max_height,
+                        starts[index] + shift, ends[index] + shift, code, word_id)
+            left += width + BOX_SPACING  # Adjust spacing between text boxes
+
+            if type_styles[code].count_id:
+                word_id += 1
+
+            # Check if the next text box will fit in the current line
+            if left + WRAP_MARGIN > right:
+                left = area.left
+                top += max_height + LINE_SPACING
+
+                # Check if the next text box will fit in the current slide
+                if top + max_height + LINE_SPACING > bottom:
+                    slide_index += 1
+                    top = area.top
+
+        # Move to the next line after processing all words in the current line
+        top += max_height + LINE_SPACING
+
+    return slide_index, top, word_id
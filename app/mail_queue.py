@@ -0,0 +1,291 @@
+import heapq
+import logging
+import os
+import secrets
+import socket
+import threading
+import time
+from app.instrumentation import count
+
+logger = logging.getLogger(__name__)
+
+# Delivery attempts before an email is marked as failed
+MAIL_MAX_ATTEMPTS = int(os.getenv('MAIL_MAX_ATTEMPTS', 5))
+# Delay before the first retry, doubled after every failed attempt up to the maximum
+MAIL_RETRY_DELAY = float(os.getenv('MAIL_RETRY_DELAY', 5))
+MAIL_RETRY_MAX_DELAY = float(os.getenv('MAIL_RETRY_MAX_DELAY', 300))
+# Seconds without mail before the pooled SMTP connection is closed
+MAIL_IDLE_TIMEOUT = float(os.getenv('MAIL_IDLE_TIMEOUT', 30))
+
+# Delivery statuses
+QUEUED = 'queued'
+SENDING = 'sending'
+RETRYING = 'retrying'
+SENT = 'sent'
+FAILED = 'failed'
+
+class AttachmentExpired(LookupError):
+    """Raised when the deck attached to an email is no longer in the job store."""
+
+class OutgoingMail:
+    """An email waiting for delivery; its attachment stays in the job store until it is sent."""
+
+    __slots__ = ('id', 'recipient', 'subject', 'body', 'token', 'attempts')
+
+    def __init__(self, mail_id, recipient, subject, body, token=None):
+        self.id = mail_id
+        self.recipient = recipient
+        self.subject = subject
+        self.body = body
+        self.token = token
+        self.attempts = 0
+
+# Random part of this process's owner id, renewed in forked children
+_process_token = secrets.token_hex(8)
+
+def _renew_process_token():
+    global _process_token
+    _process_token = secrets.token_hex(8)
+
+os.register_at_fork(after_in_child=_renew_process_token)
+
+def process_owner():
+    """Return the id recorded as the owner of the emails queued by this process."""
+    return f"{socket.gethostname()}:{os.getpid()}:{_process_token}"
+
+def owner_alive(owner):
+    """
+    Return True unless the process that owns an email has stopped.
+
+    Only processes on this host can be checked; others are assumed alive.
+    A live process with this process's pid is this one, so a different
+    token there means the pid was reused after a restart.
+    """
+    host, pid, token = owner.rsplit(':', 2)
+    if host != socket.gethostname():
+        return True
+    if int(pid) == os.getpid():
+        return token == _process_token
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # Exists, under another user
+    return True
+
+def retry_delay(attempts, base=MAIL_RETRY_DELAY, maximum=MAIL_RETRY_MAX_DELAY):
+    """Return the delay before the next attempt after the given number of failed ones."""
+    return min(base * 2 ** (attempts - 1), maximum)
+
+class MailQueue:
+    """
+    Delivers queued emails from a background thread over one reused SMTP connection.
+
+    enqueue() only records the email and returns its id, so the request never
+    waits for the mail server. The worker thread keeps the Flask-Mail
+    connection open between emails, reopens it after an error and closes it
+    once idle. Failed deliveries are retried with exponential backoff.
+    Delivery status is written to the job store, together with the message
+    and the owning process, so that recover() can deliver the emails of a
+    process that stopped before sending them. The attached deck is not
+    copied: it is read from the submission's artefact when the email is sent.
+    """
+
+    def __init__(self, app, job_store, max_attempts=MAIL_MAX_ATTEMPTS, retry_delay=MAIL_RETRY_DELAY,
+                 retry_max_delay=MAIL_RETRY_MAX_DELAY, idle_timeout=MAIL_IDLE_TIMEOUT):
+        self.app = app
+        self.job_store = job_store
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.retry_max_delay = retry_max_delay
+        self.idle_timeout = idle_timeout
+        self._condition = threading.Condition()
+        self._pending = []  # Heap of (due time, sequence, OutgoingMail)
+        self._sequence = 0
+        self._thread = None
+        self._stopping = False
+        self._mail = None
+        self._connection = None
+        self._last_used = 0.0
+
+    def enqueue(self, recipient, subject, body, token=None):
+        """
+        Queue an email and return its id without waiting for delivery.
+
+        Args:
+            recipient (str): The recipient's address.
+            subject (str): The subject line.
+            body (str): The plain text body.
+            token (str): Optional submission token whose stored 'pptx' artefact is attached.
+
+        Returns:
+            str: The id of the email.
+        """
+        mail_id = secrets.token_urlsafe(16)
+        message = OutgoingMail(mail_id, recipient, subject, body, token)
+        self.job_store.put_mail(mail_id, recipient, QUEUED, subject=subject, body=body, token=token, owner=process_owner())
+        self._push(message, time.monotonic())
+        count('mail_queued')
+        return mail_id
+
+    def recover(self):
+        """
+        Queue the undelivered emails of processes that have stopped.
+
+        Each email is claimed in the job store first, so two processes never
+        both take it. An email that was being sent may be sent twice.
+
+        Returns:
+            int: The number of emails queued again.
+        """
+        owner = process_owner()
+        recovered = 0
+        try:
+            for row in self.job_store.pending_mail():
+                if row['owner'] and owner_alive(row['owner']):
+                    continue
+                if not self.job_store.claim_mail(row['id'], owner, row['owner']):
+                    continue
+                message = OutgoingMail(row['id'], row['recipient'], row['subject'] or '', row['body'] or '', row['token'])
+                message.attempts = row['attempts']
+                self._push(message, time.monotonic())
+                recovered += 1
+        except Exception as e:
+            logger.error(f"Error recovering queued emails: {e}")
+        if recovered:
+            logger.info(f"Recovered {recovered} undelivered emails.")
+            count('mail_recovered', recovered)
+        return recovered
+
+    def status(self, mail_id):
+        """Return the delivery status dict of an email, or None if unknown."""
+        return self.job_store.get_mail(mail_id)
+
+    def pending(self):
+        """Return the number of emails waiting for delivery."""
+        with self._condition:
+            return len(self._pending)
+
+    def _push(self, message, due):
+        with self._condition:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='mail-queue', daemon=True)
+                self._thread.start()
+            self._sequence += 1
+            heapq.heappush(self._pending, (due, self._sequence, message))
+            self._condition.notify()
+
+    def _next(self):
+        """Wait for the next due email, closing the connection when idle. Returns None on stop."""
+        while True:
+            with self._condition:
+                if self._stopping:
+                    return None
+                now = time.monotonic()
+                if self._pending and self._pending[0][0] <= now:
+                    return heapq.heappop(self._pending)[2]
+                timeout = self._pending[0][0] - now if self._pending else None
+                if self._connection is not None:
+                    idle_left = self._last_used + self.idle_timeout - now
+                    if idle_left > 0:
+                        timeout = idle_left if timeout is None else min(timeout, idle_left)
+                    else:
+                        timeout = 0
+                if timeout != 0:
+                    self._condition.wait(timeout)
+                    continue
+            self._close()
+
+    def _run(self):
+        from flask_mail import Mail
+
+        try:
+            with self.app.app_context():
+                # Read the MAIL_* settings once the app is fully configured
+                self._mail = Mail(self.app)
+                try:
+                    while True:
+                        message = self._next()
+                        if message is None:
+                            break
+                        try:
+                            self._deliver(message)
+                        except Exception as e:
+                            logger.error(f"Error delivering email {message.id}: {e}")
+                finally:
+                    self._close()
+        finally:
+            # The next email starts a new worker
+            with self._condition:
+                self._thread = None
+
+    def _update(self, mail_id, **fields):
+        """Record delivery status in the job store; a store error must not stop the deliveries."""
+        try:
+            self.job_store.update_mail(mail_id, **fields)
+        except Exception as e:
+            logger.error(f"Error recording status of email {mail_id}: {e}")
+
+    def _connect(self):
+        if self._connection is None:
+            connection = self._mail.connect()
+            connection.__enter__()
+            self._connection = connection
+            logger.debug("Opened SMTP connection.")
+        return self._connection
+
+    def _close(self, broken=False):
+        connection, self._connection = self._connection, None
+        if connection is None or connection.host is None:
+            return
+        try:
+            if broken:
+                connection.host.close()
+            else:
+                connection.__exit__(None, None, None)
+        except Exception as e:
+            logger.debug(f"Error closing SMTP connection: {e}")
+        logger.debug("Closed SMTP connection.")
+
+    def _deliver(self, message):
+        from app.email_service import build_message
+
+        message.attempts += 1
+        self._update(message.id, status=SENDING, attempts=message.attempts)
+        try:
+            attachment = None
+            if message.token is not None:
+                attachment = self.job_store.get_artefact(message.token, 'pptx')
+                if attachment is None:
+                    raise AttachmentExpired(f"The deck of submission {message.token} has expired")
+            email = build_message(message.recipient, message.subject, message.body, attachment)
+            self._connect().send(email)
+        except Exception as e:
+            self._close(broken=True)
+            # An expired deck does not come back, so there is no point retrying
+            if message.attempts >= self.max_attempts or isinstance(e, AttachmentExpired):
+                logger.error(f"Giving up on email {message.id} after {message.attempts} attempts: {e}")
+                self._update(message.id, status=FAILED, error=str(e))
+                count('mail_failed')
+                return
+            delay = retry_delay(message.attempts, self.retry_delay, self.retry_max_delay)
+            logger.warning(f"Email {message.id} attempt {message.attempts} failed, retrying in {delay:.0f}s: {e}")
+            self._update(message.id, status=RETRYING, error=str(e))
+            self._push(message, time.monotonic() + delay)
+            count('mail_retries')
+            return
+
+        self._last_used = time.monotonic()
+        self._update(message.id, status=SENT)
+        count('mail_sent')
+        logger.info(f"Email {message.id} sent to {message.recipient}")
+
+    def stop(self, timeout=None):
+        """Stop the worker after the email being sent; queued emails are left to recover()."""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
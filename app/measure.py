@@ -0,0 +1,241 @@
+import logging
+import os
+import threading
+from pptx.util import Inches
+from app.font_cache import font_metrics
+
+logger = logging.getLogger(__name__)
+
+# Text measurement backend: 'pillow' measures every token with getbbox (through
+# the font metrics cache), 'advance' sums glyph advances with NumPy
+MEASURE_BACKEND = os.getenv('MEASURE_BACKEND', 'pillow')
+
+# Padding added around measured text, in points
+TEXT_PADDING = 10
+# Codepoints read into a glyph table as soon as it is created (Basic Latin to Latin Extended-B)
+PRELOAD_CODEPOINTS = range(0x20, 0x250)
+
+class PillowBackend:
+    """Measures each token with Pillow's getbbox, through the shared font metrics cache."""
+
+    name = 'pillow'
+
+    def measure(self, tokens, font_path, font_size):
+        """
+        Measure tokens set in one font.
+
+        Args:
+            tokens (list): The token strings.
+            font_path (str): Path to the TrueType font file.
+            font_size (int): Font size in points.
+
+        Returns:
+            tuple: (list of padded widths in EMU, list of padded heights in EMU).
+        """
+        widths = []
+        heights = []
+        for token in tokens:
+            text_width, text_height = font_metrics.measure(token, font_path, font_size)
+            widths.append(Inches(text_width / 72))
+            heights.append(Inches(text_height / 72))
+        return widths, heights
+
+    def measure_spans(self, text, starts, ends, font_path, font_size):
+        """Measure the tokens text[starts[i]:ends[i]]; each substring only lives while it is measured."""
+        return self.measure((text[start:end] for start, end in zip(starts, ends)), font_path, font_size)
+
+class GlyphTable:
+    """
+    Advance widths, ink extents and kerning of one font at one size, keyed by codepoint.
+
+    Glyphs and kerning pairs are read from the font the first time they are
+    seen and kept in sorted NumPy arrays, so lookups are a searchsorted away.
+    """
+
+    def __init__(self, font):
+        import numpy as np
+
+        self.np = np
+        self.font = font
+        self._lock = threading.Lock()
+        empty = np.zeros(0)
+        # (codepoints, advance, ink left, ink right, ink top, ink bottom)
+        self._glyphs = (np.zeros(0, dtype=np.uint32), empty, empty, empty, empty, empty)
+        # (pair keys, kerning)
+        self._kerning = (np.zeros(0, dtype=np.uint64), empty)
+        self.glyphs(np.array(PRELOAD_CODEPOINTS, dtype=np.uint32))
+
+    def _read_glyphs(self, codepoints):
+        rows = []
+        for codepoint in codepoints.tolist():
+            char = chr(codepoint)
+            left, top, right, bottom = self.font.getbbox(char)
+            rows.append((self.font.getlength(char), left, right, top, bottom))
+        return self.np.array(rows, dtype=float).reshape(-1, 5).T
+
+    def _read_kerning(self, keys):
+        getlength = self.font.getlength
+        values = []
+        for key in keys.tolist():
+            first, second = chr(key >> 32), chr(key & 0xFFFFFFFF)
+            values.append(getlength(first + second) - getlength(first) - getlength(second))
+        return self.np.array(values, dtype=float)
+
+    def _merge(self, table, keys, columns):
+        """Return table with new keys and their columns added, kept sorted by key."""
+        np = self.np
+        merged = np.concatenate((table[0], keys))
+        order = merged.argsort(kind='stable')
+        return (merged[order],) + tuple(np.concatenate((old, new))[order] for old, new in zip(table[1:], columns))
+
+    def _missing(self, known, keys):
+        np = self.np
+        unique = np.unique(keys)
+        if not known.size:
+            return unique
+        position = np.searchsorted(known, unique).clip(max=known.size - 1)
+        return unique[known[position] != unique]
+
+    def glyphs(self, codepoints):
+        """Return (indexes of codepoints, glyph arrays), reading unseen glyphs from the font."""
+        np = self.np
+        glyphs = self._glyphs
+        missing = self._missing(glyphs[0], codepoints)
+        if missing.size:
+            with self._lock:
+                glyphs = self._glyphs
+                missing = self._missing(glyphs[0], missing)
+                if missing.size:
+                    glyphs = self._glyphs = self._merge(glyphs, missing, self._read_glyphs(missing))
+                    logger.debug(f"Read {missing.size} glyphs from {self.font.path}")
+        return np.searchsorted(glyphs[0], codepoints), glyphs
+
+    def kerning(self, keys):
+        """Return the kerning of pair keys (first << 32 | second), reading unseen pairs from the font."""
+        np = self.np
+        kerning = self._kerning
+        missing = self._missing(kerning[0], keys)
+        if missing.size:
+            with self._lock:
+                kerning = self._kerning
+                missing = self._missing(kerning[0], missing)
+                if missing.size:
+                    kerning = self._kerning = self._merge(kerning, missing, self._read_kerning(missing)[np.newaxis])
+        return kerning[1][np.searchsorted(kerning[0], keys)]
+
+class GlyphAdvanceBackend:
+    """
+    Measures a whole batch of tokens at once from per-codepoint glyph metrics.
+
+    A token's width is the sum of its glyph advances and kerning, widened by
+    ink overhanging the first and last glyphs, which is how Pillow computes
+    the bounding box of a single line. Heights come from the ink extents of
+    the glyphs, so one pass over NumPy arrays measures the whole document.
+    """
+
+    name = 'advance'
+
+    def __init__(self):
+        self._tables = {}
+        self._lock = threading.Lock()
+
+    def table(self, font_path, font_size):
+        """Return the glyph table of (font_path, font_size), creating it once."""
+        key = (font_path, font_size)
+        table = self._tables.get(key)
+        if table is None:
+            with self._lock:
+                table = self._tables.get(key)
+                if table is None:
+                    table = self._tables[key] = GlyphTable(font_metrics.get_font(font_path, font_size))
+        return table
+
+    def measure(self, tokens, font_path, font_size):
+        """
+        Measure tokens set in one font.
+
+        Args:
+            tokens (list): The token strings, none of them empty.
+            font_path (str): Path to the TrueType font file.
+            font_size (int): Font size in points.
+
+        Returns:
+            tuple: (list of padded widths in EMU, list of padded heights in EMU).
+        """
+        import numpy as np
+
+        if not tokens:
+            return [], []
+        lengths = np.fromiter(map(len, tokens), dtype=np.int64, count=len(tokens))
+        codepoints = np.frombuffer(''.join(tokens).encode('utf-32-le'), dtype=np.uint32)
+        return self._measure_codepoints(codepoints, lengths, font_path, font_size)
+
+    def measure_spans(self, text, starts, ends, font_path, font_size):
+        """
+        Measure the tokens text[starts[i]:ends[i]] without building their substrings.
+
+        The codepoints of the tokens are gathered from the whole text's.
+        """
+        import numpy as np
+
+        if not len(starts):
+            return [], []
+        starts = np.asarray(starts, dtype=np.int64)
+        lengths = np.asarray(ends, dtype=np.int64) - starts
+        text_codepoints = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+        # Position in the text of each glyph of the concatenated tokens
+        token_starts = np.cumsum(lengths) - lengths
+        positions = np.arange(lengths.sum()) + np.repeat(starts - token_starts, lengths)
+        return self._measure_codepoints(text_codepoints[positions], lengths, font_path, font_size)
+
+    def _measure_codepoints(self, codepoints, lengths, font_path, font_size):
+        """Measure tokens given as their concatenated codepoints and their lengths."""
+        import numpy as np
+
+        table = self.table(font_path, font_size)
+        ends = np.cumsum(lengths)
+        starts = ends - lengths
+        last = ends - 1
+        index, (_, advance, ink_left, ink_right, ink_top, ink_bottom) = table.glyphs(codepoints)
+
+        # Pen movement after each glyph: its advance plus the kerning with the
+        # next glyph of the same token
+        step = advance[index]
+        if codepoints.size > 1:
+            inside = np.ones(codepoints.size - 1, dtype=bool)
+            inside[last[:-1]] = False
+            first = codepoints[:-1][inside].astype(np.uint64)
+            second = codepoints[1:][inside].astype(np.uint64)
+            step[:-1][inside] += table.kerning(first << np.uint64(32) | second)
+        pen = np.cumsum(step) - step  # Pen position before each glyph
+        origin = pen[starts]
+        total = pen[last] + step[last] - origin
+        right = np.maximum(total, pen[last] - origin + ink_right[index[last]])
+        left = np.minimum(0, ink_left[index[starts]])
+        widths = right - left + TEXT_PADDING
+
+        top = np.minimum.reduceat(ink_top[index], starts)
+        bottom = np.maximum.reduceat(ink_bottom[index], starts)
+        heights = bottom - top + TEXT_PADDING
+
+        # Same conversion as Inches(points / 72), truncated to whole EMU
+        widths = (widths / 72 * Inches(1)).astype(np.int64)
+        heights = (heights / 72 * Inches(1)).astype(np.int64)
+        return widths.tolist(), heights.tolist()
+
+BACKENDS = {
+    'pillow': PillowBackend,
+    'advance': GlyphAdvanceBackend,
+}
+
+_backends = {}
+
+def get_measure_backend(name=None):
+    """Return the shared instance of a measurement backend (MEASURE_BACKEND by default)."""
+    name = name or MEASURE_BACKEND
+    backend = _backends.get(name)
+    if backend is None:
+        if name not in BACKENDS:
+            raise ValueError(f"Unknown measurement backend: {name}")
+        backend = _backends.setdefault(name, BACKENDS[name]())
+    return backend
@@ -0,0 +1,243 @@
+import io
+import logging
+import multiprocessing
+import os
+import pickle
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from lxml import etree
+from pptx.opc.constants import CONTENT_TYPE as CT, RELATIONSHIP_TYPE as RT
+from pptx.opc.oxml import nsmap as opc_nsmap
+from pptx.oxml.ns import qn
+from app.admission import predict_slides
+from app.incremental import deflate, member_record, raw_record, write_archive
+from app.instrumentation import count, span
+from app.jobs import GENERATION_START_METHOD
+
+logger = logging.getLogger(__name__)
+
+# Processes rendering the slides of long decks; 0 or 1 renders every deck in the request process
+PARALLEL_WORKERS = int(os.getenv('PARALLEL_WORKERS', 0))
+# Decks predicted to have fewer slides are rendered serially
+PARALLEL_MIN_SLIDES = int(os.getenv('PARALLEL_MIN_SLIDES', 100))
+
+# Members of the deck package that change with the slide count
+CONTENT_TYPES_MEMBER = '[Content_Types].xml'
+PRESENTATION_MEMBER = 'ppt/presentation.xml'
+PRESENTATION_RELS_MEMBER = 'ppt/_rels/presentation.xml.rels'
+SLIDE_MEMBER = 'ppt/slides/slide{}.xml'
+SLIDE_RELS_MEMBER = 'ppt/slides/_rels/slide{}.xml.rels'
+# The archive is written without ZIP64 records
+MAX_MEMBERS = 0xFFFF
+
+class SlidePool:
+    """Process pool shared by parallel renders, started on first use."""
+
+    def __init__(self, workers=PARALLEL_WORKERS, start_method=GENERATION_START_METHOD):
+        self.workers = workers
+        self.start_method = start_method
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def submit(self, function, *args):
+        with self._lock:
+            if self._executor is None:
+                context = multiprocessing.get_context(self.start_method)
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+                logger.info(f"Started slide rendering pool with {self.workers} workers.")
+            return self._executor.submit(function, *args)
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
+
+# Shared pool used by render_snapshot()
+slide_pool = SlidePool()
+
+def use_parallel(content, workers=None):
+    """Return True if content is long enough to be rendered by the slide pool."""
+    workers = PARALLEL_WORKERS if workers is None else workers
+    return workers > 1 and predict_slides(content) >= PARALLEL_MIN_SLIDES
+
+def partition(plan, chunks):
+    """Split the slide indexes into up to chunks contiguous groups holding similar numbers of boxes."""
+    total = len(plan) or 1
+    groups = [[] for _ in range(chunks)]
+    for index, (start, _) in enumerate(plan.slide_ranges()):
+        groups[min(chunks - 1, start * chunks // total)].append(index)
+    return [group for group in groups if group]
+
+def render_slide_group(plan_data, indexes, style_overrides, styles_key, text_styles):
+    """
+    Render some slides of a pickled layout plan in a worker process.
+
+    Returns:
+        list: (slide index, deflated slide XML, CRC-32, size) per slide.
+    """
+    from app.ppt_generator import render_slide_parts
+    from app.styles import get_styles
+
+    plan = pickle.loads(plan_data)
+    styles = get_styles(style_overrides)
+    if styles.key != styles_key:
+        raise RuntimeError("Worker styles differ from the styles the deck was laid out with")
+    parts = render_slide_parts(plan, indexes, styles, text_styles)
+    return [(index, *deflate(parts[index])) for index in indexes]
+
+def render_parallel(title, content, style_overrides=None, text_styles=None, pool=None):
+    """
+    Render a deck with its slides built and compressed by the slide pool.
+
+    The layout is computed here and the slides are split into contiguous
+    groups, one per worker. Meanwhile the deck is built with its first slide
+    only and saved; the other slides are then added to the package the way
+    python-pptx adds them (see assemble_deck()). Every part comes out byte
+    for byte as in a serial render.
+
+    Args:
+        title (str): The presentation title.
+        content (str): The dictation content.
+        style_overrides (dict): Overrides applied on top of styles.json.
+        text_styles (str): The TEXT_STYLES mode.
+        pool (SlidePool): The pool to render with; the shared one by default.
+
+    Returns:
+        tuple: (layout plan, slide member names, .pptx bytes), or None if the
+        deck must be rendered serially.
+    """
+    from app.layout import compute_layout
+    from app.ppt_generator import add_content_slide, count_deck
+    from app.styles import get_styles
+    from app.template_cache import get_base_template
+    from app.xml_renderer import TEXT_STYLES, apply_text_styles
+
+    pool = pool or slide_pool
+    styles = get_styles(style_overrides)
+    text_styles = text_styles or TEXT_STYLES
+    template = get_base_template()
+    plan = compute_layout(title, content, styles, template.area)
+    if 2 * plan.slide_count + 64 > MAX_MEMBERS:
+        return None
+
+    try:
+        with span('shapes'):
+            plan_data = pickle.dumps(plan, pickle.HIGHEST_PROTOCOL)
+            futures = [pool.submit(render_slide_group, plan_data, group, style_overrides, styles.key, text_styles)
+                       for group in partition(plan, pool.workers)]
+
+            # The rest of the deck is built while the workers render the slides
+            ppt = template.new_presentation()
+            apply_text_styles(ppt, styles, text_styles)
+            add_content_slide(ppt, title, content, template.content_layout(ppt))
+            skeleton = io.BytesIO()
+            ppt.save(skeleton)
+
+            slides = [None] * plan.slide_count
+            for future in futures:
+                for index, *member in future.result():
+                    slides[index] = member
+    except Exception as e:
+        logger.error(f"Parallel rendering failed, rendering serially: {e}")
+        count('parallel_fallbacks')
+        return None
+
+    with span('save'):
+        data = assemble_deck(skeleton.getvalue(), slides)
+    count_deck(plan, styles)
+    count('slides_parallel', plan.slide_count)
+    logger.debug(f"Rendered {plan.slide_count} slides in {len(futures)} groups")
+    return plan, [SLIDE_MEMBER.format(index + 1) for index in range(plan.slide_count)], data
+
+def assemble_deck(skeleton, slides):
+    """
+    Build a deck's package from its one-slide version and every slide's deflated XML.
+
+    Slides 2 to N are added like python-pptx's add_slide() does: the slide
+    part and a copy of the first slide's relationships (to the same layout)
+    follow the previous slide, [Content_Types].xml gets an Override per
+    slide, the presentation a relationship with the next free rId and a
+    p:sldId with the next id. The first slide's XML is replaced too.
+
+    Args:
+        skeleton (bytes): The deck saved by python-pptx with its first slide only.
+        slides (list): (deflated XML, CRC-32, size) of every slide, in order.
+
+    Returns:
+        bytes: The .pptx file.
+    """
+    with zipfile.ZipFile(io.BytesIO(skeleton)) as archive:
+        infos = archive.infolist()
+        content_types = archive.read(CONTENT_TYPES_MEMBER)
+        presentation = archive.read(PRESENTATION_MEMBER)
+        relationships = archive.read(PRESENTATION_RELS_MEMBER)
+        slide_relationships = archive.read(SLIDE_RELS_MEMBER.format(1))
+
+    numbers = range(2, len(slides) + 1)
+    relationships, rel_ids = _add_slide_relationships(relationships, numbers)
+    patched = {
+        CONTENT_TYPES_MEMBER: _add_slide_overrides(content_types, numbers),
+        PRESENTATION_MEMBER: _add_slide_ids(presentation, rel_ids),
+        PRESENTATION_RELS_MEMBER: relationships,
+    }
+    slide_relationships = deflate(slide_relationships)
+
+    members = []
+    for info in infos:
+        if info.filename in patched:
+            members.append(member_record(info, *deflate(patched[info.filename])))
+        elif info.filename == SLIDE_MEMBER.format(1):
+            slide_info = info
+            members.append(member_record(info, *slides[0]))
+        elif info.filename == SLIDE_RELS_MEMBER.format(1):
+            members.append((info, raw_record(skeleton, info)))
+            for number in numbers:
+                members.append(member_record(slide_info, *slides[number - 1], filename=SLIDE_MEMBER.format(number)))
+                members.append(member_record(info, *slide_relationships, filename=SLIDE_RELS_MEMBER.format(number)))
+        else:
+            members.append((info, raw_record(skeleton, info)))
+    return write_archive(members)
+
+def _serialize(root):
+    return etree.tostring(root, encoding='UTF-8', standalone=True)
+
+def _rel_id_order(rel_id):
+    # The order python-pptx writes relationships in
+    return int(rel_id[3:]) if rel_id.startswith('rId') and rel_id[3:].isdigit() else 0, rel_id
+
+def _add_slide_relationships(xml, numbers):
+    """Add the presentation's relationships to slides numbers; return the XML and their rIds."""
+    root = etree.fromstring(xml)
+    used = {rel.get('Id') for rel in root}
+    tag = f"{{{opc_nsmap['pr']}}}Relationship"
+    rel_ids = []
+    for number in numbers:
+        # First free rId counting down from len + 1, like python-pptx
+        rel_id = next(f'rId{n}' for n in range(len(used) + 1, 0, -1) if f'rId{n}' not in used)
+        used.add(rel_id)
+        rel_ids.append(rel_id)
+        etree.SubElement(root, tag, Id=rel_id, Type=RT.SLIDE, Target=f'slides/slide{number}.xml')
+    root[:] = sorted(root, key=lambda rel: _rel_id_order(rel.get('Id')))
+    return _serialize(root), rel_ids
+
+def _add_slide_ids(xml, rel_ids):
+    """Add a p:sldId per relationship after the existing ones, numbered from the highest id."""
+    root = etree.fromstring(xml)
+    slide_ids = root.find(qn('p:sldIdLst'))
+    next_id = max([255] + [int(slide_id.get('id')) for slide_id in slide_ids]) + 1
+    for rel_id in rel_ids:
+        etree.SubElement(slide_ids, qn('p:sldId'), {'id': str(next_id), qn('r:id'): rel_id})
+        next_id += 1
+    return _serialize(root)
+
+def _add_slide_overrides(xml, numbers):
+    """Add the content type of slides numbers, keeping Overrides sorted by part name like python-pptx."""
+    root = etree.fromstring(xml)
+    override = f"{{{opc_nsmap['ct']}}}Override"
+    for number in numbers:
+        etree.SubElement(root, override, PartName=f'/{SLIDE_MEMBER.format(number)}', ContentType=CT.PML_SLIDE)
+    defaults = [child for child in root if child.tag != override]
+    root[:] = defaults + sorted((child for child in root if child.tag == override), key=lambda child: child.get('PartName'))
+    return _serialize(root)
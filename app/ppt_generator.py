@@ -1,24 +1,19 @@
 import logging
 from core.file_generator.pptx import create_ppt, add_title_slide  # Import from the core library
-from pptx.util import Inches, Pt
+from pptx.util import Inches
 from pptx.enum.text import PP_ALIGN
-from pptx.dml.color import RGBColor
-from pptx.util import Cm
-from PIL import ImageFont
-import re
-import json
+from app.font_cache import font_metrics
+from app.instrumentation import count, span
+from app.layout import CONTENT_TYPES, compute_layout, footer_box, header_box
+from app.styles import get_styles
+from app.template_cache import get_base_template
+from app.tokenizer import WORD
+from app.xml_renderer import apply_text_styles, get_shape_templates, render_slide_boxes
 import os
 
-# Set up logging
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
-
-# Load styles from JSON file
-try:
-    with open('styles.json', 'r') as f:
-        styles = json.load(f)
-except Exception as e:
-    logging.error(f"Failed to load styles from JSON: {e}")
-    raise  # Re-raise the exception after logging
+# Text box rendering backend: 'xml' emits each slide's boxes as one XML batch,
+# 'shapes' adds them one by one through the python-pptx shapes API
+PPT_RENDERER = os.getenv('PPT_RENDERER', 'xml')
 
 def create_ppt_from_text(title, content):
     """Create a PowerPoint presentation from a title and content."""
@@ -31,96 +26,162 @@ def create_ppt_from_text(title, content):
         logging.error(f"Error creating PowerPoint: {e}")
         raise  # Re-raise the exception after logging
 
-def create_ppt_dictation_from_text(title, content):
-    """Create a PowerPoint presentation for dictation from title and content."""
+def create_ppt_dictation_from_text(title, content, renderer=None, progress=None, style_overrides=None, text_styles=None):
+    """
+    Create a PowerPoint presentation for dictation from title and content.
+
+    If given, progress(slides_done, slides_total) is called as slides are rendered,
+    and style_overrides (e.g. {'word': {'font_size': 28}}) is applied on top of styles.json.
+    text_styles overrides the TEXT_STYLES mode of the xml renderer.
+    """
+    ppt, _, _ = render_dictation(title, content, renderer, progress, style_overrides, text_styles)
+    return ppt
+
+def render_dictation(title, content, renderer=None, progress=None, style_overrides=None, text_styles=None):
+    """
+    Render a dictation deck and keep what incremental regeneration needs.
+
+    Returns:
+        tuple: (presentation, layout plan, list of the dictation slides).
+    """
     logging.debug("Creating PowerPoint dictation from text...")
     try:
-        ppt = create_ppt()  # Create a new PowerPoint presentation
-        slide = add_content_slide(ppt, title, content)  # Add content slide
+        styles = get_styles(style_overrides)
+        renderer = renderer or PPT_RENDERER
+        with span('template'):
+            # Clone the cached base deck, whose layout has no content placeholder
+            template = get_base_template()
+            ppt = template.new_presentation()
+            if renderer == 'xml':
+                apply_text_styles(ppt, styles, text_styles)
+            slide = add_content_slide(ppt, title, content, template.content_layout(ppt))
         logging.debug(f"Added content slide: {slide.slide_layout.name}")
 
-        # Split the content into lines based on carriage returns
-        lines = content.split('\n')
-        
-        max_height = 0
-        for line in lines:
-            words = re.findall(r'\w+|[^\w\s]', line, re.UNICODE)
-            for word in words:
-                content_type = 'word' if re.match(r'\w+', word) else 'punctuation'
-                _, text_height = calculate_text_size(word, styles[content_type]['font_path'], styles[content_type]['font_size'])
-                max_height = max(max_height, Inches(text_height / 72))
-
-        # Initialize placeholder, slide number, and word ID
-        content_placeholder = slide.placeholders[1]
-        slide_number = 1
-        word_id = 1
-        left = content_placeholder.left
-        top = content_placeholder.top
-        
-        for line in lines:
-            words = re.findall(r'\w+|[^\w\s]', line, re.UNICODE)
-            for word in words:
-                content_type = 'word' if re.match(r'\w+', word) else 'punctuation'
-                add_text_box(slide, word, left, top + Inches(0.3), max_height, word_id, content_type)  # Add text box
-                text_width, _ = calculate_text_size(word, styles[content_type]['font_path'], styles[content_type]['font_size'])
-                left += Inches(text_width / 72) + Inches(0.2)  # Adjust spacing between text boxes
-
-                if styles[content_type]['count_id']:
-                    word_id += 1
-
-                # Check if the next text box will fit in the current line
-                if left + Inches(1.5) > content_placeholder.left + content_placeholder.width:
-                    # Move to the next line
-                    left = content_placeholder.left  # Reset to placeholder's left
-                    top += max_height + Inches(0.6)  # Move down to the next line
-                    
-                    # Check if the next text box will fit in the current slide
-                    if top + max_height + Inches(0.6) > content_placeholder.top + content_placeholder.height:
-                        # Add a new slide
-                        slide_number += 1
-                        slide = ppt.slides.add_slide(ppt.slide_layouts[1])
-                        title_shape = slide.shapes.title
-                        title_shape.text = title
-                        content_placeholder = slide.placeholders[1]
-                        top = content_placeholder.top
-
-            # Move to the next line after processing all words in the current line
-            left = content_placeholder.left  # Ensure the left is reset to align on each new line
-            top += max_height + Inches(0.6)
-
-        # Clean up content placeholders and add headers/footers as needed
-        for slide in ppt.slides:
-            for shape in slide.shapes:
-                if shape.is_placeholder and shape.placeholder_format.idx == 1:
-                    sp = shape._element
-                    sp.getparent().remove(sp)
-
-        # Add headers and footers
-        for i, slide in enumerate(ppt.slides):
-            header = slide.shapes.add_textbox(Cm(1), Cm(0.5), ppt.slide_width - Cm(2), Cm(1))
-            header_frame = header.text_frame
-            header_frame.text = styles['header']['text']
-            header_frame.paragraphs[0].font.size = Pt(styles['header']['font_size'])
-            header_frame.paragraphs[0].alignment = PP_ALIGN.CENTER
-
-            footer = slide.shapes.add_textbox(Cm(1), ppt.slide_height - Cm(1.5), ppt.slide_width - Cm(2), Cm(1))
-            footer_frame = footer.text_frame
-            footer_frame.text = f"Page {i + 1} of {len(ppt.slides)}"
-            footer_frame.paragraphs[0].font.size = Pt(styles['footer']['font_size'])
-            footer_frame.paragraphs[0].alignment = PP_ALIGN.RIGHT
+        # Lay out every text box before creating any shapes
+        plan = compute_layout(title, content, styles, template.area)
+        with span('shapes'):
+            slides = render_layout_plan(ppt, plan, slide, renderer, progress, styles, text_styles)
+
+        # Add headers/footers as needed
+        with span('decorate'):
+            add_headers_and_footers(ppt, slides, styles)
+
+        count_deck(plan, styles)
 
         logging.debug("PowerPoint dictation created successfully.")
-        return ppt
+        return ppt, plan, slides
     except Exception as e:
         logging.error(f"Error creating PowerPoint: {e}")
         raise  # Re-raise the exception after logging
 
-def add_content_slide(ppt, title, content):
-    """Add a content slide to the PowerPoint presentation with a title and content."""
+def count_deck(plan, styles):
+    """Count the words, slides and shapes of a rendered deck."""
+    count('words', plan.content_type.count(WORD))
+    count('slides', plan.slide_count)
+    id_boxes = sum(plan.content_type.count(code) for code, name in enumerate(CONTENT_TYPES) if styles[name].display_id)
+    count('shapes', len(plan) + id_boxes + 2 * plan.slide_count)
+
+def render_slide_parts(plan, indexes, styles=None, text_styles=None):
+    """
+    Render only some slides of a layout plan, each on its own.
+
+    A slide's XML does not depend on the other slides, so every slide comes out
+    exactly as it would in the full deck. One scratch slide is reused: the
+    boxes of the previous slide are removed before the next one is rendered.
+
+    Args:
+        plan (LayoutPlan): The layout of the whole deck.
+        indexes (list): Indexes of the slides to render.
+        styles (CompiledStyles): The styles the plan was laid out with.
+        text_styles (str): The TEXT_STYLES mode of the deck.
+
+    Returns:
+        dict: The serialized slide XML per slide index.
+    """
+    styles = styles or get_styles()
+    template = get_base_template()
+    ppt = template.new_presentation()
+    templates = get_shape_templates(styles, text_styles)
+    ranges = plan.slide_ranges()
+    slide = add_content_slide(ppt, plan.title, None, template.content_layout(ppt))
+    sp_tree = slide.shapes._spTree
+    initial = set(sp_tree)
+    parts = {}
+    for index in indexes:
+        for element in [element for element in sp_tree if element not in initial]:
+            sp_tree.remove(element)
+        start, end = ranges[index]
+        render_slide_boxes(slide, plan, start, end, templates)
+        add_header_and_footer(slide, index, plan.slide_count, ppt.slide_width, ppt.slide_height, styles)
+        parts[index] = slide.part.blob
+    return parts
+
+def add_headers_and_footers(ppt, slides, styles=None):
+    """Add the header text and the "Page i of N" footer to every slide."""
+    styles = styles or get_styles()
+    try:
+        slide_width = ppt.slide_width
+        slide_height = ppt.slide_height
+        for i, slide in enumerate(slides):
+            add_header_and_footer(slide, i, len(slides), slide_width, slide_height, styles)
+    except Exception as e:
+        logging.error(f"Error adding headers and footers: {e}")
+        raise  # Re-raise the exception after logging
+
+def add_header_and_footer(slide, index, total, slide_width, slide_height, styles):
+    """Add the header text and the footer of slide index out of total."""
+    header = slide.shapes.add_textbox(*header_box(slide_width, slide_height))
+    header_frame = header.text_frame
+    header_frame.text = styles.header.text
+    header_frame.paragraphs[0].font.size = styles.header.font_size
+    header_frame.paragraphs[0].alignment = PP_ALIGN.CENTER
+
+    footer = slide.shapes.add_textbox(*footer_box(slide_width, slide_height))
+    footer_frame = footer.text_frame
+    footer_frame.text = f"Page {index + 1} of {total}"
+    footer_frame.paragraphs[0].font.size = styles.footer.font_size
+    footer_frame.paragraphs[0].alignment = PP_ALIGN.RIGHT
+
+def render_layout_plan(ppt, plan, slide, renderer='xml', progress=None, styles=None, text_styles=None):
+    """
+    Create the slides and text boxes described by a layout plan, starting on the given slide.
+
+    With shared text styles (xml renderer only), the deck must already hold
+    the style levels, see apply_text_styles().
+    """
+    styles = styles or get_styles()
+    if progress:
+        progress(0, plan.slide_count)
+    slides = [slide]
+    layout = slide.slide_layout
+    for _ in range(1, plan.slide_count):
+        slide = ppt.slides.add_slide(layout)
+        slide.shapes.title.text = plan.title
+        slides.append(slide)
+
+    if renderer == 'xml':
+        templates = get_shape_templates(styles, text_styles)
+        for i, (slide, (start, end)) in enumerate(zip(slides, plan.slide_ranges())):
+            render_slide_boxes(slide, plan, start, end, templates)
+            if progress:
+                progress(i + 1, plan.slide_count)
+        return slides
+
+    slides_done = 0
+    for slide_index, left, top, width, height, token, content_type, word_id in plan.entries():
+        if progress and slide_index > slides_done:
+            slides_done = slide_index
+            progress(slides_done, plan.slide_count)
+        add_text_box(slides[slide_index], token, left, top, height, word_id, content_type, width, styles)
+    if progress:
+        progress(plan.slide_count, plan.slide_count)
+    return slides
+
+def add_content_slide(ppt, title, content, layout=None):
+    """Add a content slide with the given title, using layout or the deck's title-and-content layout."""
     try:
-        slide = ppt.slides.add_slide(ppt.slide_layouts[1])  # Content Slide
+        slide = ppt.slides.add_slide(layout or ppt.slide_layouts[1])  # Content Slide
         title_placeholder = slide.shapes.title
-        content_placeholder = slide.placeholders[1]
         title_placeholder.text = title
         logging.debug("Content slide added successfully.")
         return slide
@@ -132,54 +193,52 @@ def add_content_slide(ppt, title, content):
 def calculate_text_size(text, font_path, font_size):
     """Calculate the width and height of the text using the specified font."""
     try:
-        font = ImageFont.truetype(font_path, font_size)
-        bbox = font.getbbox(text)
-        width = bbox[2] - bbox[0]
-        height = bbox[3] - bbox[1]
-        # Add some padding
-        width += 10
-        height += 10
-        return width, height
+        # Fonts and measurements are cached process-wide
+        return font_metrics.measure(text, font_path, font_size)
     except Exception as e:
         logging.error(f"Error calculating text size: {e}")
         raise  # Re-raise the exception after logging
 
 # Function to add a text box with a border and adjusted margins
-def add_text_box(slide, text, left, top, max_height, word_id, content_type):
+def add_text_box(slide, text, left, top, max_height, word_id, content_type, text_width=None, styles=None):
     """Add a text box with the specified text to the slide."""
     try:
-        # Calculate text size
-        text_width, text_height = calculate_text_size(text, styles[content_type]['font_path'], styles[content_type]['font_size'])
-        text_width = Inches(text_width / 72)  # Convert points to inches
+        styles = styles or get_styles()
+        style = styles[content_type]
+
+        # Calculate text size unless the layout already measured it
+        if text_width is None:
+            text_width, _ = calculate_text_size(text, style.font_path, style.font_size)
+            text_width = Inches(text_width / 72)  # Convert points to inches
 
         # Add the text box
         txBox = slide.shapes.add_textbox(left, top, text_width, max_height)
         tf = txBox.text_frame
         tf.text = text
         for paragraph in tf.paragraphs:
-            paragraph.font.name = styles[content_type]['font_name']
-            paragraph.font.size = Pt(styles[content_type]['font_size'])
-            paragraph.font.color.rgb = RGBColor(*styles[content_type]['font_color'])
+            paragraph.font.name = style.font_name
+            paragraph.font.size = style.font_size_emu
+            paragraph.font.color.rgb = style.font_color
 
-        txBox.line.color.rgb = RGBColor(*styles[content_type]['border_color'])
-        txBox.line.width = Pt(styles[content_type]['border_width'])
+        txBox.line.color.rgb = style.border_color
+        txBox.line.width = style.border_width
 
         # Adjust text box margins
-        tf.margin_left = Pt(styles[content_type]['margin_left'])
-        tf.margin_right = Pt(styles[content_type]['margin_right'])
-        tf.margin_top = Pt(styles[content_type]['margin_top'])
-        tf.margin_bottom = Pt(styles[content_type]['margin_bottom'])
+        tf.margin_left = style.margin_left
+        tf.margin_right = style.margin_right
+        tf.margin_top = style.margin_top
+        tf.margin_bottom = style.margin_bottom
 
         # Disable AutoFit
         tf.word_wrap = False
 
         # Add the word ID above the text box if required
-        if styles[content_type]['display_id']:
+        if style.display_id:
             id_box = slide.shapes.add_textbox(left, top - Inches(0.3), text_width, Inches(0.3))
             id_frame = id_box.text_frame
             id_frame.text = str(word_id)
-            id_frame.paragraphs[0].font.size = Pt(styles['id']['font_size'])
-            id_frame.paragraphs[0].font.color.rgb = RGBColor(*styles['id']['font_color'])
+            id_frame.paragraphs[0].font.size = styles.id.font_size
+            id_frame.paragraphs[0].font.color.rgb = styles.id.font_color
             id_frame.paragraphs[0].alignment = PP_ALIGN.CENTER
 
     except Exception as e:
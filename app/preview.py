@@ -0,0 +1,138 @@
+import html
+import logging
+import os
+from pptx.util import Inches
+from app.deck_cache import DeckCache
+from app.instrumentation import span
+from app.layout import CONTENT_TYPES, ID_HEIGHT, compute_layout, footer_box, header_box
+
+logger = logging.getLogger(__name__)
+
+# In-memory cache of rendered previews
+PREVIEW_CACHE_BYTES = int(os.getenv('PREVIEW_CACHE_BYTES', 16 * 1024 * 1024))  # Default 16 MB
+
+# Default text insets of text boxes whose margins are not set (ID labels, header, footer)
+LABEL_INSET_X = Inches(0.1)
+LABEL_INSET_Y = Inches(0.05)
+
+class SlidePreview:
+    """SVG markup of one slide, built from a layout plan in EMU user units."""
+
+    def __init__(self, slide_width, slide_height):
+        self.slide_width = slide_width
+        self.slide_height = slide_height
+        self.parts = [
+            f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {slide_width} {slide_height}" class="slide">',
+            f'<rect width="{slide_width}" height="{slide_height}" fill="#ffffff"/>',
+        ]
+
+    def box(self, left, top, width, height, color, stroke_width):
+        self.parts.append(f'<rect x="{left}" y="{top}" width="{width}" height="{height}" fill="none" '
+                          f'stroke="#{color}" stroke-width="{stroke_width}"/>')
+
+    def text(self, text, x, y, font_size, color=None, anchor='start', font_name=None):
+        font = f' font-family="{html.escape(font_name)}"' if font_name else ''
+        self.parts.append(f'<text x="{x}" y="{y}" font-size="{font_size}"{font} fill="#{color or "000000"}" '
+                          f'text-anchor="{anchor}" dominant-baseline="hanging">{html.escape(text)}</text>')
+
+    def label(self, text, box, style, anchor):
+        """Add an ID, header or footer text aligned in its box like PowerPoint does."""
+        left, top, width, _ = box
+        if anchor == 'middle':
+            x = left + width // 2
+        elif anchor == 'end':
+            x = left + width - LABEL_INSET_X
+        else:
+            x = left + LABEL_INSET_X
+        self.text(text, x, top + LABEL_INSET_Y, style.font_size, style.font_color, anchor)
+
+    def markup(self):
+        return ''.join(self.parts) + '</svg>'
+
+def render_slide_svg(plan, index, start, end, styles, slide_width, slide_height):
+    """
+    Draw one slide of a layout plan as SVG, at the coordinates the deck uses.
+
+    Args:
+        plan (LayoutPlan): The layout of the whole deck.
+        index (int): The slide index.
+        start (int): First plan entry of the slide.
+        end (int): End of the slide's plan entries.
+        styles (CompiledStyles): The styles the plan was laid out with.
+        slide_width (int): Slide width in EMU.
+        slide_height (int): Slide height in EMU.
+
+    Returns:
+        str: The <svg> element.
+    """
+    slide = SlidePreview(slide_width, slide_height)
+    type_styles = [styles[name] for name in CONTENT_TYPES]
+    for i in range(start, end):
+        style = type_styles[plan.content_type[i]]
+        left, top, width, height = plan.left[i], plan.top[i], plan.width[i], plan.height[i]
+        slide.box(left, top, width, height, style.border_color, style.border_width)
+        slide.text(plan.token(i), left + style.margin_left, top + style.margin_top,
+                   style.font_size_emu, style.font_color, font_name=style.font_name)
+        if style.display_id:
+            slide.label(str(plan.word_id[i]), (left, top - ID_HEIGHT, width, ID_HEIGHT), styles.id, 'middle')
+    slide.label(styles.header.text, header_box(slide_width, slide_height), styles.header, 'middle')
+    slide.label(f"Page {index + 1} of {plan.slide_count}", footer_box(slide_width, slide_height), styles.footer, 'end')
+    return slide.markup()
+
+def render_preview_html(plan, styles, slide_width, slide_height):
+    """Return an HTML page with the title and one SVG per slide of a layout plan."""
+    slides = [render_slide_svg(plan, index, start, end, styles, slide_width, slide_height)
+              for index, (start, end) in enumerate(plan.slide_ranges())]
+    return (
+        '<!DOCTYPE html>\n<html lang="en">\n<head>\n<meta charset="UTF-8">\n'
+        f'<title>Preview - {html.escape(plan.title)}</title>\n'
+        '<style>body{background:#f0f4f8;margin:20px}'
+        '.slide{display:block;width:100%;max-width:960px;margin:0 auto 20px;box-shadow:0 4px 8px rgba(0,0,0,0.1)}</style>\n'
+        '</head>\n<body>\n' + '\n'.join(slides) + '\n</body>\n</html>\n'
+    )
+
+class Previewer:
+    """
+    Renders previews of dictation decks from the layout alone, without building a deck.
+
+    Pages and single slides are cached by deck_key(), so previewing the same
+    text again with the same styles and template costs a dictionary lookup.
+    """
+
+    def __init__(self, cache_bytes=PREVIEW_CACHE_BYTES):
+        self.cache = DeckCache(cache_bytes, directory=None)
+
+    def _layout(self, title, content):
+        from app.styles import get_styles
+        from app.template_cache import get_base_template
+
+        styles = get_styles()
+        template = get_base_template()
+        return compute_layout(title, content, styles, template.area), styles, template
+
+    def page(self, key, title, content):
+        """Return the HTML preview of a whole deck, as UTF-8 bytes."""
+        def render():
+            plan, styles, template = self._layout(title, content)
+            with span('preview'):
+                page = render_preview_html(plan, styles, template.slide_width, template.slide_height)
+            logger.debug(f"Rendered preview of {plan.slide_count} slides")
+            return page.encode('utf-8')
+        return self.cache.get_or_create(key, render)
+
+    def slide(self, key, title, content, index):
+        """Return the SVG preview of one slide as UTF-8 bytes, or None if the deck has no such slide."""
+        slide_key = f"{key}:{index}"
+        data = self.cache.get(slide_key)
+        if data is None:
+            plan, styles, template = self._layout(title, content)
+            if not 0 <= index < plan.slide_count:
+                return None
+            start, end = plan.slide_ranges()[index]
+            with span('preview'):
+                data = render_slide_svg(plan, index, start, end, styles, template.slide_width, template.slide_height).encode('utf-8')
+            self.cache.put(slide_key, data)
+        return data
+
+# Shared previewer used by the routes
+previewer = Previewer()
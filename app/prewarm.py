@@ -0,0 +1,78 @@
+import contextlib
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# When to load the generation stack: 'off' (on first use), 'startup' (in
+# create_app) or 'first_request' (before the first request is handled)
+PREWARM = os.getenv('PREWARM', 'off')
+
+_lock = threading.Lock()
+_timings = None
+
+@contextlib.contextmanager
+def _step(timings, name):
+    start = time.perf_counter()
+    yield
+    timings[name] = time.perf_counter() - start
+
+def prewarm():
+    """
+    Load everything the first deck of a process would otherwise pay for.
+
+    This imports the generation modules, compiles the styles, loads the fonts
+    (and glyph tables for the 'advance' measurement backend), parses the base
+    template and builds the text box templates. It runs once per process, so
+    it can be called from a gunicorn post_fork hook, in create_app or on the
+    first request.
+
+    Returns:
+        dict: Seconds spent per step during the first call.
+    """
+    global _timings
+    if _timings is not None:
+        return _timings
+    with _lock:
+        if _timings is not None:
+            return _timings
+        timings = {}
+        with _step(timings, 'imports'):
+            from app.font_cache import font_metrics
+            from app.layout import CONTENT_TYPES
+            from app.measure import get_measure_backend
+            from app.ppt_generator import add_content_slide
+            from app.styles import get_styles
+            from app.template_cache import get_base_template
+            from app.xml_renderer import get_shape_templates
+        with _step(timings, 'styles'):
+            styles = get_styles()
+        with _step(timings, 'fonts'):
+            backend = get_measure_backend()
+            for name in CONTENT_TYPES:
+                style = styles[name]
+                font_metrics.get_font(style.font_path, style.font_size)
+                if hasattr(backend, 'table'):
+                    backend.table(style.font_path, style.font_size)
+        with _step(timings, 'template'):
+            template = get_base_template()
+            ppt = template.new_presentation()
+            add_content_slide(ppt, "", "", template.content_layout(ppt))
+            get_shape_templates(styles)
+        _timings = timings
+    logger.info("Prewarmed generation stack in " + ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in timings.items()))
+    return timings
+
+def init_app(app):
+    """Prewarm according to the app's PREWARM setting."""
+    mode = app.config.setdefault('PREWARM', PREWARM)
+    if mode == 'startup':
+        prewarm()
+    elif mode == 'first_request':
+        @app.before_request
+        def prewarm_before_request():
+            prewarm()
+    elif mode != 'off':
+        raise ValueError(f"Unknown PREWARM mode: {mode}")
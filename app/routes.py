@@ -1,20 +1,115 @@
 import os
-import io
 import logging
-from flask import Blueprint, request, session, send_file, render_template, redirect, url_for, flash
-from app.ppt_generator import create_ppt_from_text, create_ppt_dictation_from_text  # Adjust import if necessary
+import tempfile
+import zipfile
+from flask import Blueprint, Response, current_app, jsonify, request, session, send_file, render_template, redirect, url_for, flash
+from werkzeug.exceptions import RequestEntityTooLarge
 from app.email_service import send_email  # Optional
+from app.admission import Overloaded, estimate_cost
+from app.deck_cache import deck_cache, deck_key
+from app.incremental import regenerate, render_snapshot, snapshots
+from app.batch import BATCH_MAX_ITEMS, BATCH_WORKERS, BatchTooLarge, iter_jsonl, iter_zip, limit_items, run_batch
+from app.jobs import DONE, GENERATION_MODE
+from app.ingest import MAX_INPUT_WORDS, InputTooLarge, iter_text_lines, iter_upload_lines, read_submission
+from app.streaming import DeckTooLarge, pptx_response, save_presentation
+from app.font_cache import cache_info
+from app.instrumentation import render_metrics
 from io import BytesIO
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 index = Blueprint('index', __name__)
 
-# Session and streaming size limits
-SESSION_SIZE_LIMIT = int(os.getenv('SESSION_SIZE_LIMIT', 3500))  # Fallback to 3500 bytes if not set
+# Input and streaming size limits
+INPUT_SIZE_LIMIT = int(os.getenv('INPUT_SIZE_LIMIT', 5 * 1024 * 1024))  # Default 5 MB of text
 STREAMING_SIZE_LIMIT = int(os.getenv('STREAMING_SIZE_LIMIT', 1024 * 1024))  # Default 1 MB streaming limit
+# Room for the form fields, boundaries and headers around the input in a request body
+MULTIPART_OVERHEAD = 64 * 1024
+# Maximum size of a request body; 0 allows the input limit plus the form overhead
+MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', 0))
+
+# 'buffered' renders on POST and keeps the deck for caching and email,
+# 'stream' renders on download and streams the deck from a spooled file
+OUTPUT_MODE = os.getenv('OUTPUT_MODE', 'buffered')
+DOWNLOAD_NAME = "dictation-output.pptx"
+
+def get_job_store():
+    """Return the server-side job store of the current app."""
+    return current_app.extensions['job_store']
+
+def get_job_manager():
+    """Return the generation job manager of the current app."""
+    return current_app.extensions['job_manager']
+
+def get_mail_queue():
+    """Return the outbound mail queue of the current app."""
+    return current_app.extensions['mail_queue']
+
+def get_admission():
+    """Return the admission controller of the current app."""
+    return current_app.extensions['admission']
+
+def render_deck(title, content, limit=None):
+    """
+    Render a deck and save it into a spooled temporary file.
+
+    Args:
+        title (str): The presentation title.
+        content (str): The dictation content.
+        limit (int): Maximum size of the saved deck in bytes, or None.
+
+    Returns:
+        tuple: (file, size) with the real number of bytes written.
+
+    Raises:
+        DeckTooLarge: As soon as the saved deck goes over the limit.
+        Overloaded: If the server is too busy to render it.
+    """
+    # Imported on first use so the app starts without the generation stack
+    from app.ppt_generator import create_ppt_dictation_from_text
+
+    with get_admission().admit(estimate_cost(content)):
+        ppt = create_ppt_dictation_from_text(title, content)
+        return save_presentation(ppt, limit)
+
+def generate_deck(title, content, limit=None, previous=None):
+    """
+    Return the .pptx bytes for title and content, rendering only on a cache miss.
+
+    When the deck of the previous submission is still snapshotted, only the
+    slides that the edit changed are rendered again.
+
+    Args:
+        title (str): The presentation title.
+        content (str): The dictation content.
+        limit (int): Maximum size of the saved deck in bytes, or None.
+        previous (tuple): (title, content) of the submission this one edits, or None.
+
+    Returns:
+        bytes: The saved PowerPoint file.
+
+    Raises:
+        DeckTooLarge: If the deck goes over the limit.
+        Overloaded: If the deck is not cached and the server is too busy to render it.
+    """
+    key = deck_key(title, content)
+    admission = get_admission()
+
+    def render():
+        base = snapshots.get(deck_key(*previous)) if previous else None
+        # A regeneration may fall back to a full render, so it is admitted at the full cost
+        with admission.admit(estimate_cost(content)):
+            if base is not None:
+                snapshot = regenerate(base, title, content, limit)
+            else:
+                snapshot = render_snapshot(title, content, limit)
+        snapshots.put(key, snapshot)
+        return snapshot.data
+
+    ppt_data = deck_cache.get_or_create(key, render)
+    if limit is not None and len(ppt_data) > limit:
+        raise DeckTooLarge(f"Deck exceeds {limit} bytes.")
+    return ppt_data
 
 def is_safe_upload(filename):
     """
@@ -30,36 +125,45 @@ def is_safe_upload(filename):
     # Check if the filename has a valid extension
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in allowed_extensions
 
-def validate_input(text_input, file_input):
+def read_input(text_input, file_input, max_bytes=INPUT_SIZE_LIMIT, max_words=MAX_INPUT_WORDS):
     """
-    Validates that either text input or file input is provided.
-    
+    Validates that either text input or file input is provided and reads it
+    into a title and content. Uploads are read in chunks and rejected as soon
+    as they go over the size or word limit.
+
     Args:
         text_input (str): The text input from the form.
         file_input (FileStorage): The uploaded file input from the form.
+        max_bytes (int): Maximum size of the input in bytes.
+        max_words (int): Maximum number of words, 0 for no limit.
 
     Returns:
-        tuple: (bool, str) where bool indicates if the input is valid 
-               and str contains either text content or an error message.
+        tuple: (bool, result) where bool indicates if the input is valid and
+               result is either a (title, content) tuple or an error message.
     """
     if not text_input and not file_input:
         logger.warning("Input validation failed: No input provided.")
         return False, "Please enter text or upload a file."
 
-    if file_input:
-        # Check if the file is safe to upload
-        if not is_safe_upload(file_input.filename):
-            logger.warning(f"Invalid file type: {file_input.filename}")
-            return False, "File type not allowed. Only .txt files are accepted."
-        
-        try:
-            text_input = file_input.read().decode('utf-8')
-        except Exception as e:
-            logger.error(f"Error reading uploaded file: {e}")
-            return False, f"Error reading uploaded file: {e}"
+    try:
+        if file_input:
+            # Check if the file is safe to upload
+            if not is_safe_upload(file_input.filename):
+                logger.warning(f"Invalid file type: {file_input.filename}")
+                return False, "File type not allowed. Only .txt files are accepted."
+            lines = iter_upload_lines(file_input.stream, max_bytes, max_words)
+        else:
+            lines = iter_text_lines(text_input, max_bytes, max_words)
+        title, content = read_submission(lines)
+    except InputTooLarge as e:
+        logger.warning(f"Input size exceeded limit: {e}")
+        return False, "Your input is too large. Please reduce the text length."
+    except Exception as e:
+        logger.error(f"Error reading uploaded file: {e}")
+        return False, f"Error reading uploaded file: {e}"
 
     logger.info("Input validation passed.")
-    return True, text_input
+    return True, (title, content)
 
 @index.route('/', methods=['GET', 'POST'])
 def index_route():
@@ -75,55 +179,70 @@ def index_route():
         text_input = request.form.get('text_input', '').strip()
         file_input = request.files.get('file_input')
 
-        # Validate the inputs
-        is_valid, result = validate_input(text_input, file_input)
+        # Validate the inputs and extract title and content within the size limits
+        is_valid, result = read_input(
+            text_input, file_input,
+            current_app.config.get('INPUT_SIZE_LIMIT', INPUT_SIZE_LIMIT),
+            current_app.config.get('MAX_INPUT_WORDS', MAX_INPUT_WORDS),
+        )
         if not is_valid:
             return render_template('index.html', message=result, result="fail")
 
-        text_input = result
+        title, content = result
+
+        # Store title and content server-side; the session only carries the token
+        job_store = get_job_store()
+        previous_token = session.get('submission')
+        previous = job_store.get_submission(previous_token) if previous_token else None
+        token = job_store.create_submission(title, content)
+        session['submission'] = token
+
+        # Handle email sending or file download
+        email_input = request.form.get('email_input', None)
 
-        # Process the input to extract title and content
-        lines = text_input.splitlines()
-        title = lines[0].strip() if lines else ""
-        content = "\n".join(line.strip() for line in lines[1:])
+        # Hand generation over to the worker pool; email submissions are still rendered inline
+        if current_app.config.get('GENERATION_MODE', GENERATION_MODE) == 'async' and not email_input:
+            cached = deck_cache.get(deck_key(title, content))
+            if cached is not None:
+                job_store.put_artefact(token, 'pptx', cached)
+                job_store.put_job(token, DONE)
+            else:
+                get_job_manager().submit(job_store, token)
+            logger.info(f"Generation job {token} queued.")
 
-        # Check session size limit before storing
-        session_data = f"{title}\n{content}"
-        if len(session_data.encode('utf-8')) > SESSION_SIZE_LIMIT:
-            logger.warning("Session data size exceeded limit.")
-            return render_template('index.html', message="Your input is too large. Please reduce the text length.", result="fail")
+            if request.accept_mimetypes.best == 'application/json':
+                return jsonify(job_status(token)), 202
+            return render_template('index.html', message="Your PowerPoint is being generated...", job_id=token, result="success")
 
-        # Store title and content in the session
-        session['title'] = title
-        session['content'] = content
+        # In stream mode the deck is only rendered when it is downloaded
+        if current_app.config.get('OUTPUT_MODE', OUTPUT_MODE) == 'stream' and not email_input:
+            return render_template('index.html', message="Your PowerPoint is ready!", download_url=True, result="success")
 
         # Generate PowerPoint
         try:
             logger.info("Generating PowerPoint...")
-            ppt = create_ppt_dictation_from_text(title, content)
-            ppt_io = io.BytesIO()
-            ppt.save(ppt_io)
-            ppt_io.seek(0)
-
-            # Check if the PowerPoint exceeds the streaming size limit
-            ppt_size = ppt_io.tell()
-            if ppt_size > STREAMING_SIZE_LIMIT:
+            try:
+                # The size limit is enforced on the bytes actually written
+                ppt_data = generate_deck(title, content, STREAMING_SIZE_LIMIT, previous)
+            except DeckTooLarge:
                 logger.warning("Generated PowerPoint exceeds streaming size limit.")
                 return render_template('index.html', message="The generated PowerPoint is too large to download directly.", result="fail")
-
-            # Handle email sending or file download
-            email_input = request.form.get('email_input', None)
+            job_store.put_artefact(token, 'pptx', ppt_data)
 
             if email_input:
-                ppt_io.seek(0)  # Reset IO stream to the beginning
-                send_email(email_input, "Your PowerPoint Presentation", "Here is your generated presentation.", ppt_io)
-                logger.info(f"PowerPoint sent to email: {email_input}")
-                return render_template('index.html', message="PowerPoint has been sent to your email!", result="success")
+                # Delivery happens in the background; the request does not wait for SMTP
+                mail_id = send_email(email_input, "Your PowerPoint Presentation", "Here is your generated presentation.", token)
+                logger.info(f"PowerPoint queued for email to {email_input} as {mail_id}.")
+                if request.accept_mimetypes.best == 'application/json':
+                    return jsonify(get_mail_queue().status(mail_id)), 202
+                return render_template('index.html', message="PowerPoint will be sent to your email shortly!", mail_id=mail_id, result="success")
 
             # Provide download URL if no email is provided
             logger.info("PowerPoint generation successful.")
             return render_template('index.html', message="Your PowerPoint is ready!", download_url=True, result="success")
 
+        except Overloaded:
+            raise
         except Exception as e:
             logger.error(f"Error generating PowerPoint: {e}")
             return render_template('index.html', message="Error generating PowerPoint. Please try again later.", result="fail")
@@ -133,34 +252,263 @@ def index_route():
 @index.route('/download')
 def download_file():
     """
-    Allows the user to download the generated PowerPoint file from session data.
+    Allows the user to download the generated PowerPoint file of the submission
+    referenced by the session token.
 
     Returns:
         Response object with the PowerPoint file or error message.
     """
-    title = session.get('title', None)
-    content = session.get('content', None)
+    token = session.get('submission', None)
+    job_store = get_job_store()
+    submission = job_store.get_submission(token) if token else None
 
-    if not title or not content:
+    if not submission:
         logger.warning("Download attempt with no PowerPoint available.")
         return "No PowerPoint available for download. Please generate one first.", 400
 
-    # Check if the session data exceeds the streaming limit
-    session_data = f"{title}\n{content}"
-    if len(session_data.encode('utf-8')) > STREAMING_SIZE_LIMIT:
-        logger.warning("Generated PowerPoint exceeds streaming size limit during download.")
-        return "The generated PowerPoint is too large to download directly. Please reduce the content size or check back later for a link.", 200
-
     try:
-        # Generate PowerPoint from session data
-        ppt = create_ppt_dictation_from_text(title, content)
-        ppt_io = io.BytesIO()
-        ppt.save(ppt_io)
-        ppt_io.seek(0)
+        # Reuse the deck stored by the index route or cached
+        ppt_data = job_store.get_artefact(token, 'pptx') or deck_cache.get(deck_key(*submission))
+        if ppt_data is not None:
+            if len(ppt_data) > STREAMING_SIZE_LIMIT:
+                raise DeckTooLarge(f"Deck exceeds {STREAMING_SIZE_LIMIT} bytes.")
+            file, size = BytesIO(ppt_data), len(ppt_data)
+        elif current_app.config.get('OUTPUT_MODE', OUTPUT_MODE) == 'stream':
+            # Stream straight from the spooled file without keeping the bytes
+            file, size = render_deck(*submission, STREAMING_SIZE_LIMIT)
+        else:
+            ppt_data = generate_deck(*submission, STREAMING_SIZE_LIMIT)
+            job_store.put_artefact(token, 'pptx', ppt_data)
+            file, size = BytesIO(ppt_data), len(ppt_data)
 
         logger.info("PowerPoint file ready for download.")
-        return send_file(ppt_io, download_name="dictation-output.pptx", as_attachment=True)
+        return pptx_response(file, size, DOWNLOAD_NAME)
 
+    except DeckTooLarge:
+        logger.warning("Generated PowerPoint exceeds streaming size limit during download.")
+        return "The generated PowerPoint is too large to download directly. Please reduce the content size or check back later for a link.", 200
+    except Overloaded:
+        raise
     except Exception as e:
         logger.error(f"Error during PowerPoint download: {e}")
         return "Error generating PowerPoint for download. Please try again later.", 500
+
+@index.route('/preview', methods=['GET', 'POST'])
+def preview_route():
+    """
+    Shows how the dictation will wrap and paginate, from the layout alone.
+
+    POST takes the same form as the homepage, GET previews the submission of
+    the session. The deck is not built: every slide's boxes, word IDs, header
+    and footer are drawn as SVG at the coordinates the deck uses. With
+    ?slide=N, only slide N (from 1) is returned, as an SVG image.
+
+    Returns:
+        Response object with the HTML page or SVG image, or an error message.
+    """
+    # Imported on first use so the app starts without the generation stack
+    from app.preview import previewer
+
+    if request.method == 'POST':
+        is_valid, result = read_input(
+            request.form.get('text_input', '').strip(), request.files.get('file_input'),
+            current_app.config.get('INPUT_SIZE_LIMIT', INPUT_SIZE_LIMIT),
+            current_app.config.get('MAX_INPUT_WORDS', MAX_INPUT_WORDS),
+        )
+        if not is_valid:
+            return result, 400
+        title, content = result
+    else:
+        token = session.get('submission', None)
+        submission = get_job_store().get_submission(token) if token else None
+        if not submission:
+            return "No text to preview. Please enter one first.", 400
+        title, content = submission
+
+    key = deck_key(title, content)
+    slide = request.args.get('slide', type=int)
+    if slide is None:
+        response = Response(previewer.page(key, title, content), mimetype='text/html')
+    else:
+        data = previewer.slide(key, title, content, slide - 1)
+        if data is None:
+            return "Unknown slide.", 404
+        response = Response(data, mimetype='image/svg+xml')
+
+    # The key covers the text, styles and template, so it identifies the preview
+    response.set_etag(f"{key}:{slide or 0}")
+    return response.make_conditional(request)
+
+@index.errorhandler(RequestEntityTooLarge)
+def request_too_large(error):
+    """
+    Answers a request whose body is over MAX_CONTENT_LENGTH with a 413.
+
+    The body is refused from its Content-Length, or as soon as reading it
+    goes over the limit, before the form is parsed.
+
+    Returns:
+        Response object with the homepage, a JSON error or a plain message.
+    """
+    logger.warning(f"Request body exceeds {current_app.config.get('MAX_CONTENT_LENGTH')} bytes.")
+    message = "Your input is too large. Please reduce the text length."
+    if request.endpoint == 'index.index_route':
+        if request.accept_mimetypes.best == 'application/json':
+            return jsonify({'error': message}), 413
+        return render_template('index.html', message=message, result="fail"), 413
+    return message, 413
+
+@index.errorhandler(Overloaded)
+def overloaded_error(error):
+    """
+    Turns a rejected generation into a 503 response with a Retry-After header.
+
+    Returns:
+        Response object with the homepage, a JSON error or a plain message.
+    """
+    if request.endpoint == 'index.index_route':
+        if request.accept_mimetypes.best == 'application/json':
+            response = jsonify({'error': str(error)})
+        else:
+            response = current_app.make_response(render_template(
+                'index.html', message="The server is busy. Please try again in a moment.", result="fail"))
+    else:
+        response = current_app.make_response("The server is busy. Please try again in a moment.")
+    response.status_code = 503
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+def job_status(job_id):
+    """
+    Return the status of a generation job as a JSON-serialisable dict.
+
+    Args:
+        job_id (str): The job id returned when the job was queued.
+
+    Returns:
+        dict: The job status, or None if the job is unknown or expired.
+    """
+    job = get_job_store().get_job(job_id)
+    if job is None:
+        return None
+    if job['status'] == DONE:
+        job['download_url'] = url_for('index.download_job', job_id=job_id)
+    return job
+
+@index.route('/jobs/<job_id>')
+def job_route(job_id):
+    """
+    Reports the status and slide progress of a generation job.
+
+    Returns:
+        JSON response with the job status, or 404 if the job is unknown.
+    """
+    job = job_status(job_id)
+    if job is None:
+        return jsonify({'error': "Unknown job."}), 404
+    return jsonify(job)
+
+@index.route('/mail/<mail_id>')
+def mail_route(mail_id):
+    """
+    Reports the delivery status of an email queued by the index route.
+
+    Returns:
+        JSON response with the status and attempts, or 404 if the email is unknown.
+    """
+    status = get_mail_queue().status(mail_id)
+    if status is None:
+        return jsonify({'error': "Unknown email."}), 404
+    return jsonify(status)
+
+@index.route('/download/<job_id>')
+def download_job(job_id):
+    """
+    Serves the PowerPoint file produced by a finished generation job.
+
+    Returns:
+        Response object with the PowerPoint file or error message.
+    """
+    job_store = get_job_store()
+    job = job_store.get_job(job_id)
+    if job is None:
+        return "Unknown job.", 404
+    if job['status'] != DONE:
+        return f"PowerPoint is not ready yet (status: {job['status']}).", 409
+
+    ppt_data = job_store.get_artefact(job_id, 'pptx')
+    if ppt_data is None:
+        return "Unknown job.", 404
+    if len(ppt_data) > STREAMING_SIZE_LIMIT:
+        logger.warning("Generated PowerPoint exceeds streaming size limit during download.")
+        return "The generated PowerPoint is too large to download directly. Please reduce the content size or check back later for a link.", 200
+
+    logger.info(f"PowerPoint of job {job_id} ready for download.")
+    return pptx_response(BytesIO(ppt_data), len(ppt_data), DOWNLOAD_NAME)
+
+@index.route('/batch', methods=['POST'])
+def batch_route():
+    """
+    Generates a PowerPoint per text of an uploaded .zip of .txt files or .jsonl
+    file of {"title", "content"} objects, in parallel.
+
+    Every text gets the input limits of a single submission and the number of
+    texts is capped by BATCH_MAX_ITEMS. The texts run on the generation pool,
+    BATCH_WORKERS at a time, each admitted at its own cost.
+
+    Returns:
+        Response object with a zip of the generated files and report.json,
+        or an error message.
+    """
+    batch_file = request.files.get('batch_file')
+    if not batch_file or not batch_file.filename:
+        return "Please upload a .zip or .jsonl file.", 400
+
+    max_bytes = current_app.config.get('INPUT_SIZE_LIMIT', INPUT_SIZE_LIMIT)
+    extension = batch_file.filename.rsplit('.', 1)[-1].lower()
+    if extension == 'zip':
+        items = iter_zip(batch_file.stream, max_bytes)
+    elif extension == 'jsonl':
+        items = iter_jsonl(batch_file.stream)
+    else:
+        logger.warning(f"Invalid batch file type: {batch_file.filename}")
+        return "File type not allowed. Only .zip and .jsonl files are accepted.", 400
+
+    try:
+        items = list(limit_items(items, max_bytes,
+                                 current_app.config.get('MAX_INPUT_WORDS', MAX_INPUT_WORDS),
+                                 current_app.config.get('BATCH_MAX_ITEMS', BATCH_MAX_ITEMS)))
+    except zipfile.BadZipFile as e:
+        logger.warning(f"Invalid batch zip file: {e}")
+        return "The uploaded zip file is invalid.", 400
+    except BatchTooLarge as e:
+        logger.warning(f"Batch rejected: {e}")
+        return f"{e} Please split it into smaller batches.", 413
+
+    # Items run on the generation pool, each admitted at its own cost
+    job_manager = get_job_manager()
+    workers = max(1, min(current_app.config.get('BATCH_WORKERS', BATCH_WORKERS), job_manager.workers))
+    output = tempfile.SpooledTemporaryFile(max_size=STREAMING_SIZE_LIMIT)
+    report = run_batch(items, output, workers, job_manager.run, get_admission())
+    output.seek(0)
+
+    logger.info(f"Batch of {report['succeeded'] + report['failed']} texts generated.")
+    response = send_file(output, download_name="dictations.zip", as_attachment=True, mimetype='application/zip')
+    response.headers['X-Batch-Succeeded'] = str(report['succeeded'])
+    response.headers['X-Batch-Failed'] = str(report['failed'])
+    return response
+
+@index.route('/metrics')
+def metrics_route():
+    """
+    Exposes stage timing histograms, counters and cache statistics in the
+    Prometheus text format.
+
+    Returns:
+        Response object with the metrics page.
+    """
+    gauges = {f"font_cache_{name}": value for name, value in cache_info().items()}
+    gauges.update({f"deck_cache_{name}": value for name, value in deck_cache.info().items()})
+    gauges['mail_queue_pending'] = get_mail_queue().pending()
+    gauges.update({f"admission_{name}": value for name, value in get_admission().info().items()})
+    return Response(render_metrics(gauges), mimetype='text/plain; version=0.0.4')
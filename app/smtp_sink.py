@@ -0,0 +1,136 @@
+"""
+Local SMTP server that keeps the emails it receives instead of delivering them.
+
+Usage (from the repository root):
+    python -m app.smtp_sink --port 8025
+    MAIL_SERVER=127.0.0.1 MAIL_PORT=8025 MAIL_USE_TLS=false MAIL_DEFAULT_SENDER=dictation@localhost python run.py
+
+Tests start it on a free port with SMTPSink().start() and read sink.messages.
+Setting sink.fail_next makes that many transactions fail with a temporary
+error, to exercise retries.
+"""
+import argparse
+import email
+import email.policy
+import logging
+import socketserver
+import sys
+import threading
+
+logger = logging.getLogger(__name__)
+
+class _Handler(socketserver.StreamRequestHandler):
+    """Speaks just enough SMTP for smtplib: HELO/EHLO, MAIL, RCPT, DATA, RSET, NOOP, QUIT."""
+
+    def reply(self, line):
+        self.wfile.write(line.encode('ascii') + b"\r\n")
+
+    def handle(self):
+        sink = self.server.sink
+        sink.connections += 1
+        sender, recipients = None, []
+        self.reply("220 localhost SMTP sink ready")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('utf-8', 'replace').strip()
+            verb = command[:4].upper()
+            if verb in ('HELO', 'EHLO'):
+                self.reply("250 localhost")
+            elif verb == 'MAIL':
+                sender, recipients = command.split(':', 1)[1].strip(), []
+                self.reply("250 OK")
+            elif verb == 'RCPT':
+                recipients.append(command.split(':', 1)[1].strip())
+                self.reply("250 OK")
+            elif verb == 'DATA':
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = self._read_data()
+                if sink.take_failure():
+                    self.reply("451 Temporary failure, try again later")
+                else:
+                    sink.received(sender, recipients, data)
+                    self.reply("250 OK")
+                sender, recipients = None, []
+            elif verb == 'RSET':
+                sender, recipients = None, []
+                self.reply("250 OK")
+            elif verb == 'NOOP':
+                self.reply("250 OK")
+            elif verb == 'QUIT':
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+    def _read_data(self):
+        lines = []
+        while True:
+            line = self.rfile.readline()
+            if not line or line in (b".\r\n", b".\n"):
+                return b"".join(lines)
+            if line.startswith(b".."):
+                line = line[1:]
+            lines.append(line)
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+class SMTPSink:
+    """SMTP server on a background thread that records received messages."""
+
+    def __init__(self, host='127.0.0.1', port=0):
+        self.host = host
+        self.port = port
+        self.messages = []
+        self.connections = 0
+        self.fail_next = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    def take_failure(self):
+        with self._lock:
+            if self.fail_next > 0:
+                self.fail_next -= 1
+                return True
+            return False
+
+    def received(self, sender, recipients, data):
+        message = email.message_from_bytes(data, policy=email.policy.default)
+        with self._lock:
+            self.messages.append({'sender': sender, 'recipients': recipients, 'message': message})
+        logger.info(f"Received email from {sender} to {', '.join(recipients)}: {message['Subject']}")
+
+    def start(self):
+        """Start serving in a daemon thread; the bound port is in self.port."""
+        self._server = _Server((self.host, self.port), _Handler)
+        self._server.sink = self
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, name='smtp-sink', daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a local SMTP server that prints received emails.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8025)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    sink = SMTPSink(args.host, args.port).start()
+    print(f"SMTP sink listening on {sink.host}:{sink.port}", flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        sink.stop()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,106 @@
+import logging
+import os
+import tempfile
+from flask import Response
+from app.instrumentation import count, span
+
+logger = logging.getLogger(__name__)
+
+PPTX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.presentationml.presentation'
+
+# Decks larger than this are spooled to a temporary file instead of memory
+SPOOL_THRESHOLD = int(os.getenv('SPOOL_THRESHOLD', 1024 * 1024))  # Default 1 MB
+# Size of the chunks sent to the client
+STREAM_CHUNK_SIZE = int(os.getenv('STREAM_CHUNK_SIZE', 64 * 1024))
+
+class DeckTooLarge(Exception):
+    """Raised while saving a deck as soon as its output goes over the size limit."""
+
+class SizeLimitedWriter:
+    """
+    File wrapper that counts the bytes actually written and enforces a limit.
+
+    zipfile seeks back to patch headers, so the size is the furthest position
+    written rather than the sum of the writes.
+    """
+
+    def __init__(self, file, limit=None):
+        self.file = file
+        self.limit = limit
+        self.size = 0
+
+    def write(self, data):
+        written = self.file.write(data)
+        position = self.file.tell()
+        if position > self.size:
+            self.size = position
+            if self.limit is not None and self.size > self.limit:
+                raise DeckTooLarge(f"Deck exceeds {self.limit} bytes.")
+        return written
+
+    def tell(self):
+        return self.file.tell()
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        return self.file.seek(offset, whence)
+
+    def seekable(self):
+        return True
+
+    def flush(self):
+        self.file.flush()
+
+def save_presentation(ppt, limit=None, spool_threshold=SPOOL_THRESHOLD):
+    """
+    Save a presentation into a spooled temporary file, counting its real size.
+
+    Args:
+        ppt (Presentation): The presentation to save.
+        limit (int): Maximum size in bytes, or None for no limit.
+        spool_threshold (int): Size above which the file moves from memory to disk.
+
+    Returns:
+        tuple: (file, size) with the file rewound to its start.
+
+    Raises:
+        DeckTooLarge: As soon as the output goes over the limit.
+    """
+    file = tempfile.SpooledTemporaryFile(max_size=spool_threshold)
+    writer = SizeLimitedWriter(file, limit)
+    try:
+        with span('save'):
+            ppt.save(writer)
+    except BaseException:
+        file.close()
+        raise
+    file.seek(0)
+    count('output_bytes', writer.size)
+    return file, writer.size
+
+def iter_file_chunks(file, chunk_size=STREAM_CHUNK_SIZE):
+    """Yield the contents of a file in chunks, closing it at the end."""
+    try:
+        while True:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        file.close()
+
+def pptx_response(file, size, download_name):
+    """
+    Build a response streaming a saved deck to the client in chunks.
+
+    Args:
+        file: Binary file object positioned at the start of the deck.
+        size (int): Size of the deck in bytes.
+        download_name (str): File name offered to the client.
+
+    Returns:
+        Response: The streamed attachment.
+    """
+    response = Response(iter_file_chunks(file), mimetype=PPTX_MIMETYPE, direct_passthrough=True)
+    response.headers['Content-Disposition'] = f'attachment; filename={download_name}'
+    response.content_length = size
+    return response
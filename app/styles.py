@@ -0,0 +1,187 @@
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pptx.dml.color import RGBColor
+from pptx.util import Pt
+
+logger = logging.getLogger(__name__)
+
+# styles.json lives at the repository root, next to the app package
+STYLES_PATH = os.getenv('STYLES_PATH', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'styles.json'))
+# Number of compiled override combinations kept
+STYLE_OVERRIDES_CACHE_SIZE = 32
+
+class FrozenStyle:
+    """Base class of compiled styles; attributes cannot be changed once built."""
+
+    __slots__ = ()
+
+    def __init__(self, **values):
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __repr__(self):
+        values = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({values})"
+
+class TextStyle(FrozenStyle):
+    """Style of a word or punctuation box, with lengths in EMU and colours pre-built."""
+
+    __slots__ = ('font_path', 'font_name', 'font_size', 'font_size_emu', 'font_color', 'border_color',
+                 'border_width', 'margin_left', 'margin_right', 'margin_top', 'margin_bottom',
+                 'count_id', 'display_id')
+
+class LabelStyle(FrozenStyle):
+    """Style of the word ID labels, header and footer."""
+
+    __slots__ = ('text', 'font_size', 'font_color')
+
+class CompiledStyles(FrozenStyle):
+    """
+    All styles of a deck, compiled from a styles.json document.
+
+    key identifies the document (including overrides) for caches.
+    """
+
+    __slots__ = ('word', 'punctuation', 'id', 'header', 'footer', 'key', 'source')
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+def _resolve_path(path, base_dir):
+    return path if os.path.isabs(path) else os.path.join(base_dir, path)
+
+def _compile_text_style(values, base_dir):
+    return TextStyle(
+        font_path=_resolve_path(values['font_path'], base_dir),
+        font_name=values['font_name'],
+        font_size=values['font_size'],
+        font_size_emu=Pt(values['font_size']),
+        font_color=RGBColor(*values['font_color']),
+        border_color=RGBColor(*values['border_color']),
+        border_width=Pt(values['border_width']),
+        margin_left=Pt(values['margin_left']),
+        margin_right=Pt(values['margin_right']),
+        margin_top=Pt(values['margin_top']),
+        margin_bottom=Pt(values['margin_bottom']),
+        count_id=bool(values['count_id']),
+        display_id=bool(values['display_id']),
+    )
+
+def _compile_label_style(values):
+    color = values.get('font_color')
+    return LabelStyle(
+        text=values.get('text'),
+        font_size=Pt(values['font_size']),
+        font_color=RGBColor(*color) if color is not None else None,
+    )
+
+def compile_styles(document, base_dir='.'):
+    """
+    Compile a styles document into immutable style objects.
+
+    Args:
+        document (dict): Styles as found in styles.json.
+        base_dir (str): Directory relative font paths are resolved against.
+
+    Returns:
+        CompiledStyles: The compiled styles.
+    """
+    canonical = json.dumps(document, sort_keys=True, separators=(',', ':'))
+    return CompiledStyles(
+        word=_compile_text_style(document['word'], base_dir),
+        punctuation=_compile_text_style(document['punctuation'], base_dir),
+        id=_compile_label_style(document['id']),
+        header=_compile_label_style(document['header']),
+        footer=_compile_label_style(document['footer']),
+        key=hashlib.sha256(canonical.encode('utf-8')).hexdigest(),
+        source=document,
+    )
+
+def merge_styles(document, overrides):
+    """Return a copy of a styles document with overrides merged in, section by section."""
+    merged = copy.deepcopy(document)
+    for section, values in overrides.items():
+        if section not in merged:
+            raise KeyError(f"Unknown style section: {section}")
+        merged[section].update(values)
+    return merged
+
+class StyleRegistry:
+    """
+    Loads and compiles styles.json, reloading it when its modification time changes.
+
+    Compiled per-request overrides are cached, so overriding a value does not
+    re-read or re-parse the file.
+    """
+
+    def __init__(self, path=STYLES_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._styles = None
+        self._overrides = OrderedDict()
+
+    def _load(self):
+        mtime = os.stat(self.path).st_mtime_ns
+        if mtime == self._mtime:
+            return self._styles
+        with self._lock:
+            if mtime != self._mtime:
+                try:
+                    with open(self.path, 'r') as f:
+                        document = json.load(f)
+                    self._styles = compile_styles(document, os.path.dirname(self.path))
+                except Exception as e:
+                    logger.error(f"Failed to load styles from JSON: {e}")
+                    if self._styles is None:
+                        raise
+                    # Keep serving the previous styles until the file is fixed
+                else:
+                    self._overrides.clear()
+                    logger.info(f"Loaded styles from {self.path}")
+                self._mtime = mtime
+            return self._styles
+
+    def get(self, overrides=None):
+        """
+        Return the compiled styles, optionally with per-request overrides.
+
+        Args:
+            overrides (dict): Section -> {name: value} to change, e.g.
+                {'word': {'font_size': 28}}.
+
+        Returns:
+            CompiledStyles: The compiled styles.
+        """
+        styles = self._load()
+        if not overrides:
+            return styles
+
+        key = json.dumps(overrides, sort_keys=True)
+        with self._lock:
+            compiled = self._overrides.get(key)
+            if compiled is not None:
+                self._overrides.move_to_end(key)
+                return compiled
+
+        compiled = compile_styles(merge_styles(styles.source, overrides), os.path.dirname(self.path))
+        with self._lock:
+            self._overrides[key] = compiled
+            if len(self._overrides) > STYLE_OVERRIDES_CACHE_SIZE:
+                self._overrides.popitem(last=False)
+        return compiled
+
+# Shared registry used by the generator
+style_registry = StyleRegistry()
+
+def get_styles(overrides=None):
+    """Return the current compiled styles, optionally with overrides."""
+    return style_registry.get(overrides)
@@ -0,0 +1,120 @@
+import copy
+import hashlib
+import io
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Optional .pptx with the school's branding (masters, layouts, theme); the core
+# library's default template is used when unset
+BASE_TEMPLATE_PATH = os.getenv('BASE_TEMPLATE_PATH') or None
+# Index of the title-and-content layout used for dictation slides
+CONTENT_LAYOUT = int(os.getenv('CONTENT_LAYOUT', 1))
+# Placeholder holding the dictation text, replaced by the text boxes
+CONTENT_PLACEHOLDER_IDX = 1
+
+class BaseTemplate:
+    """
+    Pre-parsed prototype presentation that new decks are cloned from.
+
+    The content placeholder is removed from the dictation layout, so slides
+    created from it only get the title placeholder. Its geometry is kept in
+    area for the layout stage, along with the slide size in EMU. The prototype
+    itself must not be modified or read through python-pptx proxies, only cloned.
+    """
+
+    __slots__ = ('prototype', 'layout_index', 'area', 'slide_width', 'slide_height', 'key')
+
+    def __init__(self, prototype, layout_index, area, slide_width, slide_height, key):
+        self.prototype = prototype
+        self.layout_index = layout_index
+        self.area = area
+        self.slide_width = slide_width
+        self.slide_height = slide_height
+        self.key = key
+
+    def new_presentation(self):
+        """Return an independent copy of the prototype, without touching the disk."""
+        return copy.deepcopy(self.prototype)
+
+    def content_layout(self, ppt):
+        """Return the dictation layout of a presentation cloned from this template."""
+        return ppt.slide_layouts[self.layout_index]
+
+def template_digest(path=BASE_TEMPLATE_PATH):
+    """Identify the base template without parsing it: the default one, or a file's size and mtime."""
+    if path is None:
+        return 'default'
+    stat = os.stat(path)
+    return hashlib.sha256(f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}".encode('utf-8')).hexdigest()
+
+def load_template(path=BASE_TEMPLATE_PATH, layout_index=CONTENT_LAYOUT):
+    """
+    Parse a base template and strip the content placeholder from its dictation layout.
+
+    Args:
+        path (str): Path of a branding .pptx, or None for the core library's default.
+        layout_index (int): Index of the title-and-content layout.
+
+    Returns:
+        BaseTemplate: The prototype, the content area geometry and the slide size.
+    """
+    from pptx import Presentation
+    from app.layout import ContentArea
+
+    if path is None:
+        from core.file_generator.pptx import create_ppt
+        prototype = create_ppt()
+    else:
+        prototype = Presentation(path)
+
+    layout = prototype.slide_layouts[layout_index]
+    placeholder = layout.placeholders.get(idx=CONTENT_PLACEHOLDER_IDX)
+    if placeholder is None:
+        raise ValueError(f"Layout {layout_index} of the base template has no content placeholder")
+    # Position and size are inherited from the master when the layout does not set them
+    area = ContentArea.from_shape(placeholder)
+    sp = placeholder._element
+    sp.getparent().remove(sp)
+    slide_width, slide_height = int(prototype.slide_width), int(prototype.slide_height)
+
+    # Reload the stripped deck so the prototype holds no cached proxy objects:
+    # those keep references to XML subelements, which deepcopy would detach
+    buffer = io.BytesIO()
+    prototype.save(buffer)
+    buffer.seek(0)
+    return BaseTemplate(Presentation(buffer), layout_index, area, slide_width, slide_height, template_digest(path))
+
+class TemplateCache:
+    """Keeps one parsed BaseTemplate per template file, reloading a file when it changes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._templates = {}
+
+    def get(self, path=BASE_TEMPLATE_PATH, layout_index=CONTENT_LAYOUT):
+        """Return the BaseTemplate for path, parsing it only on first use or after a change."""
+        key = template_digest(path)
+        template = self._templates.get((path, layout_index))
+        if template is not None and template.key == key:
+            return template
+        with self._lock:
+            template = self._templates.get((path, layout_index))
+            if template is None or template.key != key:
+                template = load_template(path, layout_index)
+                self._templates[(path, layout_index)] = template
+                logger.info(f"Loaded base template {path or 'default'}")
+        return template
+
+    def clear(self):
+        with self._lock:
+            self._templates.clear()
+
+# Shared cache used by the generator
+template_cache = TemplateCache()
+
+def get_base_template():
+    """Return the configured base template."""
+    return template_cache.get(BASE_TEMPLATE_PATH, CONTENT_LAYOUT)
@@ -0,0 +1,106 @@
+import re
+from array import array
+
+# Words and single punctuation marks; the matching group gives the content type
+TOKEN_PATTERN = re.compile(r'(\w+)|([^\w\s])', re.UNICODE)
+
+# Content type codes, in the order of app.layout.CONTENT_TYPES
+WORD = 0
+PUNCTUATION = 1
+
+class TokenStream:
+    """
+    Tokens of a text, stored as offsets into it rather than as substrings.
+
+    Token i spans text[starts[i]:ends[i]] and has content type codes[i];
+    line_starts[n] is the index of the first token of line n. Substrings are
+    only built when a token is read, so the stream itself costs a few bytes
+    per token on top of the text.
+    """
+
+    __slots__ = ('text', 'starts', 'ends', 'codes', 'line_starts')
+
+    def __init__(self, text):
+        self.text = text
+        self.starts = array('L')
+        self.ends = array('L')
+        self.codes = array('B')
+        self.line_starts = array('L')
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, index):
+        return self.text[self.starts[index]:self.ends[index]]
+
+    @property
+    def line_count(self):
+        return len(self.line_starts)
+
+    def line_range(self, line):
+        """Return the (first, end) token indexes of a line."""
+        end = self.line_starts[line + 1] if line + 1 < len(self.line_starts) else len(self.codes)
+        return self.line_starts[line], end
+
+    def tokens(self, first=0, end=None):
+        """Return the substrings of tokens first..end."""
+        text = self.text
+        return [text[start:stop] for start, stop in zip(self.starts[first:end], self.ends[first:end])]
+
+    def line(self, line):
+        """Return the (token, content type code) pairs of a line."""
+        first, end = self.line_range(line)
+        return list(zip(self.tokens(first, end), self.codes[first:end]))
+
+    def add_line(self, start, end):
+        """Tokenize text[start:end] as the next line, without copying it."""
+        self.line_starts.append(len(self.codes))
+        matches = list(TOKEN_PATTERN.finditer(self.text, start, end))
+        self.starts.extend(map(re.Match.start, matches))
+        self.ends.extend(map(re.Match.end, matches))
+        # Group 1 matches words (WORD = 0), group 2 punctuation (PUNCTUATION = 1)
+        self.codes.extend([match.lastindex - 1 for match in matches])
+
+def iter_lines(text, stream=None):
+    """
+    Tokenize text one line at a time, yielding as soon as each line is done.
+
+    Lines are separated by '\\n' only, like text.split('\\n'). Tokens go into
+    one TokenStream, so the text is scanned once and memory grows with the
+    token count rather than with copies of the lines.
+
+    Args:
+        text (str): The text to tokenize.
+        stream (TokenStream): Stream of text to add the tokens to; a new one by default.
+
+    Yields:
+        tuple: (stream, line number, first token index, end token index).
+    """
+    if stream is None:
+        stream = TokenStream(text)
+    start = 0
+    line = 0
+    while True:
+        end = text.find('\n', start)
+        last = end < 0
+        if last:
+            end = len(text)
+        first = len(stream)
+        stream.add_line(start, end)
+        yield stream, line, first, len(stream)
+        if last:
+            return
+        start = end + 1
+        line += 1
+
+def tokenize(text):
+    """Return the TokenStream of a whole text."""
+    stream = TokenStream(text)
+    for _ in iter_lines(text, stream):
+        pass
+    return stream
+
+def tokenize_line(line):
+    """Split a line into (token, content type code) pairs."""
+    return [(match.group(), WORD if match.lastindex == 1 else PUNCTUATION)
+            for match in TOKEN_PATTERN.finditer(line)]
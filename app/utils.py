@@ -1,8 +1,12 @@
 import logging
+from app.ingest import iter_upload_text
 
 logger = logging.getLogger(__name__)
 
-def validate_input(text_input, file_input):
+# Maximum size of an uploaded file read by validate_input
+MAX_UPLOAD_BYTES = 5 * 1024 * 1024
+
+def validate_input(text_input, file_input, max_bytes=MAX_UPLOAD_BYTES):
     """
     Validates that either text input or file input is provided.
     Args:
@@ -17,12 +21,28 @@ def validate_input(text_input, file_input):
 
     if file_input:
         try:
-            text_input = file_input.read().decode('utf-8')
+            # Read in chunks so oversized uploads are rejected early
+            text_input = "".join(iter_upload_text(file_input, max_bytes))
         except Exception as e:
             return False, f"Error reading uploaded file: {e}"
 
     return True, text_input
 
+def split_title_content(text):
+    """
+    Splits dictation text into its title (first line) and content (other lines).
+
+    Args:
+        text (str): The full dictation text.
+
+    Returns:
+        tuple: (title, content) with every line stripped.
+    """
+    lines = text.splitlines()
+    title = lines[0].strip() if lines else ""
+    content = "\n".join(line.strip() for line in lines[1:])
+    return title, content
+
 def load_text_file(file_path):
     """Reads the text file and returns a list of lines."""
     with open(file_path, 'r') as file:
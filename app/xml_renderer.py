@@ -0,0 +1,251 @@
+import copy
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pptx import Presentation
+from pptx.oxml.ns import qn
+from app.layout import CONTENT_TYPES, ID_HEIGHT
+
+logger = logging.getLogger(__name__)
+
+# Index of the blank layout in the default python-pptx template
+BLANK_LAYOUT = 6
+
+# 'inline' writes the font, size, colour and alignment on every box; 'shared'
+# defines them once per deck as text style levels that the boxes refer to
+TEXT_STYLES = os.getenv('TEXT_STYLES', 'inline')
+
+# Text style level (0-based a:pPr lvl) holding the shared paragraph and run
+# properties of each kind of box; levels 7 to 9 are unused by dictation text
+SHARED_LEVELS = {'word': 6, 'punctuation': 7, 'id': 8}
+# Children of a text style list, in schema order
+LIST_STYLE_CHILDREN = ['a:defPPr'] + [f'a:lvl{level}pPr' for level in range(1, 10)] + ['a:extLst']
+
+# Shape templates kept per (styles, TEXT_STYLES mode); each styles reload and
+# style override set adds one, so the least recently used are dropped
+SHAPE_TEMPLATES_CACHE_SIZE = 16
+
+_templates = OrderedDict()
+_templates_lock = threading.Lock()
+
+class ShapeTemplate:
+    """
+    A pre-built p:sp element plus the paths to the parts that change per box.
+
+    Paths are lists of child indexes so copies can be patched without searching.
+    """
+
+    __slots__ = ('element', 'c_nv_pr', 'off', 'ext', 'run')
+
+    def __init__(self, element):
+        self.element = element
+        self.c_nv_pr = _path_to(element, element.find('.//' + qn('p:cNvPr')))
+        self.off = _path_to(element, element.find('.//' + qn('a:off')))
+        self.ext = _path_to(element, element.find('.//' + qn('a:ext')))
+        self.run = _path_to(element, element.find('.//' + qn('a:r')))
+
+    def build(self, shape_id, left, top, width, height, text):
+        """Return a copy of the template with the given id, geometry and text."""
+        sp = copy.deepcopy(self.element)
+        c_nv_pr = _follow(sp, self.c_nv_pr)
+        c_nv_pr.set('id', str(shape_id))
+        c_nv_pr.set('name', f"TextBox {shape_id - 1}")
+        off = _follow(sp, self.off)
+        off.set('x', str(left))
+        off.set('y', str(top))
+        ext = _follow(sp, self.ext)
+        ext.set('cx', str(width))
+        ext.set('cy', str(height))
+        # The run's text setter escapes control characters like python-pptx does
+        _follow(sp, self.run).text = text
+        return sp
+
+def _path_to(root, element):
+    path = []
+    while element is not root:
+        parent = element.getparent()
+        path.append(parent.index(element))
+        element = parent
+    path.reverse()
+    return path
+
+def _follow(element, path):
+    for index in path:
+        element = element[index]
+    return element
+
+def _build_templates(styles):
+    """Render one box of each kind with python-pptx and keep its XML as a template."""
+    from app.ppt_generator import add_text_box
+
+    ppt = Presentation()
+    slide = ppt.slides.add_slide(ppt.slide_layouts[BLANK_LAYOUT])
+    templates = {}
+    for content_type in CONTENT_TYPES:
+        add_text_box(slide, "x", 0, ID_HEIGHT, 0, 1, content_type, 0, styles)
+    shapes = list(slide.shapes._spTree.iter(qn('p:sp')))
+    for content_type in CONTENT_TYPES:
+        word_box = shapes.pop(0)
+        id_box = shapes.pop(0) if styles[content_type].display_id else None
+        templates[content_type] = (ShapeTemplate(word_box), ShapeTemplate(id_box) if id_box is not None else None)
+    return templates
+
+def _paragraph_properties(element):
+    return element.find('.//' + qn('a:pPr'))
+
+def _shared_template(template, level):
+    """Return a copy of an inline template whose paragraph only refers to a text style level."""
+    element = copy.deepcopy(template.element)
+    properties = _paragraph_properties(element)
+    properties.clear()
+    properties.set('lvl', str(level))
+    return ShapeTemplate(element)
+
+def _build_shared_templates(styles):
+    templates = {}
+    for content_type, (box, id_box) in get_shape_templates(styles, 'inline').items():
+        templates[content_type] = (
+            _shared_template(box, SHARED_LEVELS[content_type]),
+            _shared_template(id_box, SHARED_LEVELS['id']) if id_box is not None else None,
+        )
+    return templates
+
+def get_shape_templates(styles, text_styles=None):
+    """Return the (word box, ID box) templates per content type for the given compiled styles and TEXT_STYLES mode."""
+    text_styles = text_styles or TEXT_STYLES
+    key = (styles.key, text_styles)
+    with _templates_lock:
+        templates = _templates.get(key)
+        if templates is not None:
+            _templates.move_to_end(key)
+            return templates
+    # Shared templates are derived from the inline ones, which take the lock themselves
+    shared = _build_shared_templates(styles) if text_styles == 'shared' else None
+    with _templates_lock:
+        templates = _templates.get(key)
+        if templates is None:
+            templates = shared or _build_templates(styles)
+            _templates[key] = templates
+            logger.debug(f"Built {text_styles} text box shape templates.")
+            while len(_templates) > SHAPE_TEMPLATES_CACHE_SIZE:
+                _templates.popitem(last=False)
+        else:
+            _templates.move_to_end(key)
+    return templates
+
+def shared_text_style_levels(styles):
+    """
+    Return the text style levels that shared-style boxes refer to.
+
+    Each level holds the paragraph properties an inline box carries (font,
+    size, colour, alignment), without the indentation of the template's own
+    levels, so a box looks the same either way.
+
+    Returns:
+        dict: a:lvlNpPr element per 0-based level.
+    """
+    levels = {}
+    for content_type, (box, id_box) in get_shape_templates(styles, 'inline').items():
+        levels[SHARED_LEVELS[content_type]] = _paragraph_properties(box.element)
+        if id_box is not None:
+            levels[SHARED_LEVELS['id']] = _paragraph_properties(id_box.element)
+    for level, properties in levels.items():
+        element = levels[level] = copy.deepcopy(properties)
+        element.tag = qn(f'a:lvl{level + 1}pPr')
+        element.set('marL', '0')
+        element.set('indent', '0')
+        if element.get('algn') is None:
+            element.set('algn', 'l')
+    return levels
+
+def _insert(parent, element, successors):
+    """Insert element into parent before the first child named in successors, or at the end."""
+    for name in successors:
+        following = parent.find(qn(name))
+        if following is not None:
+            following.addprevious(element)
+            return
+    parent.append(element)
+
+def _child(parent, tag, successors):
+    """Return parent's tag child, inserting an empty one if missing."""
+    child = parent.find(qn(tag))
+    if child is None:
+        child = parent.makeelement(qn(tag), {})
+        _insert(parent, child, successors)
+    return child
+
+def apply_text_styles(ppt, styles, text_styles=None):
+    """
+    Define the levels of shared-style boxes in a presentation, in 'shared' TEXT_STYLES mode.
+
+    They go into the presentation's default text style and into the "other"
+    text style of every slide master, as applications differ on which of the
+    two applies to text boxes. Inline boxes need nothing.
+    """
+    if (text_styles or TEXT_STYLES) != 'shared':
+        return
+    levels = shared_text_style_levels(styles)
+    lists = [_child(ppt.part._element, 'p:defaultTextStyle', ['p:modifyVerifier', 'p:extLst'])]
+    for master in ppt.slide_masters:
+        text_styles = _child(master._element, 'p:txStyles', ['p:extLst'])
+        lists.append(_child(text_styles, 'p:otherStyle', ['p:extLst']))
+    for list_style in lists:
+        for level, element in levels.items():
+            existing = list_style.find(element.tag)
+            if existing is not None:
+                list_style.remove(existing)
+            # Children are defPPr, lvl1pPr to lvl9pPr, then extLst
+            _insert(list_style, copy.deepcopy(element), LIST_STYLE_CHILDREN[level + 2:])
+
+def clear_shape_templates():
+    """Forget all cached shape templates."""
+    with _templates_lock:
+        _templates.clear()
+
+def next_shape_id(sp_tree):
+    """Return the next free shape id, the same way python-pptx allocates it."""
+    used = [int(value) for value in sp_tree.xpath('//@id') if value.isdigit()]
+    return max(used, default=0) + 1
+
+def build_box_elements(plan, start, end, templates, first_id):
+    """
+    Build the p:sp elements for plan entries start..end with sequential ids.
+
+    Returns:
+        list: The new elements, in the same order python-pptx would add them.
+    """
+    elements = []
+    shape_id = first_id
+    text = plan.text
+    token_start = plan.token_start
+    token_end = plan.token_end
+    left = plan.left
+    top = plan.top
+    width = plan.width
+    height = plan.height
+    content_type = plan.content_type
+    word_id = plan.word_id
+    for i in range(start, end):
+        box_template, id_template = templates[CONTENT_TYPES[content_type[i]]]
+        elements.append(box_template.build(shape_id, left[i], top[i], width[i], height[i], text[token_start[i]:token_end[i]]))
+        shape_id += 1
+        if id_template is not None:
+            elements.append(id_template.build(shape_id, left[i], top[i] - ID_HEIGHT, width[i], ID_HEIGHT, str(word_id[i])))
+            shape_id += 1
+    return elements
+
+def append_elements(sp_tree, elements):
+    """Append shape elements to a slide's spTree in one operation."""
+    ext_lst = sp_tree.find(qn('p:extLst'))
+    if ext_lst is None:
+        sp_tree.extend(elements)
+    else:
+        position = sp_tree.index(ext_lst)
+        sp_tree[position:position] = elements
+
+def render_slide_boxes(slide, plan, start, end, templates):
+    """Add the text boxes for plan entries start..end to a slide as one batch."""
+    sp_tree = slide.shapes._spTree
+    append_elements(sp_tree, build_box_elements(plan, start, end, templates, next_shape_id(sp_tree)))
@@ -0,0 +1,63 @@
+import random
+
+# Fixed seed so every run measures the same texts
+SEED = 1234
+
+COMMON_WORDS = (
+    "the", "a", "cat", "dog", "runs", "jumps", "over", "quick", "brown", "fox", "lazy", "house",
+    "garden", "school", "teacher", "children", "read", "write", "book", "tree", "green", "sun",
+    "morning", "evening", "walk", "play", "friend", "happy", "little", "big", "under", "river",
+)
+ACCENTED_WORDS = (
+    "élève", "café", "naïve", "garçon", "forêt", "hôpital", "être", "déjà", "Noël", "Straße",
+    "über", "niño", "señor", "coração", "ação", "Ærø", "façade", "crème", "brûlée", "Ελλάδα",
+)
+PUNCTUATION = (",", ".", ";", ":", "!", "?", "«", "»", "'", "-", "(", ")")
+
+def _sentences(rng, words, vocabulary, punctuation_rate, words_per_line=12):
+    lines = []
+    line = []
+    for _ in range(words):
+        line.append(rng.choice(vocabulary))
+        if rng.random() < punctuation_rate:
+            line.append(rng.choice(PUNCTUATION))
+        if len(line) >= words_per_line:
+            lines.append(" ".join(line))
+            line = []
+    if line:
+        lines.append(" ".join(line))
+    return "\n".join(lines)
+
+def plain_text(words, seed=SEED):
+    """Ordinary sentences with occasional punctuation."""
+    return _sentences(random.Random(seed), words, COMMON_WORDS, 0.1)
+
+def punctuation_heavy(words, seed=SEED):
+    """Text where most words are followed by a punctuation mark."""
+    return _sentences(random.Random(seed), words, COMMON_WORDS, 0.8)
+
+def unicode_text(words, seed=SEED):
+    """Accented and non-Latin words."""
+    return _sentences(random.Random(seed), words, ACCENTED_WORDS + COMMON_WORDS, 0.1)
+
+def long_words(words, seed=SEED):
+    """Very long single words, each forcing a line wrap."""
+    rng = random.Random(seed)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return "\n".join("".join(rng.choice(letters) for _ in range(rng.randint(30, 60))) for _ in range(words))
+
+# name: (title, content factory, word count)
+CORPORA = {
+    'plain-50': ("Short dictation", plain_text, 50),
+    'plain-500': ("Medium dictation", plain_text, 500),
+    'plain-5000': ("Long dictation", plain_text, 5000),
+    'plain-50000': ("Book dictation", plain_text, 50000),
+    'punctuation-2000': ("Punctuation", punctuation_heavy, 2000),
+    'unicode-2000': ("Unicode", unicode_text, 2000),
+    'long-words-200': ("Long words", long_words, 200),
+}
+
+def load_corpus(name):
+    """Return (title, content) of a named corpus."""
+    title, factory, words = CORPORA[name]
+    return title, factory(words)
@@ -0,0 +1,397 @@
+"""
+Load-test the app over HTTP with a mix of requests at several concurrency levels.
+
+Usage (from the repository root):
+    python -m benchmarks.load                                   # 2 workers, concurrency 1, 4 and 16
+    python -m benchmarks.load -w 4 -c 8 -c 32 -d 30 --mix text=50,upload=20,download=20,email=10 --json after.json
+    python -m benchmarks.load --config OUTPUT_MODE=stream --config ADMISSION_CAPACITY=5000
+    python -m benchmarks.load --compare before.json after.json
+
+The app is served by --workers processes, each running create_app() behind
+a threaded werkzeug server, all accepting on one listening socket. Emails go
+to an in-process SMTP sink, so nothing leaves the machine. Environment
+variables (e.g. STREAMING_SIZE_LIMIT) are passed on to the workers, and
+--config entries are added to their app config.
+
+At each concurrency level, that many virtual users send requests for
+--duration seconds, each picking the next one from the mix:
+
+    text      POST / with the dictation in the form
+    upload    POST / with the dictation as a .txt upload
+    download  GET /download of the user's last submission (posted first if none)
+    email     POST / with an email address; the deck is mailed to the sink
+
+Dictations are drawn from --corpus and get a unique title per request so
+that every POST renders a whole deck, unless --reuse is given. (A new title
+also keeps a post from being regenerated incrementally from the user's
+previous one, which only renders the slides an edit changed.) The report gives requests per
+second, p50/p95/p99 latency and error rate per level and per kind of request,
+and the resident and peak memory of every worker after the level. Errors are
+connection failures and responses other than a success page, a .pptx or a 202.
+"""
+import argparse
+import http.client
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from urllib.parse import urlencode
+from benchmarks.corpora import CORPORA, load_corpus
+
+ACTIONS = ('text', 'upload', 'download', 'email')
+DEFAULT_MIX = 'text=50,upload=20,download=20,email=10'
+DEFAULT_CORPORA = ('plain-50', 'plain-500', 'punctuation-2000')
+DEFAULT_CONCURRENCY = (1, 4, 16)
+PERCENTILES = (50, 95, 99)
+REQUEST_TIMEOUT = 300
+PPTX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.presentationml.presentation'
+
+# Runs in each worker process: serves the app on the inherited listening socket
+WORKER = """
+import json, logging, os
+logging.disable(logging.INFO)  # Request and generation logs would dominate the run
+from werkzeug.serving import make_server
+from app import create_app
+app = create_app(json.loads(os.environ['LOAD_CONFIG']))
+make_server('127.0.0.1', int(os.environ['LOAD_PORT']), app, threaded=True, fd=int(os.environ['LOAD_FD'])).serve_forever()
+"""
+
+def parse_mix(text):
+    """Parse 'text=50,upload=20' into {action: weight}."""
+    mix = {}
+    for item in text.split(','):
+        name, _, weight = item.partition('=')
+        if name not in ACTIONS:
+            raise argparse.ArgumentTypeError(f"Unknown request kind {name!r}, expected one of {', '.join(ACTIONS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+def parse_config(items):
+    """Parse KEY=VALUE entries, reading values as JSON when they are valid JSON."""
+    config = {}
+    for item in items or ():
+        key, _, value = item.partition('=')
+        try:
+            config[key] = json.loads(value)
+        except ValueError:
+            config[key] = value
+    return config
+
+class Workers:
+    """App worker processes sharing one listening socket on 127.0.0.1."""
+
+    def __init__(self, count, config):
+        self.count = count
+        self.config = config
+        self.directory = tempfile.mkdtemp(prefix='dictation-load-')
+        self.processes = []
+        self.socket = None
+        self.port = None
+
+    def start(self, timeout=60):
+        self.socket = socket.socket()
+        self.socket.bind(('127.0.0.1', 0))
+        self.socket.listen(128)
+        self.port = self.socket.getsockname()[1]
+        env = dict(os.environ, LOAD_CONFIG=json.dumps(self.config), LOAD_PORT=str(self.port),
+                   LOAD_FD=str(self.socket.fileno()))
+        for index in range(self.count):
+            log = open(os.path.join(self.directory, f'worker-{index}.log'), 'w')
+            self.processes.append(subprocess.Popen([sys.executable, '-c', WORKER], env=env, stdout=log,
+                                                   stderr=subprocess.STDOUT, pass_fds=(self.socket.fileno(),)))
+            log.close()
+        self._wait_ready(timeout)
+        return self
+
+    def _wait_ready(self, timeout):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            for process in self.processes:
+                if process.poll() is not None:
+                    raise RuntimeError(f"A worker exited with status {process.returncode}, see the logs in {self.directory}")
+            try:
+                status, _, _ = request('GET', self.port, '/')
+                if status == 200:
+                    return
+            except OSError:
+                pass
+            time.sleep(0.2)
+        raise RuntimeError(f"Workers not ready after {timeout}s, see the logs in {self.directory}")
+
+    def memory(self):
+        """Return the resident and peak resident memory of each worker, in MB."""
+        usage = []
+        for process in self.processes:
+            values = {}
+            with open(f'/proc/{process.pid}/status') as f:
+                for line in f:
+                    name, _, value = line.partition(':')
+                    if name in ('VmRSS', 'VmHWM'):
+                        values[name] = int(value.split()[0]) / 1024
+            usage.append({'pid': process.pid, 'rss_mb': values.get('VmRSS'), 'peak_rss_mb': values.get('VmHWM')})
+        return usage
+
+    def stop(self):
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            try:
+                process.wait(10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if self.socket is not None:
+            self.socket.close()
+
+def request(method, port, path, body=None, headers=None):
+    """Send one request on a new connection and return (status, headers, body)."""
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=REQUEST_TIMEOUT)
+    try:
+        connection.request(method, path, body, headers or {})
+        response = connection.getresponse()
+        return response.status, response.headers, response.read()
+    finally:
+        connection.close()
+
+def multipart(fields, files):
+    """Encode form fields and (name, filename, bytes) files as multipart/form-data."""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode('utf-8'))
+    for name, filename, data in files:
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                     f'Content-Type: text/plain\r\n\r\n'.encode('utf-8') + data + b'\r\n')
+    parts.append(f'--{boundary}--\r\n'.encode('ascii'))
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+class VirtualUser:
+    """Sends requests from the mix with its own session cookie."""
+
+    def __init__(self, port, mix, texts, reuse, seed):
+        self.port = port
+        self.actions = list(mix)
+        self.weights = [mix[action] for action in self.actions]
+        self.texts = texts
+        self.reuse = reuse
+        self.rng = random.Random(seed)
+        self.seed = seed
+        self.sequence = 0
+        self.cookie = None
+        self.submitted = False
+
+    def _text(self):
+        title, content = self.rng.choice(self.texts)
+        if not self.reuse:
+            # A unique title makes every deck a cache miss, and a full render
+            # rather than an incremental regeneration of the session's last post
+            self.sequence += 1
+            title = f"{title} {self.seed}-{self.sequence}"
+        return f"{title}\n{content}"
+
+    def _send(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        if self.cookie:
+            headers['Cookie'] = self.cookie
+        status, response_headers, data = request(method, self.port, path, body, headers)
+        cookie = response_headers.get('Set-Cookie')
+        if cookie:
+            self.cookie = cookie.split(';', 1)[0]
+        return status, response_headers, data
+
+    def _post(self, fields, files=()):
+        if files:
+            body, content_type = multipart(fields, files)
+        else:
+            body, content_type = urlencode(fields).encode('utf-8'), 'application/x-www-form-urlencoded'
+        status, _, data = self._send('POST', '/', body, {'Content-Type': content_type})
+        ok = status == 202 or (status == 200 and b'alert-success' in data)
+        self.submitted = self.submitted or ok
+        return status, ok
+
+    def text(self):
+        return self._post({'text_input': self._text()})
+
+    def upload(self):
+        return self._post({}, [('file_input', 'dictation.txt', self._text().encode('utf-8'))])
+
+    def email(self):
+        return self._post({'text_input': self._text(), 'email_input': 'load@localhost'})
+
+    def download(self):
+        status, headers, _ = self._send('GET', '/download')
+        return status, status == 200 and headers.get('Content-Type', '').startswith(PPTX_MIMETYPE)
+
+    def run(self, deadline, results):
+        """Send requests until the deadline, appending (action, seconds, status, ok) to results."""
+        while time.monotonic() < deadline:
+            action = self.rng.choices(self.actions, self.weights)[0]
+            if action == 'download' and not self.submitted:
+                # A download needs a submission in the session; the post is measured as a text post
+                action = 'text'
+            start = time.perf_counter()
+            try:
+                status, ok = getattr(self, action)()
+            except OSError:
+                status, ok = None, False
+            results.append((action, time.perf_counter() - start, status, ok))
+
+def percentile(ordered, p):
+    """Nearest-rank percentile of an ascending list."""
+    if not ordered:
+        return None
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+def summarize(samples, seconds):
+    """Return the request count, rate, latency percentiles (ms), error rate and statuses of samples."""
+    latencies = sorted(sample[1] for sample in samples)
+    errors = sum(1 for sample in samples if not sample[3])
+    statuses = {}
+    for sample in samples:
+        key = str(sample[2] or 'failed')
+        statuses[key] = statuses.get(key, 0) + 1
+    summary = {
+        'requests': len(samples),
+        'rps': len(samples) / seconds if seconds else 0.0,
+        'error_rate': errors / len(samples) if samples else 0.0,
+        'statuses': statuses,
+    }
+    for p in PERCENTILES:
+        value = percentile(latencies, p)
+        summary[f'p{p}_ms'] = value * 1000 if value is not None else None
+    return summary
+
+def run_level(port, concurrency, duration, mix, texts, reuse, seed):
+    """Run one concurrency level and return its overall and per-action summaries."""
+    results = []
+    deadline = time.monotonic() + duration
+    users = [VirtualUser(port, mix, texts, reuse, seed * 1000 + index) for index in range(concurrency)]
+    threads = [threading.Thread(target=user.run, args=(deadline, results)) for user in users]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Requests still running at the deadline are waited for and counted
+    elapsed = time.perf_counter() - start
+    summary = summarize(results, elapsed)
+    summary['concurrency'] = concurrency
+    summary['seconds'] = elapsed
+    summary['actions'] = {action: summarize([sample for sample in results if sample[0] == action], elapsed)
+                          for action in ACTIONS if any(sample[0] == action for sample in results)}
+    return summary
+
+def _number(value):
+    return f"{value:.1f}" if value is not None else "-"
+
+def print_level(level):
+    rss = "/".join(f"{worker['rss_mb']:.0f}" for worker in level['workers'])
+    peak = "/".join(f"{worker['peak_rss_mb']:.0f}" for worker in level['workers'])
+    print(f"{level['concurrency']:>11} {'all':<9} {level['requests']:>8} {level['rps']:>8.2f} "
+          f"{_number(level['p50_ms']):>9} {_number(level['p95_ms']):>9} {_number(level['p99_ms']):>9} "
+          f"{level['error_rate'] * 100:>7.1f}%  rss {rss} MB (peak {peak})")
+    for action, summary in level['actions'].items():
+        print(f"{'':>11} {action:<9} {summary['requests']:>8} {summary['rps']:>8.2f} "
+              f"{_number(summary['p50_ms']):>9} {_number(summary['p95_ms']):>9} {_number(summary['p99_ms']):>9} "
+              f"{summary['error_rate'] * 100:>7.1f}%", flush=True)
+
+def run(args):
+    from app.smtp_sink import SMTPSink
+
+    texts = [load_corpus(name) for name in args.corpus or DEFAULT_CORPORA]
+    sink = SMTPSink().start()
+    config = {
+        'MAIL_SERVER': sink.host,
+        'MAIL_PORT': sink.port,
+        'MAIL_USE_TLS': False,
+        'MAIL_USE_SSL': False,
+        'MAIL_DEFAULT_SENDER': 'dictation@localhost',
+    }
+    workers = Workers(args.workers, config)
+    config['JOB_STORE_PATH'] = os.path.join(workers.directory, 'jobs.sqlite3')
+    config.update(parse_config(args.config))
+    report = {'workers': args.workers, 'mix': args.mix, 'corpora': args.corpus or list(DEFAULT_CORPORA),
+              'duration': args.duration, 'config': parse_config(args.config), 'levels': []}
+    try:
+        workers.start()
+        if args.warmup > 0:
+            # Loads fonts, styles and templates in every worker; not reported
+            run_level(workers.port, max(args.workers, 2), args.warmup, args.mix, texts, args.reuse, seed=0)
+            with sink._lock:
+                sink.messages.clear()
+        print(f"{'concurrency':>11} {'request':<9} {'count':>8} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} "
+              f"{'p99 ms':>9} {'errors':>8}")
+        for index, concurrency in enumerate(args.concurrency or DEFAULT_CONCURRENCY):
+            level = run_level(workers.port, concurrency, args.duration, args.mix, texts, args.reuse, seed=index + 1)
+            level['workers'] = workers.memory()
+            with sink._lock:
+                level['emails_received'] = len(sink.messages)
+                sink.messages.clear()
+            report['levels'].append(level)
+            print_level(level)
+    finally:
+        workers.stop()
+        sink.stop()
+    return report
+
+def _change(before, after):
+    if before is None or after is None:
+        return "-"
+    if not before:
+        return "-" if not after else "new"
+    return f"{(after - before) / before * 100:+.1f}%"
+
+def compare(before, after):
+    """Print the change of every level present in two reports."""
+    print(f"{'concurrency':>11} {'metric':<13} {'before':>10} {'after':>10} {'change':>9}")
+    after_levels = {level['concurrency']: level for level in after['levels']}
+    for level in before['levels']:
+        other = after_levels.get(level['concurrency'])
+        if other is None:
+            continue
+        rows = [('req/s', level['rps'], other['rps'])]
+        rows += [(f'p{p} ms', level[f'p{p}_ms'], other[f'p{p}_ms']) for p in PERCENTILES]
+        rows.append(('error rate %', level['error_rate'] * 100, other['error_rate'] * 100))
+        rows.append(('max rss MB', max(worker['rss_mb'] for worker in level['workers']),
+                     max(worker['rss_mb'] for worker in other['workers'])))
+        for index, (name, old, new) in enumerate(rows):
+            label = str(level['concurrency']) if index == 0 else ''
+            print(f"{label:>11} {name:<13} {_number(old):>10} {_number(new):>10} {_change(old, new):>9}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the app with a mix of requests.")
+    parser.add_argument('-w', '--workers', type=int, default=2, help="App worker processes")
+    parser.add_argument('-c', '--concurrency', type=int, action='append', help="Virtual users of a level (repeatable, default: 1, 4, 16)")
+    parser.add_argument('-d', '--duration', type=float, default=20, help="Seconds per concurrency level")
+    parser.add_argument('--warmup', type=float, default=3, help="Seconds of unreported requests before the first level")
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX), help=f"Weights of the request kinds (default {DEFAULT_MIX})")
+    parser.add_argument('--corpus', action='append', choices=sorted(CORPORA), help="Corpus the dictations are drawn from (repeatable)")
+    parser.add_argument('--reuse', action='store_true', help="Send the corpora unchanged, so repeated texts hit the deck cache")
+    parser.add_argument('--config', action='append', metavar='KEY=VALUE', help="App config entry of the workers (repeatable)")
+    parser.add_argument('--json', help="Write the report to this file")
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help="Compare two reports instead of running")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        reports = []
+        for path in args.compare:
+            with open(path, 'r') as f:
+                reports.append(json.load(f))
+        compare(*reports)
+        return 0
+
+    report = run(args)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    errors = sum(level['error_rate'] * level['requests'] for level in report['levels'])
+    return 1 if errors else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,103 @@
+"""
+Compare a text measurement backend with the Pillow backend.
+
+Usage (from the repository root):
+    python -m benchmarks.measure_accuracy                  # 'advance' on all corpora
+    python -m benchmarks.measure_accuracy -c unicode-2000 --backend advance
+
+For each corpus, every token is measured by both backends in the word and
+punctuation styles. The report gives the number of tokens whose width
+differs, the largest and mean difference in points, the difference of the
+line height, whether the resulting layouts are identical, and the time each
+backend takes from a cold start.
+"""
+import argparse
+import logging
+import sys
+import time
+from pptx.util import Inches
+from benchmarks.corpora import CORPORA, load_corpus
+
+def _tokens(content):
+    from app.layout import CONTENT_TYPES
+    from app.tokenizer import tokenize
+
+    batches = {name: [] for name in CONTENT_TYPES}
+    stream = tokenize(content)
+    for token, code in zip(stream.tokens(), stream.codes):
+        batches[CONTENT_TYPES[code]].append(token)
+    return batches
+
+def _same_layout(title, content, styles, reference, candidate):
+    from benchmarks.run import _area
+    from app.layout import compute_layout
+
+    area = _area()
+    expected = compute_layout(title, content, styles, area, reference)
+    actual = compute_layout(title, content, styles, area, candidate)
+    return (expected.slide_count == actual.slide_count and expected.max_height == actual.max_height
+            and list(expected.entries()) == list(actual.entries()))
+
+def compare_backends(title, content, candidate):
+    """
+    Measure a corpus with the Pillow backend and a candidate backend.
+
+    Returns:
+        dict: Token count, mismatches, width and height differences in points,
+        layout equality and the cold timings of both backends.
+    """
+    from app.font_cache import font_metrics
+    from app.measure import BACKENDS, PillowBackend
+    from app.styles import get_styles
+
+    styles = get_styles()
+    reference = PillowBackend()
+    report = {'tokens': 0, 'mismatches': 0, 'max_width_diff_pt': 0.0, 'mean_width_diff_pt': 0.0,
+              'height_diff_pt': 0.0, 'pillow_seconds': 0.0, 'candidate_seconds': 0.0}
+    total_diff = 0.0
+    fresh = BACKENDS[candidate]()
+    for name, tokens in _tokens(content).items():
+        style = styles[name]
+        font_metrics.clear()
+        start = time.perf_counter()
+        expected_widths, expected_heights = reference.measure(tokens, style.font_path, style.font_size)
+        report['pillow_seconds'] += time.perf_counter() - start
+        start = time.perf_counter()
+        widths, heights = fresh.measure(tokens, style.font_path, style.font_size)
+        report['candidate_seconds'] += time.perf_counter() - start
+
+        for expected, actual in zip(expected_widths, widths):
+            diff = abs(expected - actual) / Inches(1) * 72
+            report['mismatches'] += expected != actual
+            report['max_width_diff_pt'] = max(report['max_width_diff_pt'], diff)
+            total_diff += diff
+        for expected, actual in zip(expected_heights, heights):
+            report['height_diff_pt'] = max(report['height_diff_pt'], abs(expected - actual) / Inches(1) * 72)
+        report['tokens'] += len(tokens)
+
+    report['mean_width_diff_pt'] = total_diff / report['tokens'] if report['tokens'] else 0.0
+    report['same_layout'] = _same_layout(title, content, styles, reference, fresh)
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare a measurement backend with Pillow.")
+    parser.add_argument('-c', '--corpus', action='append', choices=sorted(CORPORA), help="Corpus to compare (repeatable, default: all)")
+    parser.add_argument('--backend', default='advance', help="Backend compared with 'pillow'")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.CRITICAL)
+    print(f"{'corpus':<20} {'tokens':>8} {'differ':>7} {'max pt':>7} {'mean pt':>8} {'height pt':>9} "
+          f"{'layout':>7} {'pillow s':>9} {args.backend + ' s':>10}")
+    identical = True
+    for corpus in args.corpus or list(CORPORA):
+        title, content = load_corpus(corpus)
+        report = compare_backends(title, content, args.backend)
+        identical = identical and report['same_layout']
+        print(f"{corpus:<20} {report['tokens']:>8} {report['mismatches']:>7} {report['max_width_diff_pt']:>7.2f} "
+              f"{report['mean_width_diff_pt']:>8.3f} {report['height_diff_pt']:>9.2f} "
+              f"{'same' if report['same_layout'] else 'DIFF':>7} {report['pillow_seconds']:>9.4f} "
+              f"{report['candidate_seconds']:>10.4f}", flush=True)
+    return 0 if identical else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
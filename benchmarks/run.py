@@ -0,0 +1,238 @@
+"""
+Benchmark the dictation pipeline stage by stage.
+
+Usage (from the repository root):
+    python -m benchmarks.run                      # all corpora, compare to baseline
+    python -m benchmarks.run -c plain-500 -s layout
+    python -m benchmarks.run --update-baseline    # record new baseline numbers
+
+Each stage is timed separately (best of --repeat runs) and its peak Python
+memory is measured with tracemalloc in one extra run. Results are compared
+with benchmarks/baseline.json; a stage slower or larger than its baseline by
+more than the tolerance is reported as a regression and the exit code is 1.
+"""
+import argparse
+import gc
+import io
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from benchmarks.corpora import CORPORA, load_corpus
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+DEFAULT_TOLERANCE = 0.5  # Allowed slowdown, as a fraction of the baseline
+MIN_REGRESSION_SECONDS = 0.005  # Ignore differences below timer noise
+MIN_REGRESSION_KB = 64
+
+def _area():
+    from app.template_cache import get_base_template
+
+    return get_base_template().area
+
+def stage_tokenize(title, content):
+    from app.tokenizer import tokenize
+
+    return lambda: tokenize(content)
+
+def stage_measure(title, content):
+    from app.font_cache import font_metrics
+    from app.layout import CONTENT_TYPES
+    from app.measure import get_measure_backend
+    from app.styles import get_styles
+    from app.tokenizer import tokenize
+
+    styles = get_styles()
+    backend = get_measure_backend()
+    batches = {name: [] for name in CONTENT_TYPES}
+    stream = tokenize(content)
+    for token, code in zip(stream.tokens(), stream.codes):
+        batches[CONTENT_TYPES[code]].append(token)
+
+    def run():
+        # Cold cache: every distinct token is measured once
+        font_metrics.clear()
+        for name, tokens in batches.items():
+            backend.measure(tokens, styles[name].font_path, styles[name].font_size)
+    return run
+
+def stage_layout(title, content):
+    from app.layout import compute_layout
+    from app.styles import get_styles
+
+    styles = get_styles()
+    area = _area()
+    compute_layout(title, content, styles, area)  # Warm the font metrics cache
+    return lambda: compute_layout(title, content, styles, area)
+
+def stage_render(title, content):
+    from app.layout import compute_layout
+    from app.ppt_generator import add_content_slide, render_layout_plan
+    from app.styles import get_styles
+    from app.template_cache import get_base_template
+
+    styles = get_styles()
+    template = get_base_template()
+    plan = compute_layout(title, content, styles, template.area)
+
+    def run():
+        ppt = template.new_presentation()
+        slide = add_content_slide(ppt, title, content, template.content_layout(ppt))
+        render_layout_plan(ppt, plan, slide)
+    return run
+
+def stage_save(title, content):
+    from app.ppt_generator import create_ppt_dictation_from_text
+
+    ppt = create_ppt_dictation_from_text(title, content)
+    return lambda: ppt.save(io.BytesIO())
+
+def stage_generate(title, content):
+    from app.ppt_generator import create_ppt_dictation_from_text
+
+    return lambda: create_ppt_dictation_from_text(title, content)
+
+def _client():
+    import app.routes
+    from app import create_app
+
+    # Large decks must not be rejected by the download size limit
+    app.routes.STREAMING_SIZE_LIMIT = 1 << 40
+    store_path = os.path.join(tempfile.mkdtemp(prefix='dictation-bench-'), 'jobs.sqlite3')
+    flask_app = create_app({'JOB_STORE_PATH': store_path, 'INPUT_SIZE_LIMIT': 1 << 30})
+    return flask_app.test_client()
+
+def stage_post(title, content):
+    from app.deck_cache import deck_cache
+    from app.incremental import snapshots
+
+    client = _client()
+    text = f"{title}\n{content}"
+
+    def run():
+        # Measure a real generation, not a cache hit or a no-op regeneration
+        # of the session's previous submission
+        deck_cache.clear()
+        snapshots.clear()
+        response = client.post('/', data={'text_input': text})
+        assert b"Your PowerPoint is ready!" in response.data, response.data[:500]
+    return run
+
+def stage_download(title, content):
+    from app.deck_cache import deck_cache
+
+    client = _client()
+    client.application.config['OUTPUT_MODE'] = 'stream'
+    client.post('/', data={'text_input': f"{title}\n{content}"})
+
+    def run():
+        deck_cache.clear()  # Stream mode renders on download
+        response = client.get('/download')
+        assert response.status_code == 200
+        response.get_data()
+    return run
+
+STAGES = {
+    'tokenize': stage_tokenize,
+    'measure': stage_measure,
+    'layout': stage_layout,
+    'render': stage_render,
+    'save': stage_save,
+    'generate': stage_generate,
+    'post': stage_post,
+    'download': stage_download,
+}
+
+def measure_stage(stage, title, content, repeat):
+    """Return (best seconds, peak KB) for one stage on one corpus."""
+    run = STAGES[stage](title, content)
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return min(timings), peak / 1024
+
+def load_baseline(path=BASELINE_PATH):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'tolerance': DEFAULT_TOLERANCE, 'results': {}}
+
+def compare(result, baseline, tolerance):
+    """Return a list of regression descriptions of a result against its baseline."""
+    if not baseline:
+        return []
+    regressions = []
+    seconds_budget = baseline['seconds'] * (1 + tolerance)
+    if result['seconds'] > seconds_budget and result['seconds'] - baseline['seconds'] > MIN_REGRESSION_SECONDS:
+        regressions.append(f"time {result['seconds']:.4f}s > budget {seconds_budget:.4f}s")
+    peak_budget = baseline['peak_kb'] * (1 + tolerance)
+    if result['peak_kb'] > peak_budget and result['peak_kb'] - baseline['peak_kb'] > MIN_REGRESSION_KB:
+        regressions.append(f"peak {result['peak_kb']:.0f}KB > budget {peak_budget:.0f}KB")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the dictation pipeline.")
+    parser.add_argument('-c', '--corpus', action='append', choices=sorted(CORPORA), help="Corpus to run (repeatable, default: all)")
+    parser.add_argument('-s', '--stage', action='append', choices=list(STAGES), help="Stage to run (repeatable, default: all)")
+    parser.add_argument('-r', '--repeat', type=int, default=3, help="Timed runs per stage; the best one is kept")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="Baseline file to compare with")
+    parser.add_argument('--update-baseline', action='store_true', help="Write the results to the baseline file")
+    parser.add_argument('--json', help="Also write the results to this file")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.CRITICAL)
+    baseline = load_baseline(args.baseline)
+    tolerance = baseline.get('tolerance', DEFAULT_TOLERANCE)
+    results = {}
+    regressions = 0
+
+    print(f"{'benchmark':<32} {'seconds':>10} {'peak KB':>10} {'baseline':>10}  status")
+    for corpus in args.corpus or list(CORPORA):
+        title, content = load_corpus(corpus)
+        for stage in args.stage or list(STAGES):
+            key = f"{corpus}/{stage}"
+            seconds, peak_kb = measure_stage(stage, title, content, args.repeat)
+            result = {'seconds': round(seconds, 5), 'peak_kb': round(peak_kb, 1)}
+            results[key] = result
+
+            reference = baseline['results'].get(key)
+            problems = compare(result, reference, tolerance)
+            regressions += bool(problems)
+            status = "; ".join(problems) if problems else ("ok" if reference else "new")
+            reference_seconds = f"{reference['seconds']:.4f}" if reference else "-"
+            print(f"{key:<32} {seconds:>10.4f} {peak_kb:>10.0f} {reference_seconds:>10}  {status}", flush=True)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.update_baseline:
+        baseline['tolerance'] = tolerance
+        baseline['results'].update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if regressions:
+        print(f"{regressions} regression(s) over the {tolerance:.0%} tolerance.")
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""
+Measure cold start: import time, app creation and time to the first deck.
+
+Usage (from the repository root):
+    python -m benchmarks.startup               # 5 fresh processes per prewarm mode
+    python -m benchmarks.startup -n 10 --prewarm off --prewarm startup
+
+Every run starts a new Python process that imports the app, creates it and
+posts a short dictation twice through the test client. The median of each
+timing over the runs is reported, along with the process wall time up to the
+first deck and the number of modules loaded before any request.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+PREWARM_MODES = ('off', 'startup', 'first_request')
+
+# Runs in the child process; prints one JSON line with its timings
+CHILD = """
+import json, os, sys, time
+start = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app({'JOB_STORE_PATH': os.environ['BENCH_STORE'], 'PREWARM': os.environ['BENCH_PREWARM']})
+created = time.perf_counter()
+modules = len(sys.modules)
+client = app.test_client()
+text = "Dictation\\nThe quick brown fox jumps over the lazy dog, again and again."
+response = client.post('/', data={'text_input': text})
+assert b"Your PowerPoint is ready!" in response.data, response.data[:300]
+first = time.perf_counter()
+client.post('/', data={'text_input': text + " Once more."})
+second = time.perf_counter()
+print(json.dumps({
+    'import': imported - start,
+    'create_app': created - imported,
+    'first_deck': first - created,
+    'second_deck': second - first,
+    'modules': modules,
+}))
+"""
+
+def run_once(prewarm):
+    """Start a fresh interpreter and return its timings, plus its wall time to the first deck."""
+    with tempfile.TemporaryDirectory(prefix='dictation-startup-') as directory:
+        env = dict(os.environ, BENCH_STORE=os.path.join(directory, 'jobs.sqlite3'), BENCH_PREWARM=prewarm)
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, '-c', CHILD], env=env, check=True, capture_output=True, text=True).stdout
+        wall = time.perf_counter() - start
+    result = json.loads(output.strip().splitlines()[-1])
+    # The process wall time minus the second deck is the cold time to the first deck
+    result['process_to_first_deck'] = wall - result['second_deck']
+    return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure cold start and time to the first deck.")
+    parser.add_argument('-n', '--runs', type=int, default=5, help="Fresh processes per prewarm mode")
+    parser.add_argument('--prewarm', action='append', choices=PREWARM_MODES, help="Prewarm mode to run (repeatable, default: all)")
+    parser.add_argument('--json', help="Also write the medians to this file")
+    args = parser.parse_args(argv)
+
+    columns = ('import', 'create_app', 'first_deck', 'second_deck', 'process_to_first_deck')
+    print(f"{'prewarm':<14}" + "".join(f"{name:>23}" for name in columns) + f"{'modules':>9}")
+    report = {}
+    for mode in args.prewarm or PREWARM_MODES:
+        runs = [run_once(mode) for _ in range(args.runs)]
+        medians = {name: statistics.median(run[name] for run in runs) for name in columns + ('modules',)}
+        report[mode] = medians
+        print(f"{mode:<14}" + "".join(f"{medians[name] * 1000:>21.1f}ms" for name in columns) + f"{medians['modules']:>9.0f}", flush=True)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
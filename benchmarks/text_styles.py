@@ -0,0 +1,63 @@
+"""
+Compare decks written with inline and shared text styles.
+
+Usage (from the repository root):
+    python -m benchmarks.text_styles                  # all corpora
+    python -m benchmarks.text_styles -c plain-50000 -r 5
+
+For each corpus, the same deck is rendered in both TEXT_STYLES modes. The
+report gives the size of the .pptx, the uncompressed size of the slide XML
+and the best save() time of each mode, and the relative change.
+"""
+import argparse
+import gc
+import io
+import logging
+import sys
+import time
+import zipfile
+from benchmarks.corpora import CORPORA, load_corpus
+
+MODES = ('inline', 'shared')
+
+def measure_mode(title, content, text_styles, repeat):
+    """Return the .pptx bytes, slide XML bytes and best save seconds of a deck."""
+    from app.ppt_generator import create_ppt_dictation_from_text
+
+    ppt = create_ppt_dictation_from_text(title, content, text_styles=text_styles)
+    timings = []
+    for _ in range(repeat):
+        buffer = io.BytesIO()
+        gc.collect()
+        start = time.perf_counter()
+        ppt.save(buffer)
+        timings.append(time.perf_counter() - start)
+    with zipfile.ZipFile(buffer) as archive:
+        xml = sum(info.file_size for info in archive.infolist() if info.filename.startswith('ppt/slides/slide'))
+    return {'bytes': len(buffer.getvalue()), 'xml_bytes': xml, 'save_seconds': min(timings)}
+
+def _change(before, after):
+    return f"{(after - before) / before * 100:+.1f}%"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare inline and shared text styles.")
+    parser.add_argument('-c', '--corpus', action='append', choices=sorted(CORPORA), help="Corpus to run (repeatable, default: all)")
+    parser.add_argument('-r', '--repeat', type=int, default=3, help="Timed saves per mode; the best one is kept")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.CRITICAL)
+    print(f"{'corpus':<20} {'mode':<7} {'pptx KB':>9} {'slide XML KB':>13} {'save s':>8}")
+    for corpus in args.corpus or list(CORPORA):
+        title, content = load_corpus(corpus)
+        results = {mode: measure_mode(title, content, mode, args.repeat) for mode in MODES}
+        for mode, result in results.items():
+            print(f"{corpus:<20} {mode:<7} {result['bytes'] / 1024:>9.1f} {result['xml_bytes'] / 1024:>13.1f} "
+                  f"{result['save_seconds']:>8.4f}")
+        inline, shared = results['inline'], results['shared']
+        print(f"{corpus:<20} {'change':<7} {_change(inline['bytes'], shared['bytes']):>9} "
+              f"{_change(inline['xml_bytes'], shared['xml_bytes']):>13} "
+              f"{_change(inline['save_seconds'], shared['save_seconds']):>8}", flush=True)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,5 +1,9 @@
+import logging
+import os
 from app import create_app
 
+logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO'), format='%(asctime)s - %(levelname)s - %(message)s')
+
 app = create_app()
 
 if __name__ == '__main__':
@@ -14,6 +14,9 @@ setup(
         'werkzeug',
         'core.file.generator @ git+https://github.com/denuca/core.file.generator.git@main#egg=core.file.generator'
     ],
+    extras_require={
+        'advance': ['numpy'],  # MEASURE_BACKEND=advance
+    },
     #dependency_links=[
     #    'git+https://github.com/denuca/core.file.generator.git#egg=core.file.generator',
     #],
@@ -0,0 +1,19 @@
+"""Sample dictation and helpers shared by the tests comparing rendered decks."""
+import io
+import zipfile
+from app.ppt_generator import create_ppt_dictation_from_text
+
+TITLE = "Dictation"
+CONTENT = "\n".join(f"Line {i}: the quick brown fox jumps over the lazy dog, again." for i in range(60))
+
+def parts(data):
+    """Return the (name, bytes) of every member of a .pptx, checking the archive on the way."""
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert archive.testzip() is None
+        return [(info.filename, archive.read(info)) for info in archive.infolist()]
+
+def full_render(title, content, text_styles=None):
+    """Render a deck serially, without the snapshots or the slide pool, and return its bytes."""
+    buffer = io.BytesIO()
+    create_ppt_dictation_from_text(title, content, text_styles=text_styles).save(buffer)
+    return buffer.getvalue()
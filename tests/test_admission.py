@@ -0,0 +1,124 @@
+import threading
+import pytest
+from app import create_app
+from app.admission import SLIDE_COST, AdmissionController, Overloaded, estimate_cost, predict_slides
+from app.deck_cache import deck_cache
+from app.incremental import snapshots
+from app.instrumentation import registry
+
+CONTENT = "\n".join(f"Line {i}: the quick brown fox jumps over the lazy dog." for i in range(45))
+
+def test_estimate_grows_with_words_and_slides():
+    assert predict_slides("one") == 1
+    # 11 words and 2 punctuation marks per line
+    assert predict_slides(CONTENT) == 25
+    assert estimate_cost(CONTENT) == 45 * 11 + 25 * SLIDE_COST
+    assert estimate_cost(CONTENT + " more words") > estimate_cost(CONTENT)
+
+def test_admits_within_capacity_and_counts():
+    registry.clear()
+    controller = AdmissionController(capacity=100, queue_size=0, timeout=0)
+    controller.acquire(60)
+    controller.acquire(40)
+    assert controller.info()['in_flight_cost'] == 100
+
+    with pytest.raises(Overloaded) as error:
+        controller.acquire(1)
+    assert error.value.retry_after >= 1
+    assert registry.counters['admission_admitted'] == 2
+    assert registry.counters['admission_rejected'] == 1
+
+def test_oversized_request_runs_alone():
+    controller = AdmissionController(capacity=100, queue_size=1, timeout=0.05)
+    with controller.admit(500):
+        with pytest.raises(Overloaded):
+            controller.acquire(1)
+    with controller.admit(500):
+        pass
+
+def test_queued_request_waits_for_capacity():
+    registry.clear()
+    controller = AdmissionController(capacity=100, queue_size=1, timeout=5)
+    controller.acquire(100)
+    admitted = threading.Event()
+
+    def waiter():
+        controller.acquire(50)
+        admitted.set()
+
+    thread = threading.Thread(target=waiter)
+    thread.start()
+    assert not admitted.wait(0.1)
+    controller.release(100, 0.5)
+    thread.join(5)
+
+    assert admitted.is_set()
+    assert controller.info() == {'in_flight_cost': 50, 'running': 1, 'waiting': 0, 'capacity': 100}
+    assert registry.counters['admission_queued'] == 1
+
+def test_full_queue_rejects_with_retry_after():
+    registry.clear()
+    controller = AdmissionController(capacity=10, queue_size=1, timeout=5)
+    controller.acquire(10)
+    controller.release(10, 1.0)  # 10 units per second
+    controller.acquire(10)
+    waiter = threading.Thread(target=controller.acquire, args=(10,))
+    waiter.start()
+    while controller.info()['waiting'] == 0:
+        threading.Event().wait(0.01)
+
+    with pytest.raises(Overloaded) as error:
+        controller.acquire(10)
+    # 10 in flight and 10 waiting drain in 2 seconds
+    assert error.value.retry_after == 2
+    assert registry.counters['admission_rejected'] == 1
+
+    controller.release(10)
+    waiter.join(5)
+    assert controller.info()['running'] == 1
+
+def test_queue_deadline():
+    registry.clear()
+    controller = AdmissionController(capacity=100, queue_size=1, timeout=0.05)
+    controller.acquire(100)
+    with pytest.raises(Overloaded):
+        controller.acquire(50)
+
+    assert registry.counters['admission_timeouts'] == 1
+    assert controller.info()['waiting'] == 0
+
+def test_retry_after_follows_throughput():
+    controller = AdmissionController(capacity=1000)
+    controller.acquire(100)
+    controller.release(100, 1.0)  # 100 units per second
+    controller.acquire(1000)
+
+    assert controller.retry_after() == 10
+
+def test_disabled_controller_admits_everything():
+    controller = AdmissionController(capacity=0)
+    for _ in range(10):
+        controller.acquire(10 ** 6)
+    assert controller.info()['running'] == 0
+
+def test_route_returns_503_when_saturated(tmp_path):
+    app = create_app({'JOB_STORE_PATH': str(tmp_path / 'jobs.sqlite3'), 'TESTING': True,
+                      'ADMISSION_CAPACITY': 100, 'ADMISSION_QUEUE_SIZE': 0})
+    deck_cache.clear()
+    snapshots.clear()
+    admission = app.extensions['admission']
+    admission.acquire(100)
+    with app.test_client() as client:
+        response = client.post('/', data={'text_input': f"Title\n{CONTENT}"})
+        assert response.status_code == 503
+        assert int(response.headers['Retry-After']) >= 1
+
+        json_response = client.post('/', data={'text_input': f"Title\n{CONTENT}"},
+                                    headers={'Accept': 'application/json'})
+        assert json_response.status_code == 503
+        assert 'error' in json_response.get_json()
+        assert 'dictation_admission_in_flight_cost 100' in client.get('/metrics').get_data(as_text=True)
+
+        admission.release(100)
+        assert client.post('/', data={'text_input': f"Title\n{CONTENT}"}).status_code == 200
+        assert client.get('/download').status_code == 200
@@ -0,0 +1,87 @@
+import io
+import json
+import zipfile
+import pytest
+from app.admission import AdmissionController
+from app.batch import BatchTooLarge, iter_directory, iter_jsonl, iter_zip, limit_items, main, run_batch
+
+def test_iter_directory(tmp_path):
+    (tmp_path / 'a.txt').write_text("Title A\n  Line one.  \nLine two.", encoding='utf-8')
+    (tmp_path / 'b.txt').write_bytes(b"\x80\x81")
+    (tmp_path / 'ignored.md').write_text("Not a dictation", encoding='utf-8')
+
+    items = list(iter_directory(str(tmp_path)))
+
+    assert [item.name for item in items] == ['a', 'b']
+    assert (items[0].title, items[0].content) == ("Title A", "Line one.\nLine two.")
+    assert "Error reading file" in items[1].error
+
+def test_iter_jsonl_reports_bad_lines():
+    items = list(iter_jsonl(['{"title": "T", "content": "C"}', '', 'not json']))
+
+    assert (items[0].title, items[0].content) == ("T", "C")
+    assert items[1].error.startswith("Invalid JSON line")
+
+def test_iter_jsonl_sanitizes_names():
+    items = list(iter_jsonl(['{"title": "T", "name": "../../etc/passwd"}', '{"title": "T", "name": 42}',
+                             '{"title": "T", "name": ".."}']))
+
+    assert [item.name for item in items] == ['passwd', '42', 'item-3']
+
+def test_iter_zip_skips_oversized_members():
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('small.txt', "Title\nWords.")
+        archive.writestr('big.txt', "Title\n" + "word " * 1000)
+
+    items = list(iter_zip(data, max_bytes=100))
+
+    assert items[0].content == "Words."
+    assert items[1].error == "Input exceeds 100 bytes."
+
+def test_limit_items():
+    lines = ['{"title": "T", "content": "a few words"}', '{"title": "T", "content": "far too many words here"}']
+
+    items = list(limit_items(iter_jsonl(lines), max_bytes=1000, max_words=4))
+    assert items[0].error is None
+    assert items[1].error == "Input exceeds 4 words."
+    with pytest.raises(BatchTooLarge):
+        list(limit_items(iter_jsonl(lines), max_bytes=1000, max_items=1))
+
+def test_run_batch_keeps_going_after_errors():
+    output = io.BytesIO()
+    report = run_batch(iter_jsonl(['{"title": "T", "content": "Some words."}', '{"content": "no title"}']), output, workers=1)
+
+    assert report['succeeded'] == 1
+    assert report['failed'] == 1
+    with zipfile.ZipFile(output) as archive:
+        assert sorted(archive.namelist()) == ['item-1.pptx', 'report.json']
+        assert json.loads(archive.read('report.json'))['items'][0]['status'] == 'ok'
+
+def test_run_batch_admits_each_item():
+    admission = AdmissionController(capacity=1, queue_size=4, timeout=30)
+    lines = [f'{{"title": "T", "content": "Text number {n}."}}' for n in range(3)]
+    report = run_batch(iter_jsonl(lines), io.BytesIO(), workers=2, admission=admission)
+
+    # Each item costs more than the capacity, so they are admitted one at a time instead of as one ticket
+    assert report['succeeded'] == 3
+    assert admission.info()['in_flight_cost'] == 0
+    assert admission.info()['running'] == 0
+
+def test_run_batch_fails_the_rest_once_overloaded():
+    admission = AdmissionController(capacity=1, queue_size=0, timeout=0)
+    admission.acquire(1)  # Another request holds the capacity
+    lines = [f'{{"title": "T", "content": "Text number {n}."}}' for n in range(3)]
+    report = run_batch(iter_jsonl(lines), io.BytesIO(), workers=1, admission=admission)
+    admission.release(1)
+
+    assert report['failed'] == 3
+    assert all(entry['error'].startswith("Server busy") for entry in report['items'])
+
+def test_cli(tmp_path):
+    (tmp_path / 'a.txt').write_text("Title\nWords here.", encoding='utf-8')
+    output = tmp_path / 'out.zip'
+
+    assert main([str(tmp_path), '-o', str(output), '-w', '1']) == 0
+    with zipfile.ZipFile(output) as archive:
+        assert 'a.pptx' in archive.namelist()
@@ -0,0 +1,40 @@
+from app.deck_cache import DeckCache, deck_key
+
+def test_deck_key_depends_on_input():
+    assert deck_key("Title", "Content") == deck_key("Title", "Content")
+    assert deck_key("Title", "Content") != deck_key("Title", "Content.")
+    assert deck_key("Ti", "tleContent") != deck_key("Title", "Content")
+
+def test_get_or_create_renders_once():
+    cache = DeckCache(memory_bytes=1024)
+    calls = []
+
+    def render():
+        calls.append(1)
+        return b"deck"
+
+    assert cache.get_or_create("key", render) == b"deck"
+    assert cache.get_or_create("key", render) == b"deck"
+    assert len(calls) == 1
+    assert cache.info()['hits'] == 1
+
+def test_memory_tier_is_bounded():
+    cache = DeckCache(memory_bytes=10)
+    cache.put("a", b"12345")
+    cache.put("b", b"12345")
+    cache.put("c", b"12345")
+
+    assert cache.get("a") is None
+    assert cache.get("c") == b"12345"
+    assert cache.info()['memory_bytes'] == 10
+
+def test_disk_tier_survives_memory_eviction(tmp_path):
+    cache = DeckCache(memory_bytes=5, directory=str(tmp_path), disk_bytes=12)
+    cache.put("a", b"12345")
+    cache.put("b", b"12345")
+
+    assert cache.get("a") == b"12345"
+    assert cache.info()['disk_hits'] == 1
+
+    cache.put("c", b"12345")
+    assert len(list(tmp_path.glob('*.pptx'))) == 2
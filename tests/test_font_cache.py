@@ -0,0 +1,29 @@
+from app.font_cache import FontMetricsCache
+
+FONT_PATH = 'fonts/comic.ttf'
+
+def test_measure_is_cached():
+    cache = FontMetricsCache(maxsize=10)
+    first = cache.measure("Hello", FONT_PATH, 20)
+    second = cache.measure("Hello", FONT_PATH, 20)
+
+    assert first == second
+    info = cache.info()
+    assert info['hits'] == 1
+    assert info['misses'] == 1
+    assert info['font_loads'] == 1
+
+def test_measure_lru_is_bounded():
+    cache = FontMetricsCache(maxsize=2)
+    for word in ("one", "two", "three"):
+        cache.measure(word, FONT_PATH, 20)
+
+    assert cache.info()['entries'] == 2
+    assert cache.info()['font_loads'] == 1
+
+def test_clear_resets_counters():
+    cache = FontMetricsCache()
+    cache.measure("Hello", FONT_PATH, 20)
+    cache.clear()
+
+    assert cache.info() == {'hits': 0, 'misses': 0, 'font_loads': 0, 'fonts': 0, 'entries': 0, 'maxsize': cache.maxsize}
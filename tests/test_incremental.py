@@ -0,0 +1,92 @@
+import io
+import zipfile
+import pytest
+from app import create_app
+from app.deck_cache import deck_cache
+from app.incremental import regenerate, render_snapshot, replace_members, snapshots
+from app.instrumentation import registry
+from app.layout import compute_layout, update_layout
+from app.styles import get_styles
+from app.template_cache import get_base_template
+from tests.decks import CONTENT, TITLE, full_render, parts
+
+def edit(line, text, content=CONTENT):
+    lines = content.split("\n")
+    lines[line] = text
+    return "\n".join(lines)
+
+@pytest.mark.parametrize('content', [
+    edit(30, "Line 30: the quick brown fox jumps over the lazy cat, again."),
+    edit(30, "Line 30: the quick brown fox jumps over the lazy dog, again and again and again."),
+    edit(0, ""),
+    CONTENT + "\nOne more line.",
+    "\n".join(CONTENT.split("\n")[1:]),
+    CONTENT,
+])
+def test_update_layout_matches_full_layout(content):
+    styles = get_styles()
+    area = get_base_template().area
+    previous = compute_layout(TITLE, CONTENT, styles, area)
+    expected = compute_layout(TITLE, content, styles, area)
+    actual = update_layout(previous, content, styles)
+
+    assert list(actual.entries()) == list(expected.entries())
+    assert actual.slide_count == expected.slide_count
+    for name in ('line_height', 'line_start', 'line_slide', 'line_top', 'line_word_id'):
+        assert getattr(actual, name) == getattr(expected, name)
+
+@pytest.mark.parametrize('content', [
+    edit(30, "Line 30: the quick brown fox jumps over the lazy cat, again."),
+    edit(30, "Line 30: the quick brown fox jumps over the lazy dog, again and again."),
+    CONTENT,
+])
+def test_regenerate_is_identical_to_full_render(content):
+    snapshot = regenerate(render_snapshot(TITLE, CONTENT), TITLE, content)
+
+    assert parts(snapshot.data) == parts(full_render(TITLE, content))
+
+def test_regenerate_only_renders_changed_slides():
+    registry.clear()
+    previous = render_snapshot(TITLE, CONTENT)
+    regenerate(previous, TITLE, edit(30, "Line 30: the quick brown fox jumps over the lazy cat, again."))
+
+    assert registry.counters['slides_rendered'] == 1
+    assert registry.counters['slides_reused'] == previous.plan.slide_count - 1
+
+def test_regenerate_falls_back_on_new_title():
+    registry.clear()
+    snapshot = regenerate(render_snapshot(TITLE, CONTENT), "Other title", CONTENT)
+
+    assert registry.counters['incremental_fallbacks'] == 1
+    assert parts(snapshot.data) == parts(full_render("Other title", CONTENT))
+
+def test_replace_members_copies_the_others():
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('a.xml', b"<a/>" * 100)
+        archive.writestr('b.xml', b"<b/>")
+    data = replace_members(buffer.getvalue(), {'b.xml': b"<c/>" * 50})
+
+    assert parts(data) == [('a.xml', b"<a/>" * 100), ('b.xml', b"<c/>" * 50)]
+
+def test_route_regenerates_edited_submission(tmp_path):
+    app = create_app({'JOB_STORE_PATH': str(tmp_path / 'jobs.sqlite3'), 'TESTING': True})
+    deck_cache.clear()
+    snapshots.clear()
+    with app.test_client() as client:
+        client.post('/', data={'text_input': f"{TITLE}\n{CONTENT}"})
+        registry.clear()
+        edited = edit(30, "Line 30: the quick brown fox jumps over the lazy cat, again.")
+        client.post('/', data={'text_input': f"{TITLE}\n{edited}"})
+        response = client.get('/download')
+
+    assert registry.counters['slides_rendered'] == 1
+    assert parts(response.data) == parts(full_render(TITLE, edited))
+
+def test_regenerate_keeps_shared_text_styles(monkeypatch):
+    monkeypatch.setattr('app.xml_renderer.TEXT_STYLES', 'shared')
+    content = edit(30, "Line 30: the quick brown fox jumps over the lazy cat, again.")
+    snapshot = regenerate(render_snapshot(TITLE, CONTENT), TITLE, content)
+
+    assert b'lvl="6"' in dict(parts(snapshot.data))['ppt/slides/slide6.xml']
+    assert parts(snapshot.data) == parts(full_render(TITLE, content))
@@ -0,0 +1,36 @@
+import io
+import pytest
+from app.ingest import InputTooLarge, iter_text_lines, iter_upload_lines, read_submission
+
+def test_lines_split_across_chunks():
+    data = "Titre\r\nÉlan café,  naïve  \r\n\r\nFin".encode('utf-8')
+    for chunk_size in (1, 2, 3, 7, 1024):
+        lines = list(iter_upload_lines(io.BytesIO(data), max_bytes=1024, chunk_size=chunk_size))
+        assert lines == ["Titre", "Élan café,  naïve", "", "Fin"]
+
+def test_upload_rejected_on_first_chunk_over_limit():
+    class CountingStream(io.BytesIO):
+        reads = 0
+
+        def read(self, size=-1):
+            self.reads += 1
+            return super().read(size)
+
+    stream = CountingStream(b"word " * 10000)
+    with pytest.raises(InputTooLarge):
+        list(iter_upload_lines(stream, max_bytes=100, chunk_size=64))
+    assert stream.reads == 2
+
+def test_word_limit():
+    with pytest.raises(InputTooLarge):
+        list(iter_upload_lines(io.BytesIO(b"one two\nthree four"), max_bytes=1024, max_words=3))
+    with pytest.raises(InputTooLarge):
+        list(iter_text_lines("one two\nthree four", max_bytes=1024, max_words=3))
+
+def test_invalid_utf8():
+    with pytest.raises(UnicodeDecodeError):
+        list(iter_upload_lines(io.BytesIO(b"ok\n\x80\x81"), max_bytes=1024))
+
+def test_read_submission():
+    assert read_submission(iter_text_lines(" Title \n a \nb", 1024)) == ("Title", "a\nb")
+    assert read_submission([]) == ("", "")
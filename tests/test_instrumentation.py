@@ -0,0 +1,43 @@
+import pytest
+from app import create_app
+from app.instrumentation import RequestMetrics, _current, render_metrics, server_timing, span, registry
+
+def test_span_records_histogram():
+    registry.clear()
+    with span('unit-test'):
+        pass
+
+    histogram = registry.stages['unit-test']
+    assert histogram.count == 1
+    assert sum(histogram.counts) == 1
+
+def test_server_timing_format():
+    metrics = RequestMetrics()
+    metrics.durations['layout'] = 0.0125
+    metrics.counters['slides'] = 3
+
+    assert server_timing(metrics) == 'layout;dur=12.50, slides;desc="3"'
+
+def test_render_metrics():
+    registry.clear()
+    with span('save'):
+        pass
+    registry.increment('slides', 2)
+
+    page = render_metrics({'font_cache_hits': 5})
+    assert 'dictation_stage_seconds_bucket{stage="save",le="+Inf"} 1' in page
+    assert 'dictation_stage_seconds_count{stage="save"} 1' in page
+    assert 'dictation_slides_total 2' in page
+    assert 'dictation_font_cache_hits 5' in page
+
+def test_request_metrics_do_not_leak_when_a_view_raises(tmp_path):
+    app = create_app({'JOB_STORE_PATH': str(tmp_path / 'jobs.sqlite3'), 'TESTING': True})
+
+    @app.route('/boom')
+    def boom():
+        raise RuntimeError("boom")
+
+    with app.test_client() as client:
+        with pytest.raises(RuntimeError):
+            client.get('/boom')
+    assert _current.get() is None
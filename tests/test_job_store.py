@@ -0,0 +1,34 @@
+import pytest
+from app.job_store import JobStore, SQLiteJobStore
+
+def test_submission_round_trip(tmp_path):
+    store = SQLiteJobStore(str(tmp_path / 'jobs.sqlite3'))
+    token = store.create_submission("Title", "Content")
+
+    assert store.get_submission(token) == ("Title", "Content")
+    assert store.get_submission("unknown") is None
+
+def test_artefacts(tmp_path):
+    store = SQLiteJobStore(str(tmp_path / 'jobs.sqlite3'))
+    token = store.create_submission("Title", "Content")
+    store.put_artefact(token, 'pptx', b"data")
+
+    assert store.get_artefact(token, 'pptx') == b"data"
+    store.delete(token)
+    assert store.get_artefact(token, 'pptx') is None
+
+def test_expired_entries_are_swept(tmp_path):
+    store = SQLiteJobStore(str(tmp_path / 'jobs.sqlite3'), ttl=-1)
+    token = store.create_submission("Title", "Content")
+    store.put_artefact(token, 'pptx', b"data")
+
+    assert store.get_submission(token) is None
+    assert store.sweep() == 1
+
+def test_incomplete_backend_fails_when_created():
+    class PartialStore(JobStore):
+        def put_submission(self, token, title, content):
+            pass
+
+    with pytest.raises(TypeError):
+        PartialStore()
@@ -0,0 +1,58 @@
+import time
+import pytest
+from app import create_app
+from app.job_store import SQLiteJobStore
+from app.jobs import DONE, FAILED, run_generation_job
+
+@pytest.fixture
+def async_client(tmp_path):
+    app = create_app({
+        'JOB_STORE_PATH': str(tmp_path / 'jobs.sqlite3'),
+        'GENERATION_MODE': 'async',
+        'GENERATION_WORKERS': 1,
+    })
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+    app.extensions['job_manager'].shutdown()
+
+def test_run_generation_job_records_progress(tmp_path):
+    store = SQLiteJobStore(str(tmp_path / 'jobs.sqlite3'))
+    token = store.create_submission("Title", "First line of content.\nSecond line.")
+    store.put_job(token, 'queued')
+
+    run_generation_job(store.path, token)
+
+    job = store.get_job(token)
+    assert job['status'] == DONE
+    assert job['slides_done'] == job['slides_total'] == 1
+    assert store.get_artefact(token, 'pptx').startswith(b"PK")
+
+def test_run_generation_job_failure(tmp_path):
+    store = SQLiteJobStore(str(tmp_path / 'jobs.sqlite3'))
+    store.put_job("missing", 'queued')
+
+    run_generation_job(store.path, "missing")
+
+    assert store.get_job("missing")['status'] == FAILED
+
+def test_async_generation(async_client):
+    response = async_client.post('/', data={'text_input': "Title\nSome content."}, headers={'Accept': 'application/json'})
+    assert response.status_code == 202
+    job_id = response.get_json()['id']
+
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        job = async_client.get(f'/jobs/{job_id}').get_json()
+        if job['status'] in (DONE, FAILED):
+            break
+        time.sleep(0.2)
+
+    assert job['status'] == DONE
+    response = async_client.get(job['download_url'])
+    assert response.status_code == 200
+    assert response.headers['Content-Disposition'] == 'attachment; filename=dictation-output.pptx'
+
+def test_unknown_job(async_client):
+    assert async_client.get('/jobs/unknown').status_code == 404
+    assert async_client.get('/download/unknown').status_code == 404
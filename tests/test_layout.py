@@ -0,0 +1,34 @@
+from pptx.util import Inches
+from app.layout import ContentArea, compute_layout
+from app.styles import get_styles
+from app.tokenizer import PUNCTUATION, WORD, tokenize_line
+
+AREA = ContentArea(Inches(0.5), Inches(1.5), Inches(9), Inches(5))
+
+def test_tokenize_line():
+    assert tokenize_line("Hello, world!") == [
+        ("Hello", WORD), (",", PUNCTUATION), ("world", WORD), ("!", PUNCTUATION)
+    ]
+
+def test_layout_word_ids_skip_punctuation():
+    plan = compute_layout("Title", "One, two.\nThree", get_styles(), AREA)
+    entries = list(plan.entries())
+
+    assert [entry[5] for entry in entries] == ["One", ",", "two", ".", "Three"]
+    assert [entry[7] for entry in entries] == [1, 2, 2, 3, 3]
+    assert plan.slide_count == 1
+
+def test_layout_paginates_long_text():
+    plan = compute_layout("Title", "word " * 500, get_styles(), AREA)
+
+    assert plan.slide_count > 1
+    assert plan.slide_index[-1] == plan.slide_count - 1
+    assert sum(end - start for start, end in plan.slide_ranges()) == len(plan)
+
+def test_plan_keeps_token_offsets_into_the_text():
+    content = "Élève, naïve!\nThe end."
+    plan = compute_layout("Title", content, get_styles(), AREA)
+
+    assert plan.text is content
+    assert [plan.token(i) for i in range(len(plan))] == ["Élève", ",", "naïve", "!", "The", "end", "."]
+    assert content[plan.token_start[4]:plan.token_end[4]] == "The"
@@ -0,0 +1,137 @@
+import os
+import socket
+import time
+import pytest
+from app import create_app
+from app.job_store import create_job_store
+from app.mail_queue import FAILED, QUEUED, RETRYING, SENT, process_owner, retry_delay
+from app.smtp_sink import SMTPSink
+
+@pytest.fixture
+def sink():
+    sink = SMTPSink().start()
+    yield sink
+    sink.stop()
+
+def mail_config(tmp_path, sink):
+    return {
+        'JOB_STORE_PATH': str(tmp_path / 'jobs.sqlite3'),
+        'MAIL_SERVER': sink.host,
+        'MAIL_PORT': sink.port,
+        'MAIL_DEFAULT_SENDER': 'dictation@localhost',
+        'MAIL_USE_TLS': False,
+    }
+
+@pytest.fixture
+def app(tmp_path, sink):
+    app = create_app(mail_config(tmp_path, sink))
+    queue = app.extensions['mail_queue']
+    queue.retry_delay = 0.01
+    yield app
+    queue.stop(timeout=5)
+
+def wait_for(client, mail_id, status, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        body = client.get(f'/mail/{mail_id}').get_json()
+        if body['status'] == status:
+            return body
+        time.sleep(0.02)
+    raise AssertionError(f"Email {mail_id} is {body['status']}, expected {status}")
+
+def post_email(client, address):
+    response = client.post('/', data={'text_input': "Title\nSome content.", 'email_input': address},
+                           headers={'Accept': 'application/json'})
+    assert response.status_code == 202
+    return response.get_json()['id']
+
+def test_emails_are_delivered_over_one_connection(app, sink):
+    client = app.test_client()
+    first = post_email(client, 'one@example.com')
+    second = post_email(client, 'two@example.com')
+
+    wait_for(client, first, SENT)
+    assert wait_for(client, second, SENT)['attempts'] == 1
+    assert sink.connections == 1
+    message = sink.messages[0]['message']
+    assert message['To'] == 'one@example.com'
+    attachment = next(message.iter_attachments())
+    assert attachment.get_filename() == 'presentation.pptx'
+    assert attachment.get_content().startswith(b"PK")
+
+def test_failed_delivery_is_retried(app, sink):
+    sink.fail_next = 1
+    client = app.test_client()
+    mail_id = post_email(client, 'retry@example.com')
+
+    body = wait_for(client, mail_id, SENT)
+    assert body['attempts'] == 2
+    assert len(sink.messages) == 1
+
+def test_delivery_gives_up_after_max_attempts(app, sink):
+    sink.fail_next = 10
+    app.extensions['mail_queue'].max_attempts = 2
+    client = app.test_client()
+    mail_id = post_email(client, 'fail@example.com')
+
+    body = wait_for(client, mail_id, FAILED)
+    assert body['attempts'] == 2
+    assert '451' in body['error']
+    assert client.get('/mail/unknown').status_code == 404
+
+def test_store_errors_do_not_stop_the_worker(app, sink, monkeypatch):
+    job_store = app.extensions['job_store']
+    update_mail = job_store.update_mail
+    failures = []
+
+    def flaky_update_mail(mail_id, **fields):
+        if not failures:
+            failures.append(mail_id)
+            raise RuntimeError("database is locked")
+        update_mail(mail_id, **fields)
+
+    monkeypatch.setattr(job_store, 'update_mail', flaky_update_mail)
+    client = app.test_client()
+    first = post_email(client, 'one@example.com')
+    second = post_email(client, 'two@example.com')
+
+    wait_for(client, first, SENT)
+    wait_for(client, second, SENT)
+    assert failures == [first]
+    assert len(sink.messages) == 2
+
+def test_emails_of_stopped_processes_are_recovered(tmp_path, sink):
+    job_store = create_job_store(str(tmp_path / 'jobs.sqlite3'))
+    # Same pid as this process but another token: the process was restarted
+    stopped = f"{socket.gethostname()}:{os.getpid()}:stopped"
+    job_store.put_artefact('submission', 'pptx', b"PK deck")
+    job_store.put_mail('lost', 'lost@example.com', RETRYING, attempts=1, subject="Subject", body="Body",
+                       token='submission', owner=stopped)
+    job_store.put_mail('live', 'live@example.com', QUEUED, subject="Subject", body="Body", owner=process_owner())
+
+    app = create_app(mail_config(tmp_path, sink))
+    try:
+        client = app.test_client()
+        body = wait_for(client, 'lost', SENT)
+        assert body['attempts'] == 2
+        # The deck still belongs to its submission
+        assert job_store.get_artefact('submission', 'pptx') == b"PK deck"
+        assert client.get('/mail/live').get_json()['status'] == QUEUED
+        message = sink.messages[0]['message']
+        assert message['To'] == 'lost@example.com'
+        assert next(message.iter_attachments()).get_content() == b"PK deck"
+    finally:
+        app.extensions['mail_queue'].stop(timeout=5)
+
+def test_expired_attachment_fails_without_retrying(app, sink):
+    client = app.test_client()
+    queue = app.extensions['mail_queue']
+    mail_id = queue.enqueue('late@example.com', "Subject", "Body", token='expired')
+
+    body = wait_for(client, mail_id, FAILED)
+    assert body['attempts'] == 1
+    assert 'expired' in body['error']
+    assert sink.messages == []
+
+def test_retry_delay_backs_off():
+    assert [retry_delay(n, 1, 5) for n in range(1, 5)] == [1, 2, 4, 5]
@@ -0,0 +1,37 @@
+import pytest
+from app.layout import ContentArea, compute_layout
+from app.measure import GlyphAdvanceBackend, PillowBackend, get_measure_backend
+from app.styles import get_styles
+
+AREA = ContentArea(457200, 1600200, 8229600, 4525963)
+TOKENS = ["Hello", "jumps", "ij", "Wave", "élève", "Ελλάδα", "Straße", ",", "«", "x", "fjord"]
+
+def test_advance_backend_matches_pillow():
+    style = get_styles().word
+    expected = PillowBackend().measure(TOKENS, style.font_path, style.font_size)
+    actual = GlyphAdvanceBackend().measure(TOKENS, style.font_path, style.font_size)
+
+    assert actual == expected
+
+@pytest.mark.parametrize('backend', [PillowBackend(), GlyphAdvanceBackend()])
+def test_measure_spans_matches_measure(backend):
+    style = get_styles().word
+    text = " ".join(TOKENS)
+    starts = [text.index(token) for token in TOKENS]
+    ends = [start + len(token) for start, token in zip(starts, TOKENS)]
+
+    assert (backend.measure_spans(text, starts, ends, style.font_path, style.font_size)
+            == backend.measure(TOKENS, style.font_path, style.font_size))
+
+def test_advance_backend_layout_is_identical():
+    styles = get_styles()
+    content = "The quick, brown fox!\nÉlève « naïve » jumps over the lazy dog.\n" * 20
+    expected = compute_layout("Title", content, styles, AREA, PillowBackend())
+    actual = compute_layout("Title", content, styles, AREA, GlyphAdvanceBackend())
+
+    assert list(actual.entries()) == list(expected.entries())
+    assert actual.max_height == expected.max_height
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        get_measure_backend('nope')
@@ -0,0 +1,77 @@
+import io
+import zipfile
+import pytest
+from pptx import Presentation
+from app import parallel
+from app.incremental import deflate, render_snapshot
+from app.instrumentation import registry
+from app.layout import compute_layout
+from app.parallel import SlidePool, assemble_deck, partition, render_parallel
+from app.styles import get_styles
+from app.template_cache import get_base_template
+from tests.decks import CONTENT, TITLE, full_render, parts
+
+@pytest.fixture(scope='module')
+def pool():
+    pool = SlidePool(workers=2)
+    yield pool
+    pool.shutdown()
+
+@pytest.mark.parametrize('text_styles', ['inline', 'shared'])
+def test_parallel_render_is_identical_to_serial(pool, text_styles):
+    plan, members, data = render_parallel(TITLE, CONTENT, text_styles=text_styles, pool=pool)
+
+    assert plan.slide_count > 10
+    assert members == [f'ppt/slides/slide{n}.xml' for n in range(1, plan.slide_count + 1)]
+    assert parts(data) == parts(full_render(TITLE, CONTENT, text_styles))
+    assert len(Presentation(io.BytesIO(data)).slides) == plan.slide_count
+
+def test_partition_keeps_slides_in_order():
+    plan = compute_layout(TITLE, CONTENT, get_styles(), get_base_template().area)
+    groups = partition(plan, 4)
+
+    assert len(groups) == 4
+    assert [index for group in groups for index in group] == list(range(plan.slide_count))
+    assert partition(plan, plan.slide_count * 2) == [[index] for index in range(plan.slide_count)]
+
+def test_assemble_orders_members_like_python_pptx():
+    # Slide 10 sorts before slide 2 in [Content_Types].xml, as python-pptx writes it
+    data = full_render(TITLE, CONTENT)
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        slide_count = sum(1 for name in archive.namelist() if name.startswith('ppt/slides/slide'))
+        slides = [deflate(archive.read(f'ppt/slides/slide{n}.xml')) for n in range(1, slide_count + 1)]
+    skeleton = io.BytesIO()
+    template = get_base_template()
+    ppt = template.new_presentation()
+    ppt.slides.add_slide(template.content_layout(ppt)).shapes.title.text = TITLE
+    ppt.save(skeleton)
+
+    assert slide_count >= 10
+    assert parts(assemble_deck(skeleton.getvalue(), slides)) == parts(data)
+
+def test_render_snapshot_uses_pool_for_long_decks(monkeypatch, pool):
+    registry.clear()
+    monkeypatch.setattr(parallel, 'PARALLEL_WORKERS', 2)
+    monkeypatch.setattr(parallel, 'PARALLEL_MIN_SLIDES', 10)
+    monkeypatch.setattr(parallel, 'slide_pool', pool)
+    snapshot = render_snapshot(TITLE, CONTENT)
+
+    assert registry.counters['slides_parallel'] == snapshot.plan.slide_count
+    assert parts(snapshot.data) == parts(full_render(TITLE, CONTENT))
+
+def test_failed_pool_falls_back_to_serial(monkeypatch):
+    class BrokenPool:
+        workers = 2
+
+        def submit(self, function, *args):
+            raise RuntimeError("pool is gone")
+
+    registry.clear()
+    monkeypatch.setattr(parallel, 'PARALLEL_WORKERS', 2)
+    monkeypatch.setattr(parallel, 'PARALLEL_MIN_SLIDES', 10)
+    monkeypatch.setattr(parallel, 'slide_pool', BrokenPool())
+
+    assert render_parallel(TITLE, CONTENT, pool=BrokenPool()) is None
+    snapshot = render_snapshot(TITLE, CONTENT)
+    assert registry.counters['parallel_fallbacks'] == 2
+    assert parts(snapshot.data) == parts(full_render(TITLE, CONTENT))
@@ -1,17 +1,19 @@
 import io
 import pytest
 from app import create_app  # Ensure this points to the app package
-from app.routes import validate_input  # Update this as per your route definitions
-from app.ppt_generator import create_ppt_from_text
+from app.utils import validate_input
+from app.ppt_generator import create_ppt_from_text, create_ppt_dictation_from_text
+from lxml import etree
 from unittest.mock import patch, Mock
 
 @pytest.fixture
-def client():
-    app = create_app()
+def client(tmp_path):
+    app = create_app({'JOB_STORE_PATH': str(tmp_path / 'jobs.sqlite3')})
     app.config['TESTING'] = True
-    app.config['SESSION_SIZE_LIMIT'] = 4096  # Set a limit for the tests
+    app.config['INPUT_SIZE_LIMIT'] = 4096  # Set a limit for the tests
     with app.test_client() as client:
         yield client
+    app.extensions['job_manager'].shutdown()
 
 def test_create_ppt_from_text():
     # This test now checks the core file generator's functionality
@@ -21,6 +23,53 @@ def test_create_ppt_from_text():
     assert ppt.slides[0].shapes.title.text == "Title"
     assert ppt.slides[0].shapes.placeholders[1].text == "Content"
 
+def test_xml_renderer_matches_shapes_renderer():
+    content = "The quick brown fox, again!\n" * 30
+    fast = create_ppt_dictation_from_text("Title", content, renderer='xml')
+    slow = create_ppt_dictation_from_text("Title", content, renderer='shapes')
+
+    assert len(fast.slides) == len(slow.slides)
+    for fast_slide, slow_slide in zip(fast.slides, slow.slides):
+        assert etree.tostring(fast_slide._element) == etree.tostring(slow_slide._element)
+
+def test_shape_template_cache_is_bounded():
+    from app import xml_renderer
+    from app.styles import get_styles
+
+    xml_renderer.clear_shape_templates()
+    for size in range(20, 20 + xml_renderer.SHAPE_TEMPLATES_CACHE_SIZE + 4):
+        xml_renderer.get_shape_templates(get_styles({'word': {'font_size': size}}), 'inline')
+    assert len(xml_renderer._templates) == xml_renderer.SHAPE_TEMPLATES_CACHE_SIZE
+    # The most recently used templates are kept
+    assert (get_styles({'word': {'font_size': size}}).key, 'inline') in xml_renderer._templates
+
+def same_element(a, b):
+    return (a.tag, a.attrib, a.text, len(a)) == (b.tag, b.attrib, b.text, len(b)) and all(map(same_element, a, b))
+
+def test_shared_text_styles_match_inline_boxes():
+    from pptx.oxml.ns import qn
+
+    content = "The quick brown fox, again!\n" * 30
+    inline = create_ppt_dictation_from_text("Title", content, text_styles='inline')
+    shared = create_ppt_dictation_from_text("Title", content, text_styles='shared')
+    levels = shared.part._element.find(qn('p:defaultTextStyle'))
+    master_levels = shared.slide_masters[0]._element.find(qn('p:txStyles')).find(qn('p:otherStyle'))
+
+    assert len(inline.slides) == len(shared.slides)
+    for inline_slide, shared_slide in zip(inline.slides, shared.slides):
+        for inline_p, shared_p in list(zip(inline_slide._element.iter(qn('a:pPr')), shared_slide._element.iter(qn('a:pPr')))):
+            if shared_p.get('lvl') is None:
+                continue  # Header and footer
+            level = levels.find(qn(f"a:lvl{int(shared_p.get('lvl')) + 1}pPr"))
+            # The level carries the box's own properties, without indentation
+            assert level.get('marL') == level.get('indent') == '0'
+            assert level.get('algn') == inline_p.get('algn', 'l')
+            assert same_element(level[0], inline_p[0])
+            assert same_element(master_levels.find(level.tag), level)
+            shared_p.getparent().replace(shared_p, inline_p.__copy__())
+        # Apart from the paragraph properties, the boxes are the same
+        assert etree.tostring(inline_slide._element) == etree.tostring(shared_slide._element)
+
 def test_generate_ppt_with_multiline_content(client):
     # Input text with multiple lines
     text_input = "Slide Title\nFirst line of content.\nSecond line of content."
@@ -46,10 +95,10 @@ def test_input_too_large(client):
     assert b"Your input is too large. Please reduce the text length." in response.data
 
 def test_download_file(client):
-    # Simulate storing title and content in the session
+    # Generate a PowerPoint so the session references a stored submission
+    client.post('/', data={'text_input': "Test Title\nTest content for the PowerPoint."})
     with client.session_transaction() as sess:
-        sess['title'] = "Test Title"
-        sess['content'] = "Test content for the PowerPoint."
+        assert set(sess.keys()) == {'submission'}
 
     # Trigger the download route
     response = client.get('/download')
@@ -59,6 +108,21 @@ def test_download_file(client):
     assert response.headers['Content-Disposition'] == 'attachment; filename=dictation-output.pptx'
     assert response.content_type == 'application/vnd.openxmlformats-officedocument.presentationml.presentation'
 
+def test_download_without_submission(client):
+    response = client.get('/download')
+    assert response.status_code == 400
+
+def test_large_input_is_stored_server_side(client):
+    client.application.config['INPUT_SIZE_LIMIT'] = 1024 * 1024
+    content = "word " * 2000
+
+    response = client.post('/', data={'text_input': f"Title\n{content}"})
+    assert b"Your PowerPoint is ready!" in response.data
+
+    with client.session_transaction() as sess:
+        token = sess['submission']
+    assert client.application.extensions['job_store'].get_submission(token) == ("Title", content.strip())
+
 def generate_mock_pptx():
     """Generate a minimal .pptx file and return as a BytesIO object."""
     ppt = create_ppt_from_text("Slide Title", "This is the content.")
@@ -120,4 +184,91 @@ def test_validate_input_invalid_file():
     is_valid, result = validate_input(None, invalid_file)
     assert not is_valid
     assert "Error reading uploaded file" in result
-"""
\ No newline at end of file
+"""
+def test_batch_endpoint(client):
+    batch = io.BytesIO(b'{"title": "One", "content": "First text."}\n{"title": "Two", "content": "Second text."}\n')
+    response = client.post('/batch', data={'batch_file': (batch, 'texts.jsonl')}, content_type='multipart/form-data')
+
+    assert response.status_code == 200
+    assert response.headers['X-Batch-Succeeded'] == '2'
+    assert response.content_type == 'application/zip'
+
+def test_batch_endpoint_limits(client):
+    client.application.config['BATCH_MAX_ITEMS'] = 2
+    batch = io.BytesIO(b'{"title": "T", "content": "x"}\n' * 3)
+    response = client.post('/batch', data={'batch_file': (batch, 'texts.jsonl')}, content_type='multipart/form-data')
+    assert response.status_code == 413
+
+    batch = io.BytesIO(b'{"title": "T", "content": "Words."}\n{"title": "T", "content": "' + b"word " * 1000 + b'"}\n')
+    response = client.post('/batch', data={'batch_file': (batch, 'texts.jsonl')}, content_type='multipart/form-data')
+    assert response.status_code == 200
+    assert (response.headers['X-Batch-Succeeded'], response.headers['X-Batch-Failed']) == ('1', '1')
+
+def test_validate_input_returns_the_uploaded_text():
+    is_valid, result = validate_input(None, io.BytesIO("Titre\r\n  Élan café. \r\n".encode('utf-8')))
+    assert is_valid
+    assert result == "Titre\r\n  Élan café. \r\n"
+
+    is_valid, result = validate_input(None, io.BytesIO(b"word " * 100), max_bytes=100)
+    assert not is_valid
+    assert "Input exceeds 100 bytes." in result
+
+def test_upload_too_large(client):
+    upload = io.BytesIO(b"Title\n" + b"word " * 2000)
+    response = client.post('/', data={'file_input': (upload, 'dictation.txt')}, content_type='multipart/form-data')
+
+    assert b"Your input is too large. Please reduce the text length." in response.data
+
+def test_request_body_over_limit_is_refused(tmp_path):
+    app = create_app({'JOB_STORE_PATH': str(tmp_path / 'jobs.sqlite3'), 'TESTING': True, 'INPUT_SIZE_LIMIT': 1024})
+    assert app.config['MAX_CONTENT_LENGTH'] == 1024 + 64 * 1024
+    with app.test_client() as client:
+        upload = io.BytesIO(b"Title\n" + b"word " * 20000)
+        response = client.post('/', data={'file_input': (upload, 'dictation.txt')}, content_type='multipart/form-data')
+        assert response.status_code == 413
+        assert b"Your input is too large. Please reduce the text length." in response.data
+
+        batch = io.BytesIO(b'{"title": "T", "content": "' + b"word " * 20000 + b'"}\n')
+        response = client.post('/batch', data={'batch_file': (batch, 'texts.jsonl')}, content_type='multipart/form-data')
+        assert response.status_code == 413
+
+def test_upload_file(client):
+    upload = io.BytesIO("Titre\r\nÉlan café.\r\n".encode('utf-8'))
+    response = client.post('/', data={'file_input': (upload, 'dictation.txt')}, content_type='multipart/form-data')
+
+    assert b"Your PowerPoint is ready!" in response.data
+    with client.session_transaction() as sess:
+        token = sess['submission']
+    assert client.application.extensions['job_store'].get_submission(token) == ("Titre", "Élan café.")
+
+def test_stream_mode_download(client):
+    client.application.config['OUTPUT_MODE'] = 'stream'
+    response = client.post('/', data={'text_input': "Streamed Title\nStreamed content."})
+    assert b"Your PowerPoint is ready!" in response.data
+
+    response = client.get('/download')
+    assert response.status_code == 200
+    assert response.headers['Content-Disposition'] == 'attachment; filename=dictation-output.pptx'
+    assert int(response.headers['Content-Length']) == len(response.data)
+    assert response.data.startswith(b"PK")
+
+def test_deck_size_limit_uses_real_size(client, monkeypatch):
+    monkeypatch.setattr('app.routes.STREAMING_SIZE_LIMIT', 1024)
+    response = client.post('/', data={'text_input': "Size Title\nSize limited content."})
+
+    assert b"The generated PowerPoint is too large to download directly." in response.data
+
+def test_server_timing_and_metrics(client):
+    response = client.post('/', data={'text_input': "Timed Title\nTimed content, with words."})
+    server_timing = response.headers['Server-Timing']
+    for stage in ('measure', 'layout', 'shapes', 'decorate', 'save', 'total'):
+        assert f"{stage};dur=" in server_timing
+    assert 'words;desc="4"' in server_timing
+
+    response = client.get('/download')
+    assert 'total;dur=' in response.headers['Server-Timing']
+
+    metrics = client.get('/metrics')
+    assert metrics.status_code == 200
+    assert b'dictation_stage_seconds_bucket{stage="layout"' in metrics.data
+    assert b'dictation_request_seconds_count{endpoint="index.index_route"}' in metrics.data
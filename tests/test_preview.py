@@ -0,0 +1,51 @@
+import pytest
+from lxml import etree
+from app import create_app
+from app.layout import compute_layout
+from app.preview import render_slide_svg
+from app.styles import get_styles
+from app.template_cache import get_base_template
+
+SVG = '{http://www.w3.org/2000/svg}'
+
+@pytest.fixture
+def client(tmp_path):
+    app = create_app({'JOB_STORE_PATH': str(tmp_path / 'jobs.sqlite3')})
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+def test_slide_svg_uses_layout_coordinates():
+    styles = get_styles()
+    template = get_base_template()
+    plan = compute_layout("Title", "One, two <three>.", styles, template.area)
+    svg = etree.fromstring(render_slide_svg(plan, 0, 0, len(plan), styles, template.slide_width, template.slide_height))
+
+    boxes = svg.findall(SVG + 'rect')[1:]
+    assert [(int(box.get('x')), int(box.get('y')), int(box.get('width'))) for box in boxes] == \
+        [(plan.left[i], plan.top[i], plan.width[i]) for i in range(len(plan))]
+    texts = [text.text for text in svg.findall(SVG + 'text')]
+    assert texts == ["One", "1", ",", "two", "2", "<", "three", "3", ">", ".", "Dictation", "Page 1 of 1"]
+
+def test_preview_route(client):
+    response = client.post('/preview', data={'text_input': "Title\n" + "Some words to wrap. " * 200})
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/html'
+    assert response.data.count(b'<svg') > 1
+    assert b"Page 1 of" in response.data
+
+def test_preview_single_slide_of_session_submission(client):
+    client.post('/', data={'text_input': "Title\nA short dictation."})
+
+    response = client.get('/preview?slide=1')
+    assert response.mimetype == 'image/svg+xml'
+    assert b"dictation" in response.data
+    assert client.get('/preview?slide=2').status_code == 404
+
+    page = client.get('/preview')
+    assert page.status_code == 200
+    assert client.get('/preview', headers={'If-None-Match': page.headers['ETag'].strip('"')}).status_code == 304
+
+def test_preview_without_text(client):
+    assert client.get('/preview').status_code == 400
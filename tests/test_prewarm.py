@@ -0,0 +1,26 @@
+import os
+import subprocess
+import sys
+import pytest
+from app import create_app
+from app.prewarm import prewarm
+
+def test_create_app_does_not_load_generation_stack(tmp_path):
+    code = (
+        "import sys\n"
+        "from app import create_app\n"
+        f"create_app({{'JOB_STORE_PATH': {str(tmp_path / 'jobs.sqlite3')!r}}})\n"
+        "loaded = [name for name in ('pptx', 'PIL', 'flask_mail', 'numpy') if name in sys.modules]\n"
+        "assert not loaded, loaded\n"
+    )
+    subprocess.run([sys.executable, '-c', code], check=True, env=dict(os.environ))
+
+def test_prewarm_runs_once():
+    timings = prewarm()
+
+    assert set(timings) == {'imports', 'styles', 'fonts', 'template'}
+    assert prewarm() is timings
+
+def test_unknown_prewarm_mode(tmp_path):
+    with pytest.raises(ValueError):
+        create_app({'JOB_STORE_PATH': str(tmp_path / 'jobs.sqlite3'), 'PREWARM': 'sometimes'})
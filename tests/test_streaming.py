@@ -0,0 +1,30 @@
+import io
+import pytest
+from app.ppt_generator import create_ppt_from_text
+from app.streaming import DeckTooLarge, SizeLimitedWriter, iter_file_chunks, save_presentation
+
+def test_save_presentation_reports_real_size():
+    ppt = create_ppt_from_text("Title", "Content")
+    reference = io.BytesIO()
+    ppt.save(reference)
+
+    file, size = save_presentation(ppt, spool_threshold=1024)
+    data = b"".join(iter_file_chunks(file, chunk_size=1000))
+
+    assert size == len(data) == len(reference.getvalue())
+    assert file.closed
+
+def test_save_presentation_stops_at_limit():
+    ppt = create_ppt_from_text("Title", "Content")
+    with pytest.raises(DeckTooLarge):
+        save_presentation(ppt, limit=1024)
+
+def test_writer_counts_furthest_position():
+    writer = SizeLimitedWriter(io.BytesIO(), limit=10)
+    writer.write(b"12345678")
+    writer.seek(0)
+    writer.write(b"ab")
+
+    assert writer.size == 8
+    with pytest.raises(DeckTooLarge):
+        writer.write(b"1234567890")
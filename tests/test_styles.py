@@ -0,0 +1,49 @@
+import json
+import os
+import pytest
+from pptx.dml.color import RGBColor
+from pptx.util import Pt
+from app.styles import StyleRegistry, get_styles
+
+def test_compiled_values():
+    styles = get_styles()
+
+    assert styles.word.font_size_emu == Pt(styles.word.font_size)
+    assert isinstance(styles.word.font_color, RGBColor)
+    assert os.path.isabs(styles.word.font_path)
+    assert styles['punctuation'] is styles.punctuation
+
+def test_styles_are_immutable():
+    with pytest.raises(AttributeError):
+        get_styles().word.font_size = 99
+
+def test_registry_reloads_on_change(tmp_path):
+    path = tmp_path / 'styles.json'
+    with open('styles.json') as f:
+        document = json.load(f)
+    path.write_text(json.dumps(document))
+    registry = StyleRegistry(str(path))
+    first = registry.get()
+    assert registry.get() is first
+
+    document['word']['font_size'] += 1
+    path.write_text(json.dumps(document))
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1))
+    second = registry.get()
+    assert second.word.font_size == first.word.font_size + 1
+    assert second.key != first.key
+
+    # A broken file keeps the last good styles
+    path.write_text("{")
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 2))
+    assert registry.get() is second
+
+def test_overrides_are_cached():
+    overrides = {'word': {'font_size': 30}}
+    styles = get_styles(overrides)
+
+    assert styles.word.font_size == 30
+    assert get_styles(overrides) is styles
+    assert styles.key != get_styles().key
+    with pytest.raises(KeyError):
+        get_styles({'unknown': {}})
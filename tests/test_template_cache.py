@@ -0,0 +1,44 @@
+import os
+from pptx import Presentation
+from pptx.util import Inches
+from app.ppt_generator import create_ppt_dictation_from_text
+from app.template_cache import CONTENT_PLACEHOLDER_IDX, TemplateCache, get_base_template
+
+def test_layout_has_no_content_placeholder():
+    template = get_base_template()
+    ppt = template.new_presentation()
+
+    assert template.content_layout(ppt).placeholders.get(idx=CONTENT_PLACEHOLDER_IDX) is None
+    assert template.area.width > 0 and template.area.height > 0
+
+def test_clones_are_independent():
+    template = get_base_template()
+    first = template.new_presentation()
+    partnames = {first.slides.add_slide(template.content_layout(first)).part.partname for _ in range(3)}
+
+    assert len(partnames) == 3
+    assert len(template.new_presentation().slides) == 0
+
+def test_generated_slides_have_no_content_placeholder():
+    ppt = create_ppt_dictation_from_text("Title", "Some words to lay out.\n" * 40)
+
+    for slide in ppt.slides:
+        assert all(shape.placeholder_format.idx != CONTENT_PLACEHOLDER_IDX for shape in slide.placeholders)
+
+def test_custom_template_is_reloaded_when_changed(tmp_path):
+    path = str(tmp_path / 'branding.pptx')
+    branding = Presentation()
+    branding.slide_width = Inches(13.333)
+    branding.save(path)
+    cache = TemplateCache()
+
+    template = cache.get(path)
+    assert template.prototype.slide_width == Inches(13.333)
+    assert cache.get(path) is template
+
+    branding.slide_width = Inches(10)
+    branding.save(path)
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1))
+    reloaded = cache.get(path)
+    assert reloaded is not template
+    assert reloaded.prototype.slide_width == Inches(10)
@@ -0,0 +1,35 @@
+from app.tokenizer import PUNCTUATION, WORD, iter_lines, tokenize, tokenize_line
+
+TEXT = "Hello, world!\n\nÉlève « naïve » jumps.\nlast"
+
+def test_tokenize_matches_tokenize_line():
+    stream = tokenize(TEXT)
+    lines = TEXT.split("\n")
+
+    assert stream.line_count == len(lines)
+    assert [stream.line(n) for n in range(stream.line_count)] == [tokenize_line(line) for line in lines]
+    assert stream.line(0) == [("Hello", WORD), (",", PUNCTUATION), ("world", WORD), ("!", PUNCTUATION)]
+    assert stream.line_range(1) == (4, 4)
+
+def test_tokens_are_offsets_into_the_text():
+    stream = tokenize(TEXT)
+
+    assert len(stream) == 11
+    assert stream[5] == "«"
+    assert TEXT[stream.starts[5]:stream.ends[5]] == "«"
+    assert stream.tokens(9) == [".", "last"]
+
+def test_iter_lines_yields_each_line_once_tokenized():
+    seen = []
+    for stream, line, first, end in iter_lines(TEXT):
+        # Earlier lines are already in the stream, later ones are not yet
+        assert len(stream) == end
+        seen.append((line, stream.tokens(first, end)))
+
+    assert seen == [(0, ["Hello", ",", "world", "!"]), (1, []), (2, ["Élève", "«", "naïve", "»", "jumps", "."]), (3, ["last"])]
+
+def test_empty_text_has_one_empty_line():
+    stream = tokenize("")
+
+    assert stream.line_count == 1
+    assert len(stream) == 0